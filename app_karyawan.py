@@ -5,7 +5,7 @@
 import streamlit as st
 from pathlib import Path
 from PIL import Image
-from db.queries import get_employee_by_uid
+from db.result_cards import get_result_card
 from ui.karyawan_interface import karyawan_interface
 from config.settings import APP_TITLE
 
@@ -32,10 +32,10 @@ if not uid:
     st.stop()
 
 # -------------------------------
-# 2️⃣ Fetch employee from database
+# 2️⃣ Fetch the karyawan's result card (one indexed lookup)
 # -------------------------------
-employee = get_employee_by_uid(uid)
-if not employee:
+card = get_result_card(uid)
+if not card:
     st.error("❌ UID tidak valid atau karyawan tidak ditemukan.")
     st.stop()
 
@@ -44,7 +44,7 @@ if not employee:
 # -------------------------------
 st.session_state.update({
     "user_role": "Karyawan",
-    "username": employee["nama"],
+    "username": card["profile"]["nama"],
     "employee_uid": uid,
     "qr_access": True,
     "authenticated": True,
@@ -63,12 +63,12 @@ try:
 except FileNotFoundError:
     st.warning("⚠️ Logo tidak ditemukan.")
 
-st.markdown(f"### Selamat datang, {employee['nama']}")
+st.markdown(f"### Selamat datang, {card['profile']['nama']}")
 
 # -------------------------------
 # 5️⃣ Render Karyawan interface
 # -------------------------------
-karyawan_interface(uid=uid)
+karyawan_interface(uid=uid, card=card)
 
 # -------------------------------
 # 6️⃣ Stop further rendering
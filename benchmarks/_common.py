@@ -0,0 +1,44 @@
+# benchmarks/_common.py
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# ---------------------------
+# Round-trip counter
+# ---------------------------
+@contextmanager
+def count_round_trips(engine):
+    """
+    Count statements sent to the server while the block runs.
+    Yields a dict whose 'count' key is updated live.
+    """
+    counter = {"count": 0}
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
+
+# ---------------------------
+# Timing / output helpers
+# ---------------------------
+@contextmanager
+def timed():
+    """Yield a dict whose 'seconds' key holds the wall time once the block exits."""
+    result = {"seconds": 0.0}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+def print_table(headers, rows):
+    """Print rows as a plain fixed-width table."""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).rjust(w) for v, w in zip(row, widths)))
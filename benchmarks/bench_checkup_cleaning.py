@@ -0,0 +1,122 @@
+# benchmarks/bench_checkup_cleaning.py
+"""
+CPU time of the checkup cleaning stage: the old per-cell lambdas vs the
+column-wise clean_checkup_sheet. No database needed.
+
+Also checks that both produce the same frame for every run.
+
+    python -m benchmarks.bench_checkup_cleaning [row_count ...]
+"""
+import sys
+import random
+import uuid
+import pandas as pd
+from db.checkup_uploader import clean_checkup_sheet, NUMERIC_COLS
+from benchmarks._common import timed, print_table
+
+DEFAULT_ROW_COUNTS = [1_000, 10_000, 50_000]
+
+# ---------------------------
+# Legacy per-cell cleaning, kept for comparison
+# ---------------------------
+def _normalize_string(val):
+    if isinstance(val, str):
+        return val.strip().lower()
+    elif pd.notna(val):
+        return str(val).strip().lower()
+    return ''
+
+def _safe_float(val):
+    try:
+        if pd.notna(val):
+            return float(val)
+    except:
+        pass
+    return None
+
+def _safe_date(val):
+    try:
+        dt = pd.to_datetime(val).date()
+        if dt.year < 1901:
+            return None
+        return dt
+    except:
+        return None
+
+def _row_bmi(row):
+    tinggi_cm = row.get('tinggi')
+    berat = row.get('berat')
+    tinggi_m = (tinggi_cm / 100) if tinggi_cm else None
+    return round(berat / (tinggi_m ** 2), 2) if berat and tinggi_m else row.get('bmi')
+
+def legacy_clean(df, sheet_name):
+    df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+    df['row_no'] = df.index + 2
+    if 'lokasi' not in df.columns or df['lokasi'].isnull().all():
+        df['lokasi'] = sheet_name
+    df['uid'] = df['uid'].astype(str).str.strip()
+    df = df[df['uid'].notna() & (df['uid'] != 'nan')].copy()
+    for col in ['nama', 'jabatan', 'lokasi']:
+        if col in df.columns:
+            df[col] = df[col].apply(_normalize_string)
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = df[col].str.replace(',', '.').apply(_safe_float)
+    for col in ['tanggal_lahir', 'tanggal_checkup']:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: _safe_date(pd.to_datetime(x, dayfirst=True, errors='coerce')))
+    df['bmi'] = df.apply(_row_bmi, axis=1)
+    today = pd.Timestamp.today().date()
+    df['tanggal_checkup'] = df['tanggal_checkup'].apply(lambda d: d if d else today)
+    df['lokasi'] = df['lokasi'].apply(lambda v: v or sheet_name)
+    df['sheet'] = sheet_name
+    return df
+
+# ---------------------------
+# Synthetic sheet
+# ---------------------------
+def make_raw_sheet(n, seed=0):
+    """A dtype=str sheet shaped like a rig campaign upload."""
+    rnd = random.Random(seed)
+    checkup_dates = ["15/03/2024", "16/03/2024", "2024-03-17", "18-03-2024"]
+    return pd.DataFrame({
+        "UID": [str(uuid.UUID(int=rnd.getrandbits(128))) for _ in range(n)],
+        "Nama": [f" Karyawan {i} " for i in range(n)],
+        "Jabatan": [rnd.choice(["Driller", "Mekanik", "Operator "]) for _ in range(n)],
+        "Lokasi": [None] * n,
+        "Tanggal Checkup": [rnd.choice(checkup_dates) for _ in range(n)],
+        "Tanggal Lahir": [f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/{rnd.randint(1960, 2000)}" for _ in range(n)],
+        "Umur": [str(rnd.randint(20, 60)) for _ in range(n)],
+        "Tinggi": [f"{rnd.uniform(150, 190):.1f}".replace(".", ",") for _ in range(n)],
+        "Berat": [f"{rnd.uniform(50, 110):.1f}" for _ in range(n)],
+        "Lingkar Perut": [str(rnd.randint(60, 120)) for _ in range(n)],
+        "Gula Darah Puasa": [str(rnd.randint(70, 160)) for _ in range(n)],
+        "Gula Darah Sewaktu": [rnd.choice([str(rnd.randint(90, 250)), "-", None]) for _ in range(n)],
+        "Cholesterol": [str(rnd.randint(120, 300)) for _ in range(n)],
+        "Asam Urat": [f"{rnd.uniform(3, 9):.1f}" for _ in range(n)],
+    }, dtype=object)
+
+def main(row_counts):
+    rows = []
+    for n in row_counts:
+        raw = make_raw_sheet(n)
+        with timed() as legacy_clock:
+            legacy = legacy_clean(raw.copy(), "Rig AB-100")
+        with timed() as vector_clock:
+            vectorized = clean_checkup_sheet(raw.copy(), "Rig AB-100")
+        pd.testing.assert_frame_equal(
+            legacy.reset_index(drop=True), vectorized[legacy.columns].reset_index(drop=True),
+            check_dtype=False
+        )
+        rows.append([
+            n,
+            f"{legacy_clock['seconds']:.3f}",
+            f"{vector_clock['seconds']:.3f}",
+            f"{legacy_clock['seconds'] / n * 1e6:.1f}",
+            f"{vector_clock['seconds'] / n * 1e6:.1f}",
+        ])
+    print_table(["rows", "per_cell_s", "columnar_s", "per_cell_us_row", "columnar_us_row"], rows)
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or DEFAULT_ROW_COUNTS
+    main(counts)
@@ -0,0 +1,52 @@
+# benchmarks/bench_excel_engines.py
+"""
+Read time of a one-sheet checkup workbook (dtype=str, as the checkup uploader
+reads it): pandas.read_excel with its default openpyxl engine vs
+iter_sheet_chunks on openpyxl and on calamine. No database needed.
+
+Also checks that all three produce the same frame for every run.
+
+    python -m benchmarks.bench_excel_engines [row_count ...]
+"""
+import os
+import sys
+import tempfile
+import pandas as pd
+from utils.excel_reader import iter_sheet_chunks, CalamineWorkbook
+from benchmarks._common import timed, print_table
+from benchmarks.bench_checkup_cleaning import make_raw_sheet
+
+DEFAULT_ROW_COUNTS = [1_000, 10_000, 100_000]
+
+def read_chunks(path, engine):
+    return pd.concat(chunk for _, chunk in iter_sheet_chunks(path, dtype=str, engine=engine))
+
+def main(row_counts):
+    engines = ["openpyxl"] + (["calamine"] if CalamineWorkbook is not None else [])
+    if len(engines) == 1:
+        print("python-calamine is not installed; only openpyxl is measured")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in row_counts:
+            path = os.path.join(tmp_dir, f"checkups_{n}.xlsx")
+            make_raw_sheet(n).to_excel(path, sheet_name="Rig AB-100", index=False, engine="xlsxwriter")
+
+            with timed() as pandas_clock:
+                reference = pd.read_excel(path, dtype=str)
+            row = [n, f"{pandas_clock['seconds']:.2f}"]
+            for engine in engines:
+                with timed() as clock:
+                    frame = read_chunks(path, engine)
+                pd.testing.assert_frame_equal(reference, frame, check_dtype=False)
+                row += [f"{clock['seconds']:.2f}", f"{pandas_clock['seconds'] / clock['seconds']:.1f}x"]
+            rows.append(row)
+
+    headers = ["rows", "read_excel_s"]
+    for engine in engines:
+        headers += [f"{engine}_s", f"{engine}_speedup"]
+    print_table(headers, rows)
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or DEFAULT_ROW_COUNTS
+    main(counts)
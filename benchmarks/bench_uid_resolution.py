@@ -0,0 +1,75 @@
+# benchmarks/bench_uid_resolution.py
+"""
+Compare the old per-key UID lookup with the set-based get_karyawan_uid_bulk.
+
+Read-only: keys are sampled from the configured karyawan table and padded
+with synthetic (non-matching) keys when the table is smaller than the run.
+
+    python -m benchmarks.bench_uid_resolution [key_count ...]
+"""
+import sys
+import pandas as pd
+from sqlalchemy import text
+from db.database import get_engine
+from db.queries import get_karyawan_uid_bulk
+from benchmarks._common import count_round_trips, timed, print_table
+
+DEFAULT_KEY_COUNTS = [10, 100, 1000, 3000]
+
+def legacy_uid_lookup(df):
+    """The per-key loop get_karyawan_uid_bulk used before, kept here for comparison."""
+    keys = df[["nama", "jabatan", "lokasi", "tanggal_lahir"]].drop_duplicates().to_dict(orient="records")
+    mapping = {}
+    with get_engine().connect() as conn:
+        for row in keys:
+            query = "SELECT uid FROM karyawan WHERE nama = :nama"
+            params = {"nama": row["nama"]}
+            if row.get("jabatan"):
+                query += " AND jabatan = :jabatan"
+                params["jabatan"] = row["jabatan"]
+            if row.get("lokasi"):
+                query += " AND lokasi_id = lokasi_id_of(:lokasi)"
+                params["lokasi"] = row["lokasi"]
+            if row.get("tanggal_lahir"):
+                query += " AND tanggal_lahir = :tanggal_lahir"
+                params["tanggal_lahir"] = row["tanggal_lahir"]
+            result = conn.execute(text(query), params).fetchone()
+            if result:
+                mapping[(row["nama"], row.get("jabatan"), row.get("lokasi"), row.get("tanggal_lahir"))] = result[0]
+    return mapping
+
+def build_keys(n):
+    """Return n distinct lookup keys, real ones first."""
+    with get_engine().connect() as conn:
+        real = pd.read_sql(
+            text("""
+                SELECT k.nama, k.jabatan, l.name AS lokasi, k.tanggal_lahir
+                FROM karyawan k LEFT JOIN lokasi l ON l.id = k.lokasi_id LIMIT :n
+            """),
+            conn, params={"n": n}
+        )
+    missing = n - len(real)
+    if missing > 0:
+        synthetic = pd.DataFrame({
+            "nama": [f"bench-missing-{i}" for i in range(missing)],
+            "jabatan": ["operator"] * missing,
+            "lokasi": [None] * missing,
+            "tanggal_lahir": [None] * missing,
+        })
+        real = pd.concat([real, synthetic], ignore_index=True)
+    return real
+
+def main(key_counts):
+    engine = get_engine()
+    rows = []
+    for n in key_counts:
+        df = build_keys(n)
+        for label, fn in [("per-key", legacy_uid_lookup), ("set-based", get_karyawan_uid_bulk)]:
+            with count_round_trips(engine) as trips, timed() as clock:
+                mapping = fn(df)
+            rows.append([n, label, trips["count"], f"{clock['seconds']:.3f}", len(mapping)])
+    print_table(["keys", "resolver", "round_trips", "wall_s", "resolved"], rows)
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or DEFAULT_KEY_COUNTS
+    main(counts)
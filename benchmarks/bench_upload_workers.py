@@ -0,0 +1,67 @@
+# benchmarks/bench_upload_workers.py
+"""
+Throughput of the parse + clean stage of a checkup upload by worker count.
+Each run cleans every sheet of a synthetic multi-rig workbook through
+stream_sheets / clean_sheet_payloads in a fresh process pool. No database needed.
+
+Also checks that every run produces the same payloads in the same order.
+
+    python -m benchmarks.bench_upload_workers [worker_count ...]
+"""
+import os
+import sys
+import tempfile
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from db.checkup_uploader import clean_sheet_payloads
+from utils.worker_pool import stream_sheets
+from benchmarks._common import timed, print_table
+from benchmarks.bench_checkup_cleaning import make_raw_sheet
+
+DEFAULT_WORKER_COUNTS = [1, 2, 4, 8]
+SHEETS = ["Rig AB-100", "Rig LTO-150", "Rig Taylor C-200", "HWU EHR#10", "Kantor", "Rig XY-300", "Rig XY-400", "Rig XY-500"]
+ROWS_PER_SHEET = 10_000
+
+def make_workbook(path):
+    with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+        for i, sheet in enumerate(SHEETS):
+            make_raw_sheet(ROWS_PER_SHEET, seed=i).to_excel(writer, sheet_name=sheet, index=False)
+
+def main(worker_counts):
+    total_rows = ROWS_PER_SHEET * len(SHEETS)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "checkups.xlsx")
+        make_workbook(path)
+
+        rows, reference, baseline = [], None, None
+        for workers in worker_counts:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=importlib.import_module,
+                initargs=("db.checkup_uploader",),
+            )
+            with pool:
+                # Spawn the workers (and import the parser) before timing
+                list(pool.map(abs, range(workers * 4)))
+                with timed() as clock:
+                    result = list(stream_sheets(clean_sheet_payloads, [path], pool=pool))
+            if reference is None:
+                reference = result
+            assert result == reference, f"payloads differ with {workers} workers"
+            baseline = baseline or clock["seconds"]
+            rows.append([
+                workers,
+                f"{clock['seconds']:.2f}",
+                f"{total_rows / clock['seconds']:,.0f}",
+                f"{baseline / clock['seconds']:.2f}x",
+            ])
+
+    print(f"{len(SHEETS)} sheets x {ROWS_PER_SHEET:,} rows, {os.cpu_count()} CPUs")
+    print_table(["workers", "seconds", "rows_per_s", "speedup"], rows)
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or DEFAULT_WORKER_COUNTS
+    main(counts)
@@ -32,6 +32,32 @@ DEFAULT_USERS = [
 
 UPLOAD_DIR = "uploads"  # folder to store uploaded XLS/CSV files
 
+# Worker processes for parsing uploaded sheets (1 = parse in the Streamlit process)
+import os
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Parquet archive of old checkups (python -m db.archive); read back by the history views
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "archive")
+ARCHIVE_KEEP_YEARS = 3   # default cutoff: 1 January, this many years back
+
+# Arrow IPC snapshots of the dashboard dataset (db/snapshot.py), shared by every process on the host
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+
+# Checkups kept on a QR portal result card (db/result_cards.py), newest first;
+# the full history is read by get_medical_checkups_by_uid
+RESULT_CARD_HISTORY = int(os.environ.get("RESULT_CARD_HISTORY", 10))
+
+# Entries of the read-query cache (db/cache.py), least recently used evicted first
+QUERY_CACHE_ENTRIES = int(os.environ.get("QUERY_CACHE_ENTRIES", 256))
+
+# How often an open dashboard checks whether its data changed (ui/live_refresh.py);
+# an in-memory compare while the db/notify.py listener is connected
+LIVE_REFRESH_SECONDS = int(os.environ.get("LIVE_REFRESH_SECONDS", 5))
+
+# A checkup already stored for the same karyawan and day: "skip", "overwrite" or
+# "keep_newest" (see db/checkup_conflicts.py)
+CHECKUP_CONFLICT_POLICY = os.environ.get("CHECKUP_CONFLICT_POLICY", "keep_newest")
+
 # ---------------------------
 # File export configs
 # ---------------------------
@@ -0,0 +1,177 @@
+# db/archive.py
+"""
+Cold history: checkups older than a cutoff move out of Postgres into a Parquet
+dataset under ARCHIVE_DIR, one zstd-compressed file per year per chunk:
+
+    archive/checkups/tahun=2021/checkups-<chunk>-0.parquet
+
+Each karyawan's latest checkup stays in Postgres, so the dashboard, its
+pointers and dashboard_rollup never change. get_medical_checkups_by_uid() and
+the portal's result cards (db/result_cards.py) union the archived rows back in
+(read_archived_checkups). Deletes never rewrite the Parquet files: archived rows
+of karyawan deleted since, or of upload batches rolled back since, are left out
+when read.
+
+    python -m db.archive                        # archive before 1 Jan, ARCHIVE_KEEP_YEARS back
+    python -m db.archive --before 2022-01-01
+"""
+import os
+import sys
+import uuid
+from datetime import date
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from sqlalchemy import text
+from config.settings import ARCHIVE_DIR, ARCHIVE_KEEP_YEARS
+from db.database import get_engine
+from db.partitions import drop_empty_checkup_partitions
+from db.lokasi import get_lokasi_options
+
+CHECKUP_ARCHIVE = os.path.join(ARCHIVE_DIR, "checkups")
+ARCHIVE_CHUNK_ROWS = 20_000
+# Rows are sorted by uid, so the min/max statistics of small row groups let a uid filter skip most of a file
+ARCHIVE_ROW_GROUP_ROWS = 4_096
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("checkup_id", pa.int32()),
+    ("uid", pa.string()),
+    ("tanggal_checkup", pa.date32()),
+    ("tanggal_lahir", pa.date32()),
+    ("umur", pa.int32()),
+    ("tinggi", pa.float64()),
+    ("berat", pa.float64()),
+    ("lingkar_perut", pa.float64()),
+    ("bmi", pa.float64()),
+    ("gula_darah_puasa", pa.float64()),
+    ("gula_darah_sewaktu", pa.float64()),
+    ("cholesterol", pa.float64()),
+    ("asam_urat", pa.float64()),
+    ("status", pa.string()),
+    ("lokasi_id", pa.int32()),
+    ("batch_id", pa.string()),
+    ("lokasi", pa.string()),        # name, in files written before lokasi_id (migration 9)
+    ("tahun", pa.int16()),
+])
+_NUMERIC = [field.name for field in ARCHIVE_SCHEMA if pa.types.is_floating(field.type)]
+_WRITTEN = [name for name in ARCHIVE_SCHEMA.names if name != "lokasi"]
+_PARTITIONING = ds.partitioning(pa.schema([("tahun", pa.int16())]), flavor="hive")
+
+def default_cutoff():
+    return date(date.today().year - ARCHIVE_KEEP_YEARS, 1, 1)
+
+def _write_chunk(df):
+    df = df.sort_values(["tahun", "uid", "tanggal_checkup"])
+    for col in ("uid", "batch_id"):
+        df[col] = df[col].map(lambda v: None if v is None else str(v))
+    for col in _NUMERIC:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+    ds.write_dataset(
+        pa.Table.from_pandas(df[_WRITTEN], schema=pa.schema([ARCHIVE_SCHEMA.field(name) for name in _WRITTEN]),
+                             preserve_index=False),
+        CHECKUP_ARCHIVE,
+        format="parquet",
+        partitioning=_PARTITIONING,
+        basename_template=f"checkups-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        max_rows_per_group=ARCHIVE_ROW_GROUP_ROWS,
+    )
+
+def archive_checkups(before=None, chunk_rows=ARCHIVE_CHUNK_ROWS, on_progress=None):
+    """
+    Move checkups dated before `before` (default: default_cutoff()) into the
+    Parquet archive, chunk by chunk: each chunk is deleted with RETURNING, written
+    to Parquet and only then committed, so a failed write leaves the rows in
+    Postgres. Yearly partitions left empty are dropped afterwards.
+    Returns {'archived': int, 'dropped_partitions': [names]}
+    """
+    before = before or default_cutoff()
+    columns = ", ".join(_WRITTEN)
+    archived = 0
+    while True:
+        with get_engine().begin() as conn:
+            df = pd.read_sql(text(f"""
+                DELETE FROM checkups WHERE checkup_id IN (
+                    SELECT c.checkup_id FROM checkups c
+                    WHERE c.tanggal_checkup < :before
+                      AND NOT EXISTS (SELECT 1 FROM karyawan k WHERE k.latest_checkup_id = c.checkup_id)
+                    ORDER BY c.tanggal_checkup, c.checkup_id
+                    LIMIT :limit
+                ) AND tanggal_checkup < :before
+                RETURNING {columns}
+            """), conn, params={"before": before, "limit": chunk_rows})
+            if df.empty:
+                break
+            _write_chunk(df)
+        archived += len(df)
+        if on_progress:
+            on_progress(archived)
+
+    with get_engine().begin() as conn:
+        dropped = drop_empty_checkup_partitions(conn, before.year)
+    return {"archived": archived, "dropped_partitions": dropped}
+
+def _drop_deleted(df):
+    """Leave out rows whose karyawan or upload batch has been deleted from Postgres since."""
+    batch_ids = df["batch_id"].dropna().unique().tolist()
+    with get_engine().connect() as conn:
+        uids = conn.execute(text(
+            "SELECT uid::text FROM karyawan WHERE uid = ANY(CAST(:uids AS uuid[]))"
+        ), {"uids": df["uid"].unique().tolist()}).scalars().all()
+        batches = conn.execute(text(
+            "SELECT batch_id::text FROM upload_batches WHERE batch_id = ANY(CAST(:ids AS uuid[]))"
+        ), {"ids": batch_ids}).scalars().all() if batch_ids else []
+    return df[df["uid"].isin(uids) & (df["batch_id"].isna() | df["batch_id"].isin(batches))]
+
+def read_archived_checkups(uid) -> pd.DataFrame:
+    """
+    Archived checkups of one karyawan, or of a list of uids (columns as in
+    checkups, lokasi as its current name), empty when nothing is archived. The
+    uid filter is pushed down to the Parquet row groups.
+    """
+    if not os.path.isdir(CHECKUP_ARCHIVE):
+        return pd.DataFrame(columns=ARCHIVE_SCHEMA.names)
+    dataset = ds.dataset(CHECKUP_ARCHIVE, format="parquet", schema=ARCHIVE_SCHEMA, partitioning=_PARTITIONING)
+    if isinstance(uid, (list, tuple, set)):
+        uid_filter = ds.field("uid").isin([str(u) for u in uid])
+    else:
+        uid_filter = ds.field("uid") == str(uid)
+    df = dataset.to_table(filter=uid_filter).to_pandas()
+    if df.empty:
+        return df
+    df = _drop_deleted(df)
+    if df["lokasi_id"].notna().any():
+        names = df["lokasi_id"].map(get_lokasi_options())
+        df["lokasi"] = names.where(df["lokasi_id"].notna(), df["lokasi"])
+    # A chunk written but not committed (crash between the two) is still in Postgres too,
+    # and a checkup re-uploaded and archived again is in two chunks: the newest one wins
+    return df.sort_values("checkup_id").drop_duplicates(["uid", "tanggal_checkup"], keep="last")
+
+def drop_superseded(archived, hot) -> pd.DataFrame:
+    """
+    The archived rows no hot (Postgres) row replaces. A checkup is one per uid and
+    tanggal_checkup, so a checkup re-uploaded after its year was archived is a new
+    hot row (new checkup_id) that wins over its archived copy.
+    """
+    def keys(df):
+        return pd.MultiIndex.from_arrays([df["uid"].astype(str), pd.to_datetime(df["tanggal_checkup"])])
+    return archived[~keys(archived).isin(keys(hot))]
+
+def archived_batch_uids(batch_id) -> list:
+    """Karyawan with archived checkups from this upload batch (a full scan; batch rollbacks are rare)."""
+    if not os.path.isdir(CHECKUP_ARCHIVE):
+        return []
+    dataset = ds.dataset(CHECKUP_ARCHIVE, format="parquet", schema=ARCHIVE_SCHEMA, partitioning=_PARTITIONING)
+    table = dataset.to_table(columns=["uid"], filter=ds.field("batch_id") == str(batch_id))
+    return sorted(set(table["uid"].to_pylist()))
+
+# ---------------------------------------------------------------------
+# SCRIPT ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    cutoff = date.fromisoformat(args[args.index("--before") + 1]) if "--before" in args else default_cutoff()
+    print(f"📦 Archiving checkups before {cutoff} to {CHECKUP_ARCHIVE}")
+    result = archive_checkups(cutoff, on_progress=lambda n: print(f"   {n} rows archived"))
+    print(f"✅ {result['archived']} checkups archived; dropped partitions: {result['dropped_partitions'] or '-'}")
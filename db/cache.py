@@ -0,0 +1,108 @@
+# db/cache.py
+"""
+Process-wide LRU cache for the read queries. Decorate a read function with the
+tables it reads:
+
+    @cached("karyawan", "lokasi")
+    def get_employees(): ...
+
+An entry is keyed on the function, its arguments and the data_version of those
+tables (migration 12). Every INSERT / UPDATE / DELETE / TRUNCATE on a tracked
+table bumps its version in the writing transaction, so the next read after a
+commit, from any process, misses and queries Postgres again. The bump also
+notifies every process (migration 13), whose listener (db/notify.py) drops the
+dead entries right away and keeps the versions in memory: while it is
+connected a hit costs no query at all, otherwise one version lookup. Callers
+get a copy of the cached DataFrame, so mutating it never changes the cache.
+Only returned values are cached; a read that raises is tried again next call.
+"""
+import threading
+from collections import OrderedDict
+from functools import wraps
+import pandas as pd
+from sqlalchemy import text
+from config.settings import QUERY_CACHE_ENTRIES
+from db.database import get_engine
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+def get_data_versions(tables) -> tuple:
+    """Current data_version of each table, in the order given."""
+    with get_engine().connect() as conn:
+        versions = dict(conn.execute(
+            text("SELECT table_name, version FROM data_version WHERE table_name = ANY(:tables)"),
+            {"tables": list(tables)}
+        ).fetchall())
+    return tuple(versions.get(table, 0) for table in tables)
+
+def _current_versions(tables) -> tuple:
+    # db.notify imports this module, hence the local import
+    from db.notify import current_data_versions
+    return current_data_versions(tables)
+
+def _freeze(value):
+    # Filter specs and lokasi lists are dicts / lists; the key must be hashable
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _copy(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, (list, tuple)):
+        return type(value)(_copy(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    return value
+
+def cached(*tables):
+    """Cache the decorated read function until one of `tables` is written."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__module__, func.__qualname__, tables, _freeze(args), _freeze(kwargs), _current_versions(tables))
+            with _lock:
+                if key in _entries:
+                    _entries.move_to_end(key)
+                    _stats["hits"] += 1
+                    return _copy(_entries[key])
+                _stats["misses"] += 1
+            value = func(*args, **kwargs)
+            with _lock:
+                _entries[key] = value
+                _entries.move_to_end(key)
+                while len(_entries) > QUERY_CACHE_ENTRIES:
+                    _entries.popitem(last=False)
+                    _stats["evictions"] += 1
+            return _copy(value)
+        return wrapper
+    return decorator
+
+def invalidate_tables(tables) -> int:
+    """
+    Drop the entries that read any of `tables` (called by the db/notify.py
+    listener on a write). They could never be hit again; this only frees them
+    early. Returns the entries dropped.
+    """
+    tables = set(tables)
+    with _lock:
+        stale = [key for key in _entries if tables.intersection(key[2])]
+        for key in stale:
+            del _entries[key]
+        _stats["invalidations"] += len(stale)
+    return len(stale)
+
+def cache_stats() -> dict:
+    """{'hits', 'misses', 'evictions', 'invalidations', 'entries'} since start (or clear_cache)."""
+    with _lock:
+        return {**_stats, "entries": len(_entries)}
+
+def clear_cache():
+    """Drop every entry and reset the counters."""
+    with _lock:
+        _entries.clear()
+        _stats.update(hits=0, misses=0, evictions=0, invalidations=0)
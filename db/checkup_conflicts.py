@@ -0,0 +1,87 @@
+# db/checkup_conflicts.py
+"""
+One checkup per karyawan per day: checkups_uid_tanggal_key (migration 11) is
+unique on (uid, tanggal_checkup). Every checkup write path appends
+on_conflict_sql() to its INSERT, so writing a checkup that is already stored
+follows CHECKUP_CONFLICT_POLICY instead of adding a row:
+
+    skip         the stored row is kept
+    overwrite    the new values replace the stored ones
+    keep_newest  the new values replace the stored ones unless those were
+                 written later (checkups.written_at: the start of the upload
+                 they came from, or the time of a manual entry)
+
+Identical values are never rewritten, so uploading a workbook again is a no-op.
+Duplicates stored before the key existed are removed by migration 11 with the
+same statement as the dedupe job:
+
+    python -m db.checkup_conflicts           # count duplicate checkups
+    python -m db.checkup_conflicts --apply   # delete them, keeping the newest row of each
+"""
+import sys
+from sqlalchemy import text
+from config.settings import CHECKUP_CONFLICT_POLICY
+
+CONFLICT_POLICIES = ("skip", "overwrite", "keep_newest")
+CHECKUP_KEY = "uid, tanggal_checkup"
+
+# Columns a conflicting write may replace. batch_id stays with the upload that
+# created the row, so delete_batch() never removes a checkup another upload wrote first.
+UPDATABLE_COLUMNS = [
+    "tanggal_lahir", "umur", "tinggi", "berat", "lingkar_perut", "bmi",
+    "gula_darah_puasa", "gula_darah_sewaktu", "cholesterol", "asam_urat", "lokasi_id",
+]
+
+# Every row but the newest (highest checkup_id) of each (uid, tanggal_checkup)
+_DUPLICATES = f"""
+    SELECT checkup_id, tanggal_checkup FROM (
+        SELECT checkup_id, tanggal_checkup,
+               row_number() OVER (PARTITION BY {CHECKUP_KEY} ORDER BY checkup_id DESC) AS n
+        FROM checkups
+    ) ranked WHERE n > 1
+"""
+DEDUPE_CHECKUPS_SQL = f"""
+    DELETE FROM checkups c USING ({_DUPLICATES}) d
+    WHERE c.checkup_id = d.checkup_id AND c.tanggal_checkup = d.tanggal_checkup
+"""
+
+def on_conflict_sql(policy=None) -> str:
+    """
+    ON CONFLICT clause for an INSERT INTO checkups under the policy (default
+    CHECKUP_CONFLICT_POLICY). RETURNING gives the rows inserted or updated;
+    xmax cannot tell them apart on a partitioned table, so callers count the
+    keys already stored before the INSERT.
+    """
+    policy = policy or CHECKUP_CONFLICT_POLICY
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown checkup conflict policy: {policy}")
+    if policy == "skip":
+        return f"ON CONFLICT ({CHECKUP_KEY}) DO NOTHING"
+    stored = ", ".join(f"checkups.{col}" for col in UPDATABLE_COLUMNS)
+    new = ", ".join(f"EXCLUDED.{col}" for col in UPDATABLE_COLUMNS)
+    condition = f"({stored}) IS DISTINCT FROM ({new})"
+    if policy == "keep_newest":
+        condition += " AND checkups.written_at <= EXCLUDED.written_at"
+    assignments = ", ".join(f"{col} = EXCLUDED.{col}" for col in UPDATABLE_COLUMNS + ["written_at"])
+    return f"ON CONFLICT ({CHECKUP_KEY}) DO UPDATE SET {assignments} WHERE {condition}"
+
+def count_duplicate_checkups() -> int:
+    """Rows dedupe_checkups() would delete."""
+    from db.database import get_engine   # db.database imports this module through db.migrations
+    with get_engine().connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM ({_DUPLICATES}) d")).scalar()
+
+def dedupe_checkups() -> int:
+    """Delete every checkup but the newest of its (uid, tanggal_checkup). Returns the rows deleted."""
+    from db.database import get_engine
+    with get_engine().begin() as conn:
+        return conn.execute(text(DEDUPE_CHECKUPS_SQL)).rowcount
+
+# ---------------------------------------------------------------------
+# SCRIPT ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    if "--apply" in sys.argv[1:]:
+        print(f"✅ {dedupe_checkups()} duplicate checkups deleted")
+    else:
+        print(f"🔍 {count_duplicate_checkups()} duplicate checkups; run with --apply to delete them")
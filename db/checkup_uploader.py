@@ -1,108 +1,407 @@
 # db/checkup_uploader.py
+import io
+import os
+from itertools import groupby
+from contextlib import ExitStack, closing
 import pandas as pd
-from db.queries import get_employee_by_uid, insert_medical_checkup
-from datetime import datetime
+from sqlalchemy import text
+from db.database import get_engine
+from db.queries import start_batch, finish_batch
+from db.partitions import ensure_checkup_partitions
+from db.checkup_conflicts import on_conflict_sql
+from utils.excel_reader import iter_sheet_chunks, local_copy, file_digest, DEFAULT_CHUNK_ROWS
+from utils.worker_pool import stream_sheets
 
 # -----------------------------
-# Helper functions
+# Helper functions (column-wise)
 # -----------------------------
-def normalize_string(val):
-    if isinstance(val, str):
-        return val.strip().lower()
-    elif pd.notna(val):
-        return str(val).strip().lower()
-    return ''
-
-def safe_float(val):
-    try:
-        if pd.notna(val):
-            return float(val)
-    except:
-        pass
-    return None
-
-def safe_date(val):
-    try:
-        dt = pd.to_datetime(val).date()
-        if dt.year < 1901:
-            return None
-        return dt
-    except:
-        return None
+def normalize_text(series):
+    """Strip + lowercase a text column; missing values become ''."""
+    return series.fillna('').astype(str).str.strip().str.lower()
+
+def to_number(series):
+    """Parse a text column with ',' or '.' decimals; unparseable values become NaN."""
+    return pd.to_numeric(series.astype(object).str.replace(',', '.', regex=False), errors='coerce')
+
+def to_date(series):
+    """
+    Parse a day-first date column. Each distinct value is parsed once and mapped back,
+    so repeated dates (the common case in a campaign sheet) cost nothing extra.
+    Unparseable values become NaT.
+    """
+    codes, uniques = pd.factorize(series)
+    parsed = pd.Series(pd.to_datetime(
+        pd.Series(uniques, dtype=object), dayfirst=True, errors='coerce', format='mixed'
+    ))
+    return parsed.reindex(codes).set_axis(series.index)
+
+def compute_bmi(df):
+    """BMI from tinggi (cm) / berat (kg) where both are non-zero, else the sheet's own bmi."""
+    tinggi = df['tinggi'] if 'tinggi' in df.columns else pd.Series(0.0, index=df.index)
+    berat = df['berat'] if 'berat' in df.columns else pd.Series(0.0, index=df.index)
+    given = df['bmi'] if 'bmi' in df.columns else pd.Series(None, index=df.index, dtype=float)
+    calculated = (berat / (tinggi / 100) ** 2).round(2)
+    return calculated.where((tinggi != 0) & (berat != 0), given)
+
+NUMERIC_COLS = ['tinggi','berat','lingkar_perut','gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat','umur','bmi']
+
+# Column order of the COPY payload / staging table
+STAGE_COLUMNS = [
+    'sheet', 'row_no', 'uid', 'tanggal_checkup', 'tanggal_lahir', 'umur',
+    'tinggi', 'berat', 'lingkar_perut', 'bmi', 'gula_darah_puasa',
+    'gula_darah_sewaktu', 'cholesterol', 'asam_urat', 'lokasi'
+]
+
+# Columns stored as NUMERIC(5,2) in checkups
+MEASUREMENT_COLS = ['tinggi','berat','lingkar_perut','bmi','gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat']
+
+UID_NOT_FOUND = 'UID not found in database'
+DUPLICATE_IN_UPLOAD = 'same uid and tanggal_checkup as a later row of this upload'
+
+# -----------------------------
+# Cleaning
+# -----------------------------
+def clean_checkup_sheet(df, sheet_name):
+    """
+    Normalize one raw sheet (read with dtype=str) into typed checkup rows.
+    Keeps the Excel row number of every row in 'row_no'.
+    """
+    # Normalize columns
+    df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+    df['row_no'] = df.index + 2
+
+    # Fill missing 'lokasi' with sheet name
+    if 'lokasi' not in df.columns or df['lokasi'].isnull().all():
+        df['lokasi'] = sheet_name
+
+    # Fill missing 'tanggal_checkup' with today
+    if 'tanggal_checkup' not in df.columns:
+        df['tanggal_checkup'] = pd.Timestamp.today().date()
+
+    # Clean UID
+    df['uid'] = df['uid'].astype(str).str.strip()
+    df = df[df['uid'].notna() & (df['uid'] != 'nan')].copy()
+
+    # Convert text columns
+    for col in ['nama', 'jabatan', 'lokasi']:
+        if col in df.columns:
+            df[col] = normalize_text(df[col])
+
+    # Convert numeric fields
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = to_number(df[col])
+
+    # Convert dates; years before 1901 count as "no date"
+    today = pd.Timestamp.today().normalize()
+    for col in ['tanggal_lahir', 'tanggal_checkup']:
+        if col in df.columns:
+            parsed = to_date(df[col])
+            too_old = parsed.dt.year < 1901
+            # Unparseable tanggal_checkup stays NaT so the row is rejected; pre-1901 falls back to today
+            parsed = parsed.mask(too_old, today if col == 'tanggal_checkup' else pd.NaT)
+            df[col] = parsed.dt.date
+
+    # Derived / defaulted values
+    df['bmi'] = compute_bmi(df)
+    df['lokasi'] = df['lokasi'].mask(df['lokasi'] == '', sheet_name)
+    df['sheet'] = sheet_name
+    return df
+
+# -----------------------------
+# Bulk ingestion (COPY -> staging -> set-based insert)
+# -----------------------------
+def _copy_payload(df):
+    """Render the staging columns of a cleaned frame as CSV for COPY."""
+    payload = df.reindex(columns=STAGE_COLUMNS)
+    buf = io.StringIO()
+    payload.to_csv(buf, index=False, header=False, na_rep='')
+    buf.seek(0)
+    return buf
+
+def bulk_insert_checkups(frames):
+    """
+    Insert cleaned checkup rows in one transaction.
+    frames is a cleaned DataFrame or an iterable of them (consumed one at a time).
+    Returns {'inserted': int, 'updated': int, 'unchanged': int, 'skipped': [{'sheet', 'row', 'reason'}]}
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    return insert_checkup_payloads(_copy_payload(df) for df in frames if not df.empty)
+
+def _claim_checkpoint(conn, checkpoint):
+    """Lock the (file_hash, sheet) checkpoint row and return its last committed row."""
+    file_hash, sheet, _ = checkpoint
+    params = {'file_hash': file_hash, 'sheet': sheet}
+    conn.execute(text("""
+        INSERT INTO upload_checkpoints (file_hash, sheet) VALUES (:file_hash, :sheet)
+        ON CONFLICT (file_hash, sheet) DO NOTHING
+    """), params)
+    return conn.execute(text("""
+        SELECT last_row FROM upload_checkpoints
+        WHERE file_hash = :file_hash AND sheet = :sheet
+        FOR UPDATE
+    """), params).scalar()
+
+def _advance_checkpoint(conn, checkpoint, inserted, skipped):
+    file_hash, sheet, last_row = checkpoint
+    conn.execute(text("""
+        UPDATE upload_checkpoints
+        SET last_row = :last_row,
+            inserted_rows = inserted_rows + :inserted,
+            skipped_rows = skipped_rows + :skipped,
+            updated_at = NOW()
+        WHERE file_hash = :file_hash AND sheet = :sheet
+    """), {'file_hash': file_hash, 'sheet': sheet, 'last_row': last_row,
+           'inserted': inserted, 'skipped': skipped})
+
+def get_upload_progress(file_hash):
+    """{sheet: (last committed Excel row, rows inserted, rows skipped)} for an uploaded file."""
+    with get_engine().connect() as conn:
+        rows = conn.execute(text(
+            "SELECT sheet, last_row, inserted_rows, skipped_rows FROM upload_checkpoints WHERE file_hash = :file_hash"
+        ), {'file_hash': file_hash}).fetchall()
+    return {sheet: (last_row, inserted, skipped) for sheet, last_row, inserted, skipped in rows}
+
+def insert_checkup_payloads(payloads, checkpoint=None, batch_id=None, policy=None):
+    """
+    COPY each CSV payload (see _copy_payload) into a temp staging table, flag rows
+    failing the UID / type checks, then INSERT ... SELECT the rest into checkups,
+    all in one transaction.
+    checkpoint=(file_hash, sheet, last_row) commits that upload_checkpoints row with the
+    insert; rows at or below the sheet's already committed row are dropped first.
+    batch_id is stamped on every inserted row. Checkups already stored for the same
+    uid and tanggal_checkup follow the conflict policy (db/checkup_conflicts.py).
+    Returns {'inserted': int, 'updated': int, 'unchanged': int,
+             'skipped': [{'sheet', 'row', 'reason'}]}
+    """
+
+    range_checks = "\n".join(
+        f"WHEN abs({col}) >= 999.995 THEN '{col} out of range for NUMERIC(5,2)'"
+        for col in MEASUREMENT_COLS
+    )
+    measurements = ", ".join(f"COALESCE(round({col}::numeric, 2), 0)" for col in MEASUREMENT_COLS)
+
+    with get_engine().begin() as conn:
+        done_row = _claim_checkpoint(conn, checkpoint) if checkpoint else 0
+        if checkpoint and checkpoint[2] <= done_row:
+            return {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': []}  # committed by an earlier attempt
+
+        conn.execute(text("""
+            CREATE TEMP TABLE checkup_stage (
+                sheet TEXT,
+                row_no INTEGER,
+                uid TEXT,
+                tanggal_checkup DATE,
+                tanggal_lahir DATE,
+                umur DOUBLE PRECISION,
+                tinggi DOUBLE PRECISION,
+                berat DOUBLE PRECISION,
+                lingkar_perut DOUBLE PRECISION,
+                bmi DOUBLE PRECISION,
+                gula_darah_puasa DOUBLE PRECISION,
+                gula_darah_sewaktu DOUBLE PRECISION,
+                cholesterol DOUBLE PRECISION,
+                asam_urat DOUBLE PRECISION,
+                lokasi TEXT,
+                reason TEXT
+            ) ON COMMIT DROP
+        """))
+
+        cursor = conn.connection.driver_connection.cursor()
+        copy_sql = f"COPY checkup_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        staged = False
+        for payload in payloads:
+            cursor.copy_expert(copy_sql, payload)
+            staged = True
+        if not staged and not checkpoint:
+            return {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': []}
+
+        if done_row:
+            # A chunk straddling the resume point: keep only the unfinished rows
+            conn.execute(text("DELETE FROM checkup_stage WHERE row_no <= :done_row"), {'done_row': done_row})
+
+        # --- Validate every staged row in one pass; first failing check wins ---
+        conn.execute(text(f"""
+            UPDATE checkup_stage s SET reason = CASE
+                WHEN s.uid !~* '^{{?[0-9a-f]{{8}}-?[0-9a-f]{{4}}-?[0-9a-f]{{4}}-?[0-9a-f]{{4}}-?[0-9a-f]{{12}}}}?$'
+                    THEN '{UID_NOT_FOUND}'
+                WHEN NOT EXISTS (SELECT 1 FROM karyawan k WHERE k.uid = s.uid::uuid)
+                    THEN '{UID_NOT_FOUND}'
+                WHEN tanggal_checkup IS NULL THEN 'tanggal_checkup is missing or not a valid date'
+                WHEN abs(umur) >= 2147483647.5 THEN 'umur out of range for INTEGER'
+                {range_checks}
+            END
+        """))
+        # One row per (uid, tanggal_checkup) can be written per statement: the last row (by sheet, row) wins
+        conn.execute(text(f"""
+            UPDATE checkup_stage s SET reason = '{DUPLICATE_IN_UPLOAD}'
+            FROM (
+                SELECT ctid AS row_ctid, row_number() OVER (
+                    PARTITION BY uid::uuid, tanggal_checkup ORDER BY sheet DESC, row_no DESC
+                ) AS n
+                FROM checkup_stage WHERE reason IS NULL
+            ) d
+            WHERE s.ctid = d.row_ctid AND d.n > 1
+        """))
+
+        rejected = conn.execute(text(
+            "SELECT sheet, row_no, reason FROM checkup_stage WHERE reason IS NOT NULL ORDER BY sheet, row_no"
+        )).fetchall()
+
+        # Partitions for the years in this chunk (see db/partitions.py)
+        ensure_checkup_partitions(conn, conn.execute(text(
+            "SELECT DISTINCT EXTRACT(YEAR FROM tanggal_checkup)::int FROM checkup_stage WHERE reason IS NULL"
+        )).scalars().all())
+
+        candidates, existing = conn.execute(text("""
+            SELECT COUNT(*), COUNT(c.checkup_id) FROM checkup_stage s
+            LEFT JOIN checkups c ON c.uid = s.uid::uuid AND c.tanggal_checkup = s.tanggal_checkup
+            WHERE s.reason IS NULL
+        """)).fetchone()
+        written = conn.execute(text(f"""
+            WITH written AS (
+                INSERT INTO checkups (
+                    uid, tanggal_checkup, tanggal_lahir, umur, {', '.join(MEASUREMENT_COLS)}, lokasi_id,
+                    batch_id, written_at
+                )
+                SELECT uid::uuid, tanggal_checkup, tanggal_lahir, umur::integer, {measurements}, l.id,
+                       CAST(:batch_id AS uuid),
+                       -- every row of an upload counts as written when the upload started
+                       COALESCE((SELECT started_at FROM upload_batches WHERE batch_id = CAST(:batch_id AS uuid)), NOW())
+                FROM checkup_stage
+                -- lokasi is lowercased by clean_checkup_sheet; lokasi_key ignores case
+                LEFT JOIN lokasi l ON lokasi_key(l.name) = lokasi_key(checkup_stage.lokasi)
+                WHERE reason IS NULL
+                ORDER BY sheet, row_no
+                {on_conflict_sql(policy)}
+                RETURNING checkup_id, uid, tanggal_checkup, lokasi_id
+            ),
+            -- A lokasi matching no lokasi row is stored as NULL and kept in lokasi_unmatched,
+            -- as migration 9 does (python -m db.lokasi --remap maps it once the lokasi exists)
+            unmatched AS (
+                INSERT INTO lokasi_unmatched (source, row_id, value)
+                SELECT 'checkups', w.checkup_id::text, s.lokasi
+                FROM written w JOIN checkup_stage s
+                  ON s.uid::uuid = w.uid AND s.tanggal_checkup = w.tanggal_checkup AND s.reason IS NULL
+                WHERE w.lokasi_id IS NULL AND btrim(coalesce(s.lokasi, '')) <> ''
+                ON CONFLICT (source, row_id) DO UPDATE SET value = EXCLUDED.value
+            ),
+            rematched AS (
+                DELETE FROM lokasi_unmatched u USING written w
+                WHERE u.source = 'checkups' AND u.row_id = w.checkup_id::text AND w.lokasi_id IS NOT NULL
+            )
+            SELECT COUNT(*) FROM written
+        """), {'batch_id': batch_id}).scalar()
+        inserted = candidates - existing
+
+        if checkpoint:
+            _advance_checkpoint(conn, checkpoint, inserted, len(rejected))
+
+    skipped = [{'sheet': sheet, 'row': row_no, 'reason': reason} for sheet, row_no, reason in rejected]
+    return {'inserted': inserted, 'updated': written - inserted, 'unchanged': existing - (written - inserted),
+            'skipped': skipped}
 
 # -----------------------------
 # Main parser and uploader
 # -----------------------------
-def parse_checkup_xls(file_path):
-    all_sheets = pd.read_excel(file_path, sheet_name=None, dtype=str)  # read all as str to clean easily
-    inserted = 0
-    skipped = []
-
-    for sheet_name, df in all_sheets.items():
-        # Normalize columns
-        df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
-
-        # Fill missing 'lokasi' with sheet name
-        if 'lokasi' not in df.columns or df['lokasi'].isnull().all():
-            df['lokasi'] = sheet_name
-
-        # Fill missing 'tanggal_checkup' with today
-        if 'tanggal_checkup' not in df.columns:
-            df['tanggal_checkup'] = pd.Timestamp.today().date()
-
-        # Clean UID
-        df['uid'] = df['uid'].astype(str).str.strip()
-        df = df[df['uid'].notna() & (df['uid'] != 'nan')]
-
-        # Convert text columns
-        for col in ['nama', 'jabatan', 'lokasi']:
-            if col in df.columns:
-                df[col] = df[col].apply(normalize_string)
-
-        # Convert numeric fields
-        numeric_cols = ['tinggi','berat','lingkar_perut','gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat','umur','bmi']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = df[col].str.replace(',', '.').apply(safe_float)
-
-        # Convert dates
-        for col in ['tanggal_lahir', 'tanggal_checkup']:
-            if col in df.columns:
-                df[col] = df[col].apply(lambda x: safe_date(pd.to_datetime(x, dayfirst=True, errors='coerce')))
-
-        # Iterate rows
-        for idx, row in df.iterrows():
-            row_dict = row.to_dict()
-            uid = row_dict.get('uid')
-            if not uid or not get_employee_by_uid(uid):
-                skipped.append({'row': idx+2, 'reason': 'UID not found in database'})
-                continue
-
-            try:
-                tinggi_cm = row_dict.get('tinggi')
-                berat = row_dict.get('berat')
-                tinggi_m = (tinggi_cm / 100) if tinggi_cm else None
-                bmi = round(berat / (tinggi_m ** 2), 2) if berat and tinggi_m else row_dict.get('bmi')
-
-                checkup_data = {
-                    'uid': uid,
-                    'tanggal_checkup': row_dict.get('tanggal_checkup') or pd.Timestamp.today().date(),
-                    'tanggal_lahir': row_dict.get('tanggal_lahir'),
-                    'umur': row_dict.get('umur'),
-                    'tinggi': tinggi_cm,
-                    'berat': berat,
-                    'lingkar_perut': row_dict.get('lingkar_perut'),
-                    'bmi': bmi,
-                    'gula_darah_puasa': row_dict.get('gula_darah_puasa'),
-                    'gula_darah_sewaktu': row_dict.get('gula_darah_sewaktu'),
-                    'cholesterol': row_dict.get('cholesterol'),
-                    'asam_urat': row_dict.get('asam_urat'),
-                    'lokasi': row_dict.get('lokasi') or sheet_name
+def clean_sheet_payloads(path, sheet_name, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Worker task: stream one sheet, clean each chunk and yield it as
+    (last Excel row of the chunk, COPY payload text or None when nothing is left).
+    Payload text is far smaller to send back than the DataFrames.
+    """
+    for _, chunk in iter_sheet_chunks(path, chunk_rows=chunk_rows, dtype=str, sheets=[sheet_name]):  # read all as str to clean easily
+        last_row = int(chunk.index.max()) + 2
+        cleaned = clean_checkup_sheet(chunk, sheet_name)
+        yield last_row, None if cleaned.empty else _copy_payload(cleaned).getvalue()
+
+def _insert_file(file_hash, batch_id, chunks, on_progress=None):
+    """
+    Insert one file's (sheet, last_row, payload) chunks as they arrive; each chunk
+    commits with its checkpoint, so a re-upload of the same file resumes at the
+    first unfinished chunk.
+    on_progress(rows_done, skipped) is called after every committed chunk.
+    """
+    committed = get_upload_progress(file_hash)
+    result = {
+        'inserted': 0,
+        'updated': 0,
+        'unchanged': 0,
+        'skipped': [],
+        'previously_inserted': sum(inserted for _, inserted, _ in committed.values()),
+        'batch_id': batch_id,
+        'already_uploaded': False,
+    }
+    for sheet, last_row, payload in chunks:
+        if last_row <= committed.get(sheet, (0, 0, 0))[0]:
+            continue
+        chunk_result = insert_checkup_payloads(
+            [io.StringIO(payload)] if payload else [],
+            checkpoint=(file_hash, sheet, last_row),
+            batch_id=batch_id
+        )
+        for key in ('inserted', 'updated', 'unchanged', 'skipped'):
+            result[key] += chunk_result[key]
+        if on_progress:
+            rows_done = result['inserted'] + result['updated'] + result['unchanged'] + len(result['skipped'])
+            on_progress(rows_done, len(result['skipped']))
+
+    finish_batch(
+        batch_id,
+        inserted=result['previously_inserted'] + result['inserted'],
+        updated=result['updated'],
+        skipped=sum(skipped for _, _, skipped in committed.values()) + len(result['skipped'])
+    )
+    return result
+
+def parse_checkup_files(sources, chunk_rows=DEFAULT_CHUNK_ROWS, on_progress=None, uploaded_by=None):
+    """
+    Parse several checkup workbooks (paths or uploaded buffers) at once.
+    Every sheet of every file is cleaned in the upload process pool and each cleaned
+    chunk is inserted as soon as it is ready, files and sheets in order; workers run
+    only a few chunks ahead of the inserter (utils/worker_pool.stream_sheets).
+    Chunks an earlier upload of the same bytes already committed are skipped, and
+    files the upload_batches ledger marks as done are not parsed at all.
+    Returns one result dict per source, in the order given; 'previously_inserted'
+    counts rows that earlier attempts committed.
+    on_progress(rows_done, skipped) reports the file currently being inserted.
+    """
+    results = [None] * len(sources)
+    with ExitStack() as stack:
+        pending = []
+        for i, src in enumerate(sources):
+            path = stack.enter_context(local_copy(src))
+            file_hash = file_digest(path)
+            batch = start_batch('checkup', file_hash, file_name=os.path.basename(path), uploaded_by=uploaded_by)
+            if batch['status'] == 'done':
+                results[i] = {
+                    'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': [],
+                    'previously_inserted': batch['rows_inserted'],
+                    'batch_id': batch['batch_id'], 'already_uploaded': True,
                 }
-                insert_medical_checkup(**checkup_data)
-                inserted += 1
-            except Exception as e:
-                skipped.append({'row': idx+2, 'reason': str(e)})
+            else:
+                pending.append((i, path, file_hash, batch['batch_id']))
+
+        chunks = stack.enter_context(closing(stream_sheets(
+            clean_sheet_payloads, [path for _, path, _, _ in pending], chunk_rows
+        )))
+        for index, file_chunks in groupby(chunks, key=lambda chunk: chunk[0]):
+            i, _, file_hash, batch_id = pending[index]
+            results[i] = _insert_file(
+                file_hash, batch_id,
+                ((sheet, last_row, payload) for _, sheet, (last_row, payload) in file_chunks),
+                on_progress
+            )
 
-    return {'inserted': inserted, 'skipped': skipped}
+    # Files without a single data row still close their batch
+    for i, _, file_hash, batch_id in pending:
+        if results[i] is None:
+            results[i] = _insert_file(file_hash, batch_id, [], on_progress)
+    return results
 
+def parse_checkup_xls(source, chunk_rows=DEFAULT_CHUNK_ROWS, on_progress=None, uploaded_by=None):
+    """Parse and insert one checkup workbook (path or uploaded buffer)."""
+    return parse_checkup_files(
+        [source], chunk_rows=chunk_rows, on_progress=on_progress, uploaded_by=uploaded_by
+    )[0]
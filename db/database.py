@@ -1,7 +1,8 @@
 # db/database.py
 import bcrypt
 from sqlalchemy import create_engine, text
-from config.settings import POSTGRES_URL, DEFAULT_USERS
+from config.settings import POSTGRES_URL, DEFAULT_USERS, INITIAL_LOKASI
+from db.migrations import run_migrations
 
 # ---------------------------------------------------------------------
 # CONNECTION
@@ -29,55 +30,19 @@ def get_engine():
 # ---------------------------------------------------------------------
 def init_db():
     """
-    Initialize PostgreSQL schema:
+    Bring the PostgreSQL schema up to date (see db/migrations.py):
+    - upload_batches (ledger of processed upload files)
     - karyawan   (from Manager XLS upload)
     - checkups   (from Nurse data entry)
+    - upload_checkpoints (resume point of chunked checkup uploads)
+    - jobs       (background upload queue, see db/jobs.py)
     - users      (for auth, with DEFAULT_USERS bootstrapped)
+    - lokasi     (seeded from INITIAL_LOKASI)
     """
     engine = get_engine()
-    with engine.begin() as conn:  # <-- begin() automatically commits/rollbacks
-        # --- Karyawan master table ---
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS karyawan (
-                uid UUID PRIMARY KEY,
-                username TEXT NOT NULL,
-                jabatan TEXT,
-                lokasi TEXT,
-                tanggal_lahir DATE
-            )
-        """))
-
-        # --- Checkups table ---
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS checkups (
-                checkup_id SERIAL PRIMARY KEY,
-                uid UUID NOT NULL REFERENCES karyawan(uid) ON DELETE CASCADE,
-                tanggal_checkup DATE NOT NULL,
-                tanggal_lahir DATE,
-                umur INTEGER,
-                tinggi NUMERIC(5,2),
-                berat NUMERIC(5,2),
-                lingkar_perut NUMERIC(5,2),
-                bmi NUMERIC(5,2),
-                gula_darah_puasa NUMERIC(5,2),
-                gula_darah_sewaktu NUMERIC(5,2),
-                cholesterol NUMERIC(5,2),
-                asam_urat NUMERIC(5,2),
-                status VARCHAR(50)
-            )
-        """))
-
-        # --- Users table ---
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(100) NOT NULL UNIQUE,
-                password TEXT,
-                role VARCHAR(50) NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """))
+    applied = run_migrations(engine)
 
+    with engine.begin() as conn:  # <-- begin() automatically commits/rollbacks
         # --- Insert default users if table is empty ---
         result = conn.execute(text("SELECT COUNT(*) FROM users")).fetchone()
         if result[0] == 0:
@@ -88,6 +53,14 @@ def init_db():
                     {"u": username, "p": hashed_pw, "r": role}
                 )
 
+        # --- Seed lokasi if table is empty ---
+        result = conn.execute(text("SELECT COUNT(*) FROM lokasi")).fetchone()
+        if result[0] == 0:
+            for loc in INITIAL_LOKASI:
+                conn.execute(text("INSERT INTO lokasi (name) VALUES (:name)"), {"name": loc})
+
+    if applied:
+        print(f"🛠️ Applied schema migrations: {applied}")
     print("✅ Database initialized successfully!")
 
 # ---------------------------------------------------------------------
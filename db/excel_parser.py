@@ -1,14 +1,15 @@
 # db/excel_parser.py
 # --- keep existing imports ---
+import os
 import pandas as pd
-import uuid
-from db.queries import (
-    add_employee_from_sheet as insert_karyawan_if_not_exists,
-)
+from contextlib import ExitStack
+from db.queries import diff_karyawan_master, upsert_karyawan_master, start_batch, finish_batch
 from db.helpers import validate_lokasi
+from utils.excel_reader import iter_sheet_chunks, local_copy, file_digest, combined_digest
+from utils.worker_pool import map_sheets
 
 # NEW: import checkup uploader
-from db.checkup_uploader import parse_checkup_xls
+from db.checkup_uploader import parse_checkup_xls, to_date
 
 # ✅ FIXED: must be dict, not set
 DB_COLUMNS = {
@@ -33,13 +34,13 @@ def map_columns(df):
             mapped[db_col] = None
     return mapped
 
-def parse_master_karyawan(file_path):
-    """Upload only master karyawan data, assign UID."""
-    all_sheets = pd.read_excel(file_path, sheet_name=None)
-    inserted, skipped = 0, 0
-    batch_id = str(uuid.uuid4())
-
-    for sheet_name, sheet_df in all_sheets.items():
+def load_master_sheet(path, sheet_name):
+    """
+    Worker task: stream one sheet of a master file into nama / jabatan /
+    lokasi (= sheet name) / tanggal_lahir. Returns (frame or None, skipped).
+    """
+    frames, skipped = [], 0
+    for _, sheet_df in iter_sheet_chunks(path, sheets=[sheet_name]):
         col_map = map_columns(sheet_df)
         rename_dict = {v: k for k, v in col_map.items() if v}
         sheet_df = sheet_df.rename(columns=rename_dict)
@@ -49,30 +50,95 @@ def parse_master_karyawan(file_path):
         sheet_df = sheet_df[cols_to_keep]
 
         # Drop rows missing mandatory master fields
+        before = len(sheet_df)
         sheet_df = sheet_df.dropna(
             subset=[c for c in MANDATORY_FIELDS_MASTER if c in sheet_df.columns]
         )
-        sheet_df = sheet_df.where(pd.notnull(sheet_df), None)
-
-        for _, row in sheet_df.iterrows():
-            nama = str(row.get("nama")).strip()
-            jabatan = str(row.get("jabatan")).strip() if row.get("jabatan") else None
-            lokasi = sheet_name
-
-            if not validate_lokasi(lokasi):
-                skipped += 1
-                continue
-
-            uid = insert_karyawan_if_not_exists(
-                nama=nama,
-                jabatan=jabatan,
-                sheet_name=lokasi,
-                tanggal_lahir=row.get("tanggal_lahir"),
-                batch_id=batch_id,
-            )
-            inserted += 1
-
-    return {"inserted": inserted, "skipped": skipped, "batch_id": batch_id}
+        skipped += before - len(sheet_df)
+
+        if not validate_lokasi(sheet_name) or "nama" not in sheet_df.columns:
+            skipped += len(sheet_df)
+            continue
+
+        # Only the four master columns of each chunk are kept
+        frame = pd.DataFrame({
+            "nama": sheet_df["nama"].astype(str).str.strip(),
+            "jabatan": sheet_df["jabatan"].astype(str).str.strip() if "jabatan" in sheet_df.columns else None,
+            "lokasi": sheet_name,
+            "tanggal_lahir": to_date(sheet_df["tanggal_lahir"]).dt.date if "tanggal_lahir" in sheet_df.columns else None,
+        }, index=sheet_df.index)
+        frames.append(frame)
+
+    return (pd.concat(frames) if frames else None), skipped
+
+def load_master_karyawan(sources):
+    """
+    Read every sheet of one or more master files (paths or uploaded buffers) into one
+    frame of nama / jabatan / lokasi (= sheet name) / tanggal_lahir, unique by natural key.
+    Sheets are parsed in the upload process pool; later files / sheets / rows win.
+    Returns (df, skipped) where skipped counts dropped rows.
+    """
+    if not isinstance(sources, (list, tuple)):
+        sources = [sources]
+
+    with ExitStack() as stack:
+        paths = [stack.enter_context(local_copy(src)) for src in sources]
+        per_file = map_sheets(load_master_sheet, paths)
+
+    frames, skipped = [], 0
+    for sheet_results in per_file:
+        for _, (frame, sheet_skipped) in sheet_results:
+            skipped += sheet_skipped
+            if frame is not None:
+                frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=["nama", "jabatan", "lokasi", "tanggal_lahir"]), skipped
+
+    df = pd.concat(frames, ignore_index=True)
+
+    # Unparseable birth dates count as missing
+    if "tanggal_lahir" in MANDATORY_FIELDS_MASTER:
+        valid = df["tanggal_lahir"].notna()
+        skipped += int((~valid).sum())
+        df = df[valid]
+
+    # Later rows win when a person appears twice (same normalized nama + jabatan)
+    natural_key = [df["nama"].str.strip().str.lower(), df["jabatan"].fillna("").str.strip().str.lower()]
+    duplicated = pd.DataFrame({"n": natural_key[0], "j": natural_key[1]}).duplicated(keep="last")
+    skipped += int(duplicated.sum())
+    return df[~duplicated].reset_index(drop=True), skipped
+
+def preview_master_karyawan(sources):
+    """Diff one or more master files against karyawan without writing anything."""
+    df, skipped = load_master_karyawan(sources)
+    diff = diff_karyawan_master(df)
+    diff["skipped"] = skipped
+    return diff
+
+def parse_master_karyawan(sources, uploaded_by=None):
+    """
+    Upload only master karyawan data, assign UID to new rows and update changed ones.
+    The upload is recorded in upload_batches; a file that was fully imported before
+    is skipped without being parsed.
+    """
+    if not isinstance(sources, (list, tuple)):
+        sources = [sources]
+
+    with ExitStack() as stack:
+        paths = [stack.enter_context(local_copy(src)) for src in sources]
+        batch = start_batch(
+            "master", combined_digest([file_digest(path) for path in paths]),
+            file_name=", ".join(os.path.basename(path) for path in paths), uploaded_by=uploaded_by
+        )
+        if batch["status"] == "done":
+            return {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0,
+                    "batch_id": batch["batch_id"], "already_uploaded": True}
+        df, skipped = load_master_karyawan(paths)
+
+    result = upsert_karyawan_master(df, batch_id=batch["batch_id"])
+    finish_batch(batch["batch_id"], inserted=result["inserted"], updated=result["updated"], skipped=skipped)
+    return {**result, "skipped": skipped, "batch_id": batch["batch_id"], "already_uploaded": False}
 
 
 
@@ -0,0 +1,77 @@
+# db/health_rules.py
+"""
+The Well / Unwell rule, defined once. A checkup is Unwell when any vital in
+UNWELL_RULES is past its threshold; missing vitals count as Well.
+
+    compute_status(df)       vectorized pandas evaluation (one "Well"/"Unwell" per row)
+    status_sql("NEW.")       the same rule as a SQL CASE expression
+    highlight_unwell(df)     Styler.apply(..., axis=None) colours for the tables
+
+Postgres stores checkups.status on every write (set_checkup_status, built from
+status_sql). Changing a threshold here therefore needs a new migration with
+status_rule_steps(), which re-creates the trigger function and backfills the
+rows whose status changes.
+"""
+import operator
+import pandas as pd
+
+# (column, operator, threshold): any match makes the checkup Unwell
+UNWELL_RULES = [
+    ("gula_darah_puasa", ">", 120),
+    ("gula_darah_sewaktu", ">", 200),
+    ("cholesterol", ">", 240),
+    ("asam_urat", ">", 7),
+    ("bmi", ">=", 30),
+]
+# Shown in red in the tables, but not part of the status
+HIGHLIGHT_ONLY_RULES = [
+    ("lingkar_perut", ">", 90),
+]
+
+_OPS = {">": operator.gt, ">=": operator.ge}
+HIGHLIGHT_STYLE = "color: red"
+
+def _rule_mask(df, rule):
+    column, op, threshold = rule
+    if column not in df.columns:
+        return pd.Series(False, index=df.index)
+    return _OPS[op](pd.to_numeric(df[column], errors="coerce"), threshold)   # NaN compares False
+
+def unwell_mask(df) -> pd.Series:
+    """True for the rows of df that are Unwell."""
+    mask = pd.Series(False, index=df.index)
+    for rule in UNWELL_RULES:
+        mask |= _rule_mask(df, rule)
+    return mask
+
+def compute_status(df) -> pd.Series:
+    """'Well' / 'Unwell' for every row of df, as stored in checkups.status."""
+    return unwell_mask(df).map({True: "Unwell", False: "Well"})
+
+def status_sql(prefix="") -> str:
+    """The rule as a SQL expression over the checkups columns, e.g. status_sql("NEW.")."""
+    conditions = " OR ".join(f"{prefix}{column} {op} {threshold}" for column, op, threshold in UNWELL_RULES)
+    return f"CASE WHEN {conditions} THEN 'Unwell' ELSE 'Well' END"
+
+def status_rule_steps():
+    """Migration steps that install the current rule and backfill checkups.status."""
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION set_checkup_status() RETURNS trigger AS $$
+        BEGIN
+            NEW.status := {status_sql("NEW.")};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # Only rows whose status changes are rewritten; the trigger recomputes them
+        f"UPDATE checkups SET status = NULL WHERE status IS DISTINCT FROM {status_sql()}",
+    ]
+
+def highlight_unwell(df) -> pd.DataFrame:
+    """Cell styles for df (Styler.apply(highlight_unwell, axis=None)): red where a rule matches."""
+    styles = pd.DataFrame("", index=df.index, columns=df.columns)
+    for rule in UNWELL_RULES + HIGHLIGHT_ONLY_RULES:
+        if rule[0] in df.columns:
+            styles.loc[_rule_mask(df, rule), rule[0]] = HIGHLIGHT_STYLE
+    return styles
@@ -3,11 +3,13 @@ from db.database import get_engine
 from sqlalchemy import text
 import pandas as pd
 from db.queries import get_employees, get_latest_medical_checkup
+from db.cache import cached
 
 # ---------------------------
 # Lokasi Helpers
 # ---------------------------
 
+@cached("lokasi")
 def get_all_lokasi():
     """
     Return a list of all lokasi names in the database, sorted alphabetically.
@@ -54,13 +56,17 @@ def sanitize_df_for_display(df: pd.DataFrame) -> pd.DataFrame:
 # Dashboard / Tab Helpers
 # ---------------------------
 
-def get_dashboard_checkup_data() -> pd.DataFrame:
+def get_dashboard_checkup_data(employees_df=None, latest_checkup_df=None) -> pd.DataFrame:
     """
     Return the combined employees + latest_checkup DataFrame,
     ready for Tab1/Subtab1 and Tab6/Subtab1 in Manager Interface.
+    Pass frames already loaded in this rerun to skip fetching them again;
+    they are not modified.
     """
-    employees_df = get_employees()
-    latest_checkup_df = get_latest_medical_checkup()
+    if employees_df is None:
+        employees_df = get_employees()
+    if latest_checkup_df is None:
+        latest_checkup_df = get_latest_medical_checkup()
     if latest_checkup_df is None or latest_checkup_df.empty:
         latest_checkup_df = pd.DataFrame()
 
@@ -95,41 +101,12 @@ def get_dashboard_checkup_data() -> pd.DataFrame:
         if col not in df_combined.columns:
             df_combined[col] = None
 
-    # Add status column
-    df_combined['status'] = 'Well'
-    df_combined.loc[
-        (df_combined['gula_darah_puasa'] > 120) |
-        (df_combined['gula_darah_sewaktu'] > 200) |
-        (df_combined['cholesterol'] > 240) |
-        (df_combined['asam_urat'] > 7) |
-        (df_combined['bmi'] >= 30),
-        'status'
-    ] = 'Unwell'
-
-    # Extract month/year for filtering
-    if 'tanggal_checkup' in df_combined.columns:
-        df_combined['bulan'] = pd.to_datetime(df_combined['tanggal_checkup'], errors='coerce').dt.month.fillna(0).astype(int)
-        df_combined['tahun'] = pd.to_datetime(df_combined['tanggal_checkup'], errors='coerce').dt.year.fillna(0).astype(int)
-    else:
-        df_combined['bulan'] = 0
-        df_combined['tahun'] = 0
+    # status / tahun / bulan are stored on checkups; karyawan without a checkup are Well, 0 / 0
+    for col, default in (("status", "Well"), ("tahun", 0), ("bulan", 0)):
+        if col not in df_combined.columns:
+            df_combined[col] = default
+    df_combined["status"] = df_combined["status"].fillna("Well")
+    df_combined["tahun"] = df_combined["tahun"].fillna(0).astype(int)
+    df_combined["bulan"] = df_combined["bulan"].fillna(0).astype(int)
 
     return df_combined
-
-
-def get_medical_checkups_by_uid(uid: str) -> pd.DataFrame:
-    """
-    Fetch all medical checkups for a given employee UID.
-    Returns a DataFrame filtered for that UID only.
-    """
-    # Use existing helper to get combined data
-    df = get_dashboard_checkup_data()  # fetch all employees + latest checkup
-    # Filter by UID
-    if 'uid' in df.columns:
-        df = df[df['uid'] == uid].copy()
-    else:
-        df = pd.DataFrame()
-    return df
-
-
-
@@ -5,6 +5,6 @@ from db.database import init_db
 # SCRIPT ENTRY POINT
 # ---------------------------------------------------------------------
 if __name__ == "__main__":
-    # Initialize all tables: users, karyawan, checkups, lokasi
+    # Apply pending schema migrations and seed users / lokasi
     init_db()
     print("✅ All tables initialized and seeded successfully!")
@@ -0,0 +1,142 @@
+# db/jobs.py
+import json
+import pandas as pd
+from sqlalchemy import text
+from db.database import get_engine
+
+# Job kinds handled by upload_worker.py
+JOB_KINDS = ("checkup", "master")
+
+# A running job whose worker has not reported for this long is handed to another worker
+STALE_AFTER_SECONDS = 300
+# How often a worker marks its running job as alive (well under STALE_AFTER_SECONDS)
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 3
+
+# ---------------------------
+# Enqueue (Streamlit side)
+# ---------------------------
+def enqueue_job(kind, files, created_by=None) -> int:
+    """
+    Queue uploaded files, a list of (file_name, bytes), as one job for a background
+    worker; returns job_id. The worker parses them together, in the order given.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if not files:
+        raise ValueError("A job needs at least one file")
+    with get_engine().begin() as conn:
+        job_id = conn.execute(text("""
+            INSERT INTO jobs (kind, file_name, created_by)
+            VALUES (:kind, :file_name, :created_by)
+            RETURNING job_id
+        """), {"kind": kind, "file_name": ", ".join(name for name, _ in files), "created_by": created_by}).scalar()
+        conn.execute(text("""
+            INSERT INTO job_files (job_id, position, file_name, file_data)
+            VALUES (:job_id, :position, :file_name, :file_data)
+        """), [{"job_id": job_id, "position": i, "file_name": name, "file_data": data}
+               for i, (name, data) in enumerate(files)])
+    return job_id
+
+def get_recent_jobs(kind, created_by=None, limit=10) -> pd.DataFrame:
+    """
+    Compact progress rows (no file bytes, no result payload) of the latest jobs,
+    cheap enough to poll every couple of seconds.
+    """
+    with get_engine().connect() as conn:
+        return pd.read_sql(text("""
+            SELECT job_id, file_name, status, rows_done, skipped,
+                   COALESCE((result->>'previously_inserted')::int, 0) AS previously_inserted,
+                   COALESCE((result->>'updated')::int, 0) AS updated,
+                   round((rows_done / NULLIF(EXTRACT(EPOCH FROM
+                       COALESCE(finished_at, heartbeat_at) - started_at), 0))::numeric, 1) AS rows_per_sec,
+                   error, created_at, finished_at
+            FROM jobs
+            WHERE kind = :kind AND (CAST(:created_by AS TEXT) IS NULL OR created_by = :created_by)
+            ORDER BY job_id DESC
+            LIMIT :limit
+        """), conn, params={"kind": kind, "created_by": created_by, "limit": limit})
+
+def get_job_result(job_id):
+    """The result dict a finished job stored (e.g. inserted / skipped rows), or None."""
+    with get_engine().connect() as conn:
+        return conn.execute(text("SELECT result FROM jobs WHERE job_id = :job_id"), {"job_id": job_id}).scalar()
+
+# ---------------------------
+# Claim / report (worker side)
+# ---------------------------
+def requeue_stale_jobs(stale_after=STALE_AFTER_SECONDS) -> int:
+    """
+    Put running jobs whose worker stopped reporting back in the queue (checkup
+    uploads resume from their checkpoints); give up after MAX_ATTEMPTS.
+    """
+    with get_engine().begin() as conn:
+        return conn.execute(text("""
+            UPDATE jobs
+            SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'queued' END,
+                error = CASE WHEN attempts >= :max_attempts THEN 'Worker stopped responding' ELSE error END,
+                finished_at = CASE WHEN attempts >= :max_attempts THEN NOW() ELSE NULL END
+            WHERE status = 'running'
+              AND heartbeat_at < NOW() - make_interval(secs => :stale_after)
+        """), {"max_attempts": MAX_ATTEMPTS, "stale_after": stale_after}).rowcount
+
+def claim_job(worker):
+    """
+    Take the oldest queued job. SKIP LOCKED lets any number of workers, on any
+    host, poll the same table without blocking on or double-claiming a job.
+    Returns dict(job_id, kind, file_name, files, created_by) or None when the queue
+    is empty; files is the job's [(file_name, bytes)] in upload order.
+    """
+    with get_engine().begin() as conn:
+        row = conn.execute(text("""
+            WITH next_job AS (
+                SELECT job_id FROM jobs
+                WHERE status = 'queued'
+                ORDER BY job_id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            UPDATE jobs j
+            SET status = 'running', worker = :worker, attempts = j.attempts + 1,
+                started_at = NOW(), heartbeat_at = NOW()
+            FROM next_job
+            WHERE j.job_id = next_job.job_id
+            RETURNING j.job_id, j.kind, j.file_name, j.created_by
+        """), {"worker": worker}).mappings().fetchone()
+        if row is None:
+            return None
+        files = conn.execute(text(
+            "SELECT file_name, file_data FROM job_files WHERE job_id = :job_id ORDER BY position"
+        ), {"job_id": row["job_id"]}).fetchall()
+    return {**row, "files": [(name, bytes(data)) for name, data in files]}
+
+def report_progress(job_id, rows_done, skipped):
+    """Progress + heartbeat; called by the worker after every committed chunk."""
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            UPDATE jobs SET rows_done = :rows_done, skipped = :skipped, heartbeat_at = NOW()
+            WHERE job_id = :job_id
+        """), {"job_id": job_id, "rows_done": rows_done, "skipped": skipped})
+
+def heartbeat_job(job_id):
+    """Mark a running job as alive without touching its progress."""
+    with get_engine().begin() as conn:
+        conn.execute(text("UPDATE jobs SET heartbeat_at = NOW() WHERE job_id = :job_id"), {"job_id": job_id})
+
+def finish_job(job_id, result):
+    """Mark a job done, store its result and drop the file bytes."""
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            UPDATE jobs
+            SET status = 'done', result = CAST(:result AS JSONB),
+                heartbeat_at = NOW(), finished_at = NOW()
+            WHERE job_id = :job_id
+        """), {"job_id": job_id, "result": json.dumps(result, default=str)})
+        conn.execute(text("DELETE FROM job_files WHERE job_id = :job_id"), {"job_id": job_id})
+
+def fail_job(job_id, error):
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            UPDATE jobs SET status = 'failed', error = :error, heartbeat_at = NOW(), finished_at = NOW()
+            WHERE job_id = :job_id
+        """), {"job_id": job_id, "error": str(error)})
@@ -0,0 +1,84 @@
+# db/karyawan_duplicates.py
+"""
+One karyawan per normalized (nama, jabatan): karyawan_natural_key_idx
+(migration 2) is unique on lower(btrim(nama)), lower(btrim(coalesce(jabatan, ''))).
+Rows stored before the index existed that differ only in case or surrounding
+whitespace are merged by migration 2, right before it builds the index, with
+the same statements as:
+
+    python -m db.karyawan_duplicates           # list duplicate karyawan
+    python -m db.karyawan_duplicates --apply   # merge them
+
+Each group keeps one row (the one with the most checkups, then the lowest uid);
+the checkups of the others are re-pointed to it and the others deleted. Every
+merged row is recorded in karyawan_merges (uid -> kept_uid), which is the
+report of what a migration merged.
+"""
+import sys
+from sqlalchemy import text
+
+NATURAL_KEY = "lower(btrim(nama)), lower(btrim(coalesce(jabatan, '')))"
+
+# Every karyawan but the kept one of each natural key, with the uid it merges into
+_DUPLICATES = f"""
+    SELECT uid, kept_uid, nama, jabatan FROM (
+        SELECT uid, nama, jabatan,
+               first_value(uid) OVER w AS kept_uid,
+               row_number() OVER w AS n
+        FROM (
+            SELECT k.uid, k.nama, k.jabatan,
+                   (SELECT COUNT(*) FROM checkups c WHERE c.uid = k.uid) AS checkups
+            FROM karyawan k
+        ) k
+        WINDOW w AS (PARTITION BY {NATURAL_KEY} ORDER BY checkups DESC, uid)
+    ) ranked WHERE n > 1
+"""
+
+# Each step is safe to re-run: migration 2 runs online, one step at a time
+MERGE_KARYAWAN_STEPS = [
+    """
+    CREATE TABLE IF NOT EXISTS karyawan_merges (
+        uid UUID PRIMARY KEY,
+        kept_uid UUID NOT NULL,
+        nama TEXT,
+        jabatan TEXT,
+        merged_at TIMESTAMP DEFAULT NOW()
+    )
+    """,
+    f"""
+    INSERT INTO karyawan_merges (uid, kept_uid, nama, jabatan)
+    SELECT uid, kept_uid, nama, jabatan FROM ({_DUPLICATES}) d
+    ON CONFLICT (uid) DO NOTHING
+    """,
+    "UPDATE checkups c SET uid = m.kept_uid FROM karyawan_merges m WHERE c.uid = m.uid",
+    "DELETE FROM karyawan k USING karyawan_merges m WHERE k.uid = m.uid",
+]
+
+def find_duplicate_karyawan() -> list:
+    """(nama, jabatan, uid, kept_uid) of every row merge_duplicate_karyawan() would merge away."""
+    from db.database import get_engine   # db.database imports this module through db.migrations
+    with get_engine().connect() as conn:
+        return conn.execute(text(
+            f"SELECT nama, jabatan, uid, kept_uid FROM ({_DUPLICATES}) d ORDER BY {NATURAL_KEY}, uid"
+        )).fetchall()
+
+def merge_duplicate_karyawan() -> int:
+    """Merge every duplicate karyawan into the kept row of its natural key. Returns the rows merged."""
+    from db.database import get_engine
+    with get_engine().begin() as conn:
+        before = conn.execute(text("SELECT COUNT(*) FROM karyawan")).scalar()
+        for step in MERGE_KARYAWAN_STEPS:
+            conn.execute(text(step))
+        return before - conn.execute(text("SELECT COUNT(*) FROM karyawan")).scalar()
+
+# ---------------------------------------------------------------------
+# SCRIPT ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    if "--apply" in sys.argv[1:]:
+        print(f"✅ {merge_duplicate_karyawan()} duplicate karyawan merged")
+    else:
+        duplicates = find_duplicate_karyawan()
+        for nama, jabatan, uid, kept_uid in duplicates:
+            print(f"{nama!r} / {jabatan!r}: {uid} -> {kept_uid}")
+        print(f"🔍 {len(duplicates)} duplicate karyawan; run with --apply to merge them")
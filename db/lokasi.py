@@ -0,0 +1,100 @@
+# db/lokasi.py
+"""
+karyawan.lokasi_id and checkups.lokasi_id point at lokasi.id (migration 9);
+the name lives only in the lokasi table, so a rename is a one-row update.
+Free-text names (sheet names, form values) are matched with lokasi_key(),
+which ignores case and extra whitespace.
+
+checkups.lokasi strings that match no lokasi (found by migration 9, or in a
+checkup upload) are kept in lokasi_unmatched:
+
+    python -m db.lokasi           # list unmatched strings
+    python -m db.lokasi --remap   # match them again, e.g. after adding the lokasi
+"""
+import sys
+import pandas as pd
+from sqlalchemy import text
+from db.database import get_engine
+from db.cache import cached
+
+def ensure_lokasi(conn, names):
+    """
+    Add the names (e.g. master sheet names) that match no lokasi yet, on conn.
+    When every name is known nothing is written: even an INSERT adding no row
+    would bump the lokasi data_version and drop every cached lokasi read.
+    """
+    names = sorted({name.strip() for name in names if isinstance(name, str) and name.strip()})
+    if not names:
+        return
+    missing = conn.execute(text("""
+        SELECT n FROM unnest(CAST(:names AS text[])) AS n
+        WHERE NOT EXISTS (SELECT 1 FROM lokasi l WHERE lokasi_key(l.name) = lokasi_key(n))
+    """), {"names": names}).scalars().all()
+    if missing:
+        conn.execute(text("""
+            INSERT INTO lokasi (name) SELECT unnest(CAST(:names AS text[]))
+            ON CONFLICT (lokasi_key(name)) DO NOTHING
+        """), {"names": missing})
+
+@cached("lokasi", "karyawan")
+def get_lokasi_options(in_use=False) -> dict:
+    """{id: name} of every lokasi (in_use=True: only those karyawan are in), sorted by name."""
+    query = "SELECT id, name FROM lokasi l"
+    if in_use:
+        query += " WHERE EXISTS (SELECT 1 FROM karyawan k WHERE k.lokasi_id = l.id)"
+    with get_engine().connect() as conn:
+        return dict(conn.execute(text(query + " ORDER BY name")).fetchall())
+
+def count_lokasi_usage(lokasi_id) -> dict:
+    """Rows still pointing at a lokasi: {'karyawan': int, 'checkups': int}"""
+    with get_engine().connect() as conn:
+        row = conn.execute(text("""
+            SELECT (SELECT COUNT(*) FROM karyawan WHERE lokasi_id = :id) AS karyawan,
+                   (SELECT COUNT(*) FROM checkups WHERE lokasi_id = :id) AS checkups
+        """), {"id": lokasi_id}).mappings().fetchone()
+    return dict(row)
+
+def rename_lokasi(lokasi_id, new_name):
+    """Rename one lokasi; every karyawan / checkup follows. Raises IntegrityError if the name is taken."""
+    with get_engine().begin() as conn:
+        conn.execute(text("UPDATE lokasi SET name = :name WHERE id = :id"), {"id": lokasi_id, "name": new_name.strip()})
+
+def delete_lokasi(lokasi_id):
+    """Delete an unused lokasi. Raises IntegrityError while rows still point at it."""
+    with get_engine().begin() as conn:
+        conn.execute(text("DELETE FROM lokasi WHERE id = :id"), {"id": lokasi_id})
+
+def get_unmatched_lokasi() -> pd.DataFrame:
+    """Strings in lokasi_unmatched with their row count, most frequent first."""
+    query = """
+        SELECT source, value, COUNT(*) AS rows FROM lokasi_unmatched
+        GROUP BY source, value ORDER BY rows DESC, value
+    """
+    with get_engine().connect() as conn:
+        return pd.read_sql(text(query), conn)
+
+def remap_unmatched_lokasi() -> int:
+    """Point unmatched checkups at the lokasi their string now matches. Returns the rows fixed."""
+    with get_engine().begin() as conn:
+        return conn.execute(text("""
+            WITH matched AS (
+                DELETE FROM lokasi_unmatched u USING lokasi l
+                WHERE u.source = 'checkups' AND lokasi_key(l.name) = lokasi_key(u.value)
+                RETURNING u.row_id::int AS checkup_id, l.id AS lokasi_id
+            )
+            UPDATE checkups c SET lokasi_id = m.lokasi_id
+            FROM matched m WHERE c.checkup_id = m.checkup_id
+        """)).rowcount
+
+# ---------------------------------------------------------------------
+# SCRIPT ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    if "--remap" in sys.argv[1:]:
+        print(f"✅ {remap_unmatched_lokasi()} checkups re-mapped")
+    unmatched = get_unmatched_lokasi()
+    if unmatched.empty:
+        print("✅ Every lokasi string is mapped")
+    else:
+        print(unmatched.to_string(index=False))
+        print(f"⚠️ {unmatched['rows'].sum()} rows without lokasi; add the lokasi, then run with --remap")
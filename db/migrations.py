@@ -0,0 +1,843 @@
+# db/migrations.py
+"""
+Versioned schema migrations. init_db() runs every migration not yet recorded
+in schema_version, in version order. This is the only place the schema is
+defined; append new migrations, never edit an applied one.
+
+A migration is a list of steps. Plain SQL steps run in one transaction. A
+migration containing Index steps runs online instead: every step is issued
+on its own (CREATE INDEX CONCURRENTLY cannot run inside a transaction) and
+table writes are never blocked while the index builds. On a partitioned
+table (checkups, see db/partitions.py) the index is built partition by partition.
+"""
+from collections import namedtuple
+from sqlalchemy import text
+from db.health_rules import status_rule_steps
+from db.checkup_conflicts import DEDUPE_CHECKUPS_SQL
+from db.karyawan_duplicates import MERGE_KARYAWAN_STEPS
+
+# Secondary index built with CREATE INDEX CONCURRENTLY
+Index = namedtuple("Index", "name on unique", defaults=(False,))
+
+# pg_advisory_lock key: only one app instance migrates at a time
+MIGRATION_LOCK_ID = 727_011
+
+# ---------------------------
+# Migrations: (version, description, steps)
+# ---------------------------
+MIGRATIONS = [
+    (1, "baseline tables", [
+        # --- One row per processed upload file; rows it created point back via batch_id ---
+        """
+        CREATE TABLE IF NOT EXISTS upload_batches (
+            batch_id UUID PRIMARY KEY,
+            kind VARCHAR(20) NOT NULL,
+            file_name TEXT,
+            file_hash TEXT NOT NULL,
+            uploaded_by VARCHAR(100),
+            status VARCHAR(20) NOT NULL DEFAULT 'running',
+            rows_inserted INTEGER NOT NULL DEFAULT 0,
+            rows_updated INTEGER NOT NULL DEFAULT 0,
+            rows_skipped INTEGER NOT NULL DEFAULT 0,
+            started_at TIMESTAMP DEFAULT NOW(),
+            finished_at TIMESTAMP,
+            UNIQUE (kind, file_hash)
+        )
+        """,
+        # --- Karyawan master table (from Manager XLS upload) ---
+        """
+        CREATE TABLE IF NOT EXISTS karyawan (
+            uid UUID PRIMARY KEY,
+            nama TEXT NOT NULL,
+            jabatan TEXT,
+            lokasi TEXT,
+            tanggal_lahir DATE
+        )
+        """,
+        # --- Batch that created the row; deleting the batch removes it ---
+        """
+        ALTER TABLE karyawan ADD COLUMN IF NOT EXISTS batch_id UUID
+            REFERENCES upload_batches(batch_id) ON DELETE CASCADE
+        """,
+        # --- Checkups table (from Nurse data entry / checkup upload) ---
+        """
+        CREATE TABLE IF NOT EXISTS checkups (
+            checkup_id SERIAL PRIMARY KEY,
+            uid UUID NOT NULL REFERENCES karyawan(uid) ON DELETE CASCADE,
+            tanggal_checkup DATE NOT NULL,
+            tanggal_lahir DATE,
+            umur INTEGER,
+            tinggi NUMERIC(5,2),
+            berat NUMERIC(5,2),
+            lingkar_perut NUMERIC(5,2),
+            bmi NUMERIC(5,2),
+            gula_darah_puasa NUMERIC(5,2),
+            gula_darah_sewaktu NUMERIC(5,2),
+            cholesterol NUMERIC(5,2),
+            asam_urat NUMERIC(5,2),
+            status VARCHAR(50),
+            lokasi TEXT
+        )
+        """,
+        # Older databases were created without checkups.lokasi, which the queries read
+        "ALTER TABLE checkups ADD COLUMN IF NOT EXISTS lokasi TEXT",
+        """
+        ALTER TABLE checkups ADD COLUMN IF NOT EXISTS batch_id UUID
+            REFERENCES upload_batches(batch_id) ON DELETE CASCADE
+        """,
+        # --- Last committed row per (uploaded file, sheet); written with each chunk ---
+        """
+        CREATE TABLE IF NOT EXISTS upload_checkpoints (
+            file_hash TEXT NOT NULL,
+            sheet TEXT NOT NULL,
+            last_row INTEGER NOT NULL DEFAULT 0,
+            inserted_rows INTEGER NOT NULL DEFAULT 0,
+            skipped_rows INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (file_hash, sheet)
+        )
+        """,
+        # --- Background upload jobs; claimed by upload_worker.py with SKIP LOCKED ---
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id SERIAL PRIMARY KEY,
+            kind VARCHAR(20) NOT NULL,
+            file_name TEXT NOT NULL,
+            file_data BYTEA,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            created_by VARCHAR(100),
+            worker TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            result JSONB,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT NOW(),
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """,
+        # --- Users table (auth) ---
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(100) NOT NULL UNIQUE,
+            password TEXT,
+            role VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        # --- Lokasi list (Manager "Lokasi" tab) ---
+        """
+        CREATE TABLE IF NOT EXISTS lokasi (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+    ]),
+
+    (2, "lookup indexes", [
+        # Rows differing only in case / whitespace would fail the unique index below: merge them
+        # first, recording each in karyawan_merges (python -m db.karyawan_duplicates)
+        *MERGE_KARYAWAN_STEPS,
+        # One karyawan per normalized (nama, jabatan); backs the master upsert and add_employee_if_missing
+        Index("karyawan_natural_key_idx",
+              "karyawan ((lower(btrim(nama))), (lower(btrim(coalesce(jabatan, '')))))", unique=True),
+        # get_employees() ORDER BY nama
+        Index("karyawan_nama_idx", "karyawan (nama)"),
+        # Lokasi deletion counts karyawan per lokasi
+        Index("karyawan_lokasi_idx", "karyawan (lokasi)"),
+        # Checkups of one karyawan, newest first; also the per-uid MAX(tanggal_checkup)
+        Index("checkups_uid_tanggal_idx", "checkups (uid, tanggal_checkup DESC)"),
+        # Batch rollback (ON DELETE CASCADE looks rows up by batch_id)
+        Index("karyawan_batch_id_idx", "karyawan (batch_id)"),
+        Index("checkups_batch_id_idx", "checkups (batch_id)"),
+        # Job queue: next queued job, and a user's recent jobs
+        Index("jobs_queued_idx", "jobs (job_id) WHERE status = 'queued'"),
+        Index("jobs_created_by_idx", "jobs (created_by, kind, job_id DESC)"),
+    ]),
+
+    (3, "karyawan.latest_checkup_id maintained by trigger", [
+        # Newest checkup of the karyawan (latest tanggal_checkup, then highest checkup_id).
+        # No FK: the triggers below keep it current and a dangling id simply joins nothing.
+        "ALTER TABLE karyawan ADD COLUMN IF NOT EXISTS latest_checkup_id INTEGER",
+        # Statement-level, so a bulk upload re-points each affected karyawan once
+        """
+        CREATE OR REPLACE FUNCTION refresh_latest_checkup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE karyawan k SET latest_checkup_id = (
+                    SELECT c.checkup_id FROM checkups c WHERE c.uid = k.uid
+                    ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+                )
+                WHERE k.uid IN (SELECT DISTINCT uid FROM old_rows);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE karyawan k SET latest_checkup_id = (
+                    SELECT c.checkup_id FROM checkups c WHERE c.uid = k.uid
+                    ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+                )
+                WHERE k.uid IN (SELECT DISTINCT uid FROM new_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS checkups_latest_insert ON checkups",
+        """
+        CREATE TRIGGER checkups_latest_insert AFTER INSERT ON checkups
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_latest_checkup()
+        """,
+        "DROP TRIGGER IF EXISTS checkups_latest_update ON checkups",
+        """
+        CREATE TRIGGER checkups_latest_update AFTER UPDATE ON checkups
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_latest_checkup()
+        """,
+        "DROP TRIGGER IF EXISTS checkups_latest_delete ON checkups",
+        """
+        CREATE TRIGGER checkups_latest_delete AFTER DELETE ON checkups
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_latest_checkup()
+        """,
+        # Backfill existing history
+        """
+        UPDATE karyawan k SET latest_checkup_id = (
+            SELECT c.checkup_id FROM checkups c WHERE c.uid = k.uid
+            ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+        )
+        """,
+    ]),
+
+    (4, "keyset pagination indexes", [
+        # Cursor of get_employees_page / get_dashboard_page; supersedes karyawan_nama_idx
+        Index("karyawan_nama_uid_idx", "karyawan (nama, uid)"),
+        "DROP INDEX CONCURRENTLY IF EXISTS karyawan_nama_idx",
+        # Cursor of load_checkups_page
+        Index("checkups_tanggal_id_idx", "checkups (tanggal_checkup DESC, checkup_id DESC)"),
+    ]),
+
+    (5, "checkups tahun / bulan columns and stored status", [
+        # Dashboard Tahun / Bulan filters; computed by Postgres on write, never in pandas
+        """
+        ALTER TABLE checkups
+            ADD COLUMN IF NOT EXISTS tahun SMALLINT
+                GENERATED ALWAYS AS (EXTRACT(YEAR FROM tanggal_checkup)::smallint) STORED,
+            ADD COLUMN IF NOT EXISTS bulan SMALLINT
+                GENERATED ALWAYS AS (EXTRACT(MONTH FROM tanggal_checkup)::smallint) STORED
+        """,
+        # checkups.status = Well / Unwell, set on every write; NULL vitals count as Well
+        """
+        CREATE OR REPLACE FUNCTION set_checkup_status() RETURNS trigger AS $$
+        BEGIN
+            NEW.status := CASE
+                WHEN NEW.gula_darah_puasa > 120 OR NEW.gula_darah_sewaktu > 200
+                     OR NEW.cholesterol > 240 OR NEW.asam_urat > 7 OR NEW.bmi >= 30
+                THEN 'Unwell' ELSE 'Well' END;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS checkups_set_status ON checkups",
+        """
+        CREATE TRIGGER checkups_set_status BEFORE INSERT OR UPDATE ON checkups
+        FOR EACH ROW EXECUTE FUNCTION set_checkup_status()
+        """,
+        # Backfill: the trigger recomputes status on this no-op update
+        "UPDATE checkups SET status = NULL",
+    ]),
+
+    (6, "dashboard filter indexes", [
+        Index("checkups_tahun_bulan_idx", "checkups (tahun, bulan)"),
+        Index("checkups_status_idx", "checkups (status)"),
+        # Lets a tahun / bulan / status filter start from checkups and join back to karyawan
+        Index("karyawan_latest_checkup_idx", "karyawan (latest_checkup_id)"),
+    ]),
+
+    (7, "dashboard_rollup maintained by trigger", [
+        # Bucket of the latest checkup, copied onto karyawan so the rollup trigger
+        # sees old and new buckets in karyawan's own transition tables
+        """
+        ALTER TABLE karyawan
+            ADD COLUMN IF NOT EXISTS latest_tahun SMALLINT,
+            ADD COLUMN IF NOT EXISTS latest_bulan SMALLINT,
+            ADD COLUMN IF NOT EXISTS latest_status VARCHAR(50)
+        """,
+        """
+        CREATE OR REPLACE FUNCTION refresh_latest_checkup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE karyawan k SET (latest_checkup_id, latest_tahun, latest_bulan, latest_status) = (
+                    SELECT c.checkup_id, c.tahun, c.bulan, c.status FROM checkups c WHERE c.uid = k.uid
+                    ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+                )
+                WHERE k.uid IN (SELECT DISTINCT uid FROM old_rows);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE karyawan k SET (latest_checkup_id, latest_tahun, latest_bulan, latest_status) = (
+                    SELECT c.checkup_id, c.tahun, c.bulan, c.status FROM checkups c WHERE c.uid = k.uid
+                    ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+                )
+                WHERE k.uid IN (SELECT DISTINCT uid FROM new_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        UPDATE karyawan k SET (latest_tahun, latest_bulan, latest_status) = (
+            SELECT c.tahun, c.bulan, c.status FROM checkups c WHERE c.checkup_id = k.latest_checkup_id
+        )
+        """,
+        # Karyawan per (lokasi, tahun, bulan, status) of their latest checkup.
+        # No checkup = tahun 0 / bulan 0 / Well; no lokasi = ''. See db/rollups.py.
+        """
+        CREATE TABLE IF NOT EXISTS dashboard_rollup (
+            lokasi TEXT NOT NULL,
+            tahun SMALLINT NOT NULL,
+            bulan SMALLINT NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            karyawan INTEGER NOT NULL,
+            PRIMARY KEY (lokasi, tahun, bulan, status)
+        )
+        """,
+        # -1 for every old bucket, +1 for every new one, netted per bucket. Dynamic SQL
+        # because a statement may only name the transition tables its event has.
+        """
+        CREATE OR REPLACE FUNCTION apply_rollup_delta() RETURNS trigger AS $$
+        DECLARE
+            bucket CONSTANT TEXT := 'COALESCE(lokasi, ''''), COALESCE(latest_tahun, 0), '
+                                    'COALESCE(latest_bulan, 0), COALESCE(latest_status, ''Well'')';
+            delta TEXT;
+        BEGIN
+            delta := CASE TG_OP
+                WHEN 'INSERT' THEN format('SELECT %s, 1 FROM new_rows', bucket)
+                WHEN 'DELETE' THEN format('SELECT %s, -1 FROM old_rows', bucket)
+                ELSE format('SELECT %s, -1 FROM old_rows UNION ALL SELECT %s, 1 FROM new_rows', bucket, bucket)
+            END;
+            EXECUTE format($sql$
+                INSERT INTO dashboard_rollup AS r (lokasi, tahun, bulan, status, karyawan)
+                SELECT lokasi, tahun, bulan, status, SUM(n)
+                FROM (%s) AS d (lokasi, tahun, bulan, status, n)
+                GROUP BY lokasi, tahun, bulan, status HAVING SUM(n) <> 0
+                ON CONFLICT (lokasi, tahun, bulan, status)
+                    DO UPDATE SET karyawan = r.karyawan + EXCLUDED.karyawan
+            $sql$, delta);
+            DELETE FROM dashboard_rollup WHERE karyawan = 0;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS karyawan_rollup_insert ON karyawan",
+        """
+        CREATE TRIGGER karyawan_rollup_insert AFTER INSERT ON karyawan
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION apply_rollup_delta()
+        """,
+        "DROP TRIGGER IF EXISTS karyawan_rollup_update ON karyawan",
+        """
+        CREATE TRIGGER karyawan_rollup_update AFTER UPDATE ON karyawan
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION apply_rollup_delta()
+        """,
+        "DROP TRIGGER IF EXISTS karyawan_rollup_delete ON karyawan",
+        """
+        CREATE TRIGGER karyawan_rollup_delete AFTER DELETE ON karyawan
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION apply_rollup_delta()
+        """,
+        # Initial fill
+        "DELETE FROM dashboard_rollup",
+        """
+        INSERT INTO dashboard_rollup (lokasi, tahun, bulan, status, karyawan)
+        SELECT COALESCE(lokasi, ''), COALESCE(latest_tahun, 0), COALESCE(latest_bulan, 0),
+               COALESCE(latest_status, 'Well'), COUNT(*)
+        FROM karyawan GROUP BY 1, 2, 3, 4
+        """,
+    ]),
+
+    (8, "checkups partitioned by year", [
+        # Rebuilds checkups as a table partitioned by RANGE (tanggal_checkup), one
+        # partition per year (checkups_y2025, ...) plus checkups_default. Existing rows
+        # are copied in this transaction, so checkups is locked while it runs.
+        "ALTER TABLE checkups RENAME TO checkups_heap",
+        # Keep the id sequence when checkups_heap is dropped
+        "ALTER SEQUENCE checkups_checkup_id_seq OWNED BY NONE",
+        """
+        CREATE TABLE checkups (
+            checkup_id INTEGER NOT NULL DEFAULT nextval('checkups_checkup_id_seq'),
+            uid UUID NOT NULL REFERENCES karyawan(uid) ON DELETE CASCADE,
+            tanggal_checkup DATE NOT NULL,
+            tanggal_lahir DATE,
+            umur INTEGER,
+            tinggi NUMERIC(5,2),
+            berat NUMERIC(5,2),
+            lingkar_perut NUMERIC(5,2),
+            bmi NUMERIC(5,2),
+            gula_darah_puasa NUMERIC(5,2),
+            gula_darah_sewaktu NUMERIC(5,2),
+            cholesterol NUMERIC(5,2),
+            asam_urat NUMERIC(5,2),
+            status VARCHAR(50),
+            lokasi TEXT,
+            batch_id UUID REFERENCES upload_batches(batch_id) ON DELETE CASCADE,
+            tahun SMALLINT GENERATED ALWAYS AS (EXTRACT(YEAR FROM tanggal_checkup)::smallint) STORED,
+            bulan SMALLINT GENERATED ALWAYS AS (EXTRACT(MONTH FROM tanggal_checkup)::smallint) STORED
+        ) PARTITION BY RANGE (tanggal_checkup)
+        """,
+        # Dates without a yearly partition (e.g. a mistyped far-future year) land here
+        "CREATE TABLE checkups_default PARTITION OF checkups DEFAULT",
+        # Idempotent; called by writers for the years they insert (db/partitions.py).
+        # Rows of that year already sitting in checkups_default move into the new partition.
+        """
+        CREATE OR REPLACE FUNCTION create_checkup_partition(yr INTEGER) RETURNS BOOLEAN AS $$
+        DECLARE
+            part CONSTANT TEXT := format('checkups_y%s', yr);
+            lo CONSTANT DATE := make_date(yr, 1, 1);
+            hi CONSTANT DATE := make_date(yr + 1, 1, 1);
+            cols TEXT;
+        BEGIN
+            IF to_regclass(part) IS NOT NULL THEN
+                RETURN FALSE;
+            END IF;
+            PERFORM pg_advisory_xact_lock(hashtext('create_checkup_partition'));
+            IF to_regclass(part) IS NOT NULL THEN
+                RETURN FALSE;
+            END IF;
+
+            IF NOT EXISTS (SELECT 1 FROM checkups_default WHERE tanggal_checkup >= lo AND tanggal_checkup < hi) THEN
+                EXECUTE format('CREATE TABLE %I PARTITION OF checkups FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+                RETURN TRUE;
+            END IF;
+
+            -- Straight into the partitions: the rows keep their checkup_id, so the
+            -- statement triggers on checkups have nothing to re-point
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO cols
+            FROM pg_attribute
+            WHERE attrelid = 'checkups'::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+            ALTER TABLE checkups DETACH PARTITION checkups_default;
+            EXECUTE format('CREATE TABLE %I PARTITION OF checkups FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+            EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM checkups_default WHERE tanggal_checkup >= %L AND tanggal_checkup < %L',
+                           part, cols, cols, lo, hi);
+            DELETE FROM checkups_default WHERE tanggal_checkup >= lo AND tanggal_checkup < hi;
+            ALTER TABLE checkups ATTACH PARTITION checkups_default DEFAULT;
+            RETURN TRUE;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # A partition for every year with data, this year and next year
+        """
+        SELECT create_checkup_partition(yr) FROM (
+            SELECT DISTINCT EXTRACT(YEAR FROM tanggal_checkup)::int AS yr FROM checkups_heap
+            UNION SELECT EXTRACT(YEAR FROM CURRENT_DATE)::int + ahead FROM generate_series(0, 1) AS ahead
+        ) years ORDER BY yr
+        """,
+        # Copied before the triggers exist: status, pointers and rollup are already current
+        """
+        INSERT INTO checkups (
+            checkup_id, uid, tanggal_checkup, tanggal_lahir, umur, tinggi, berat, lingkar_perut, bmi,
+            gula_darah_puasa, gula_darah_sewaktu, cholesterol, asam_urat, status, lokasi, batch_id
+        )
+        SELECT checkup_id, uid, tanggal_checkup, tanggal_lahir, umur, tinggi, berat, lingkar_perut, bmi,
+               gula_darah_puasa, gula_darah_sewaktu, cholesterol, asam_urat, status, lokasi, batch_id
+        FROM checkups_heap
+        """,
+        "DROP TABLE checkups_heap",
+        "ALTER SEQUENCE checkups_checkup_id_seq OWNED BY checkups.checkup_id",
+        # A partitioned table's keys must include the partition key; the sequence keeps checkup_id unique
+        "ALTER TABLE checkups ADD PRIMARY KEY (checkup_id, tanggal_checkup)",
+        # The indexes of migrations 2, 4 and 6, now created on every partition
+        "CREATE INDEX checkups_uid_tanggal_idx ON checkups (uid, tanggal_checkup DESC)",
+        "CREATE INDEX checkups_batch_id_idx ON checkups (batch_id)",
+        "CREATE INDEX checkups_tanggal_id_idx ON checkups (tanggal_checkup DESC, checkup_id DESC)",
+        "CREATE INDEX checkups_tahun_bulan_idx ON checkups (tahun, bulan)",
+        "CREATE INDEX checkups_status_idx ON checkups (status)",
+        # Rows arrive roughly in date order, so a few block ranges cover a date range
+        "CREATE INDEX checkups_tanggal_brin_idx ON checkups USING brin (tanggal_checkup)",
+        # Triggers of migrations 3, 5 and 7 (the functions are unchanged)
+        """
+        CREATE TRIGGER checkups_latest_insert AFTER INSERT ON checkups
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_latest_checkup()
+        """,
+        """
+        CREATE TRIGGER checkups_latest_update AFTER UPDATE ON checkups
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_latest_checkup()
+        """,
+        """
+        CREATE TRIGGER checkups_latest_delete AFTER DELETE ON checkups
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_latest_checkup()
+        """,
+        """
+        CREATE TRIGGER checkups_set_status BEFORE INSERT OR UPDATE ON checkups
+        FOR EACH ROW EXECUTE FUNCTION set_checkup_status()
+        """,
+        "ANALYZE checkups",
+    ]),
+
+    (9, "lokasi as integer foreign key", [
+        # Matching key of a lokasi name: case and extra whitespace are ignored
+        """
+        CREATE OR REPLACE FUNCTION lokasi_key(lokasi_name TEXT) RETURNS TEXT AS $$
+            SELECT lower(regexp_replace(btrim(lokasi_name), '[[:space:]]+', ' ', 'g'))
+        $$ LANGUAGE sql IMMUTABLE
+        """,
+        # Names differing only by case / spacing collapse onto the oldest row
+        "DELETE FROM lokasi l USING lokasi d WHERE lokasi_key(l.name) = lokasi_key(d.name) AND l.id > d.id",
+        "CREATE UNIQUE INDEX IF NOT EXISTS lokasi_key_idx ON lokasi (lokasi_key(name))",
+        # Id of the lokasi a free-text name (sheet name, form value) refers to; NULL if none
+        """
+        CREATE OR REPLACE FUNCTION lokasi_id_of(lokasi_name TEXT) RETURNS INTEGER AS $$
+            SELECT id FROM lokasi WHERE lokasi_key(name) = lokasi_key(lokasi_name)
+        $$ LANGUAGE sql STABLE
+        """,
+        # Lokasi of karyawan were never required to be in the lokasi table (the manager
+        # filters listed both); register them so every karyawan keeps its lokasi
+        """
+        INSERT INTO lokasi (name)
+        SELECT DISTINCT ON (lokasi_key(lokasi)) btrim(lokasi) FROM karyawan
+        WHERE btrim(coalesce(lokasi, '')) <> ''
+        ORDER BY lokasi_key(lokasi), btrim(lokasi)
+        ON CONFLICT (lokasi_key(name)) DO NOTHING
+        """,
+        "ALTER TABLE karyawan ADD COLUMN IF NOT EXISTS lokasi_id INTEGER REFERENCES lokasi(id)",
+        "ALTER TABLE checkups ADD COLUMN IF NOT EXISTS lokasi_id INTEGER REFERENCES lokasi(id)",
+        # Map the strings. The triggers have nothing to do: no checkup date / status
+        # changes, and dashboard_rollup is rebuilt below.
+        "ALTER TABLE karyawan DISABLE TRIGGER USER",
+        "UPDATE karyawan k SET lokasi_id = l.id FROM lokasi l WHERE lokasi_key(l.name) = lokasi_key(k.lokasi)",
+        "ALTER TABLE karyawan ENABLE TRIGGER USER",
+        "ALTER TABLE checkups DISABLE TRIGGER USER",
+        "UPDATE checkups c SET lokasi_id = l.id FROM lokasi l WHERE lokasi_key(l.name) = lokasi_key(c.lokasi)",
+        "ALTER TABLE checkups ENABLE TRIGGER USER",
+        # checkups.lokasi strings that matched no lokasi, kept row by row; see python -m db.lokasi
+        """
+        CREATE TABLE IF NOT EXISTS lokasi_unmatched (
+            source VARCHAR(20) NOT NULL,
+            row_id TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (source, row_id)
+        )
+        """,
+        """
+        INSERT INTO lokasi_unmatched (source, row_id, value)
+        SELECT 'checkups', checkup_id::text, lokasi FROM checkups
+        WHERE lokasi_id IS NULL AND btrim(coalesce(lokasi, '')) <> ''
+        ON CONFLICT DO NOTHING
+        """,
+        "ALTER TABLE karyawan DROP COLUMN lokasi",
+        "ALTER TABLE checkups DROP COLUMN lokasi",
+        # Lokasi filters / per-lokasi counts, and the FK checks of a lokasi delete
+        "CREATE INDEX IF NOT EXISTS karyawan_lokasi_id_idx ON karyawan (lokasi_id)",
+        "CREATE INDEX IF NOT EXISTS checkups_lokasi_id_idx ON checkups (lokasi_id)",
+        # dashboard_rollup re-keyed by lokasi_id (0 = no lokasi)
+        "DROP TABLE IF EXISTS dashboard_rollup",
+        """
+        CREATE TABLE dashboard_rollup (
+            lokasi_id INTEGER NOT NULL,
+            tahun SMALLINT NOT NULL,
+            bulan SMALLINT NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            karyawan INTEGER NOT NULL,
+            PRIMARY KEY (lokasi_id, tahun, bulan, status)
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION apply_rollup_delta() RETURNS trigger AS $$
+        DECLARE
+            bucket CONSTANT TEXT := 'COALESCE(lokasi_id, 0), COALESCE(latest_tahun, 0), '
+                                    'COALESCE(latest_bulan, 0), COALESCE(latest_status, ''Well'')';
+            delta TEXT;
+        BEGIN
+            delta := CASE TG_OP
+                WHEN 'INSERT' THEN format('SELECT %s, 1 FROM new_rows', bucket)
+                WHEN 'DELETE' THEN format('SELECT %s, -1 FROM old_rows', bucket)
+                ELSE format('SELECT %s, -1 FROM old_rows UNION ALL SELECT %s, 1 FROM new_rows', bucket, bucket)
+            END;
+            EXECUTE format($sql$
+                INSERT INTO dashboard_rollup AS r (lokasi_id, tahun, bulan, status, karyawan)
+                SELECT lokasi_id, tahun, bulan, status, SUM(n)
+                FROM (%s) AS d (lokasi_id, tahun, bulan, status, n)
+                GROUP BY lokasi_id, tahun, bulan, status HAVING SUM(n) <> 0
+                ON CONFLICT (lokasi_id, tahun, bulan, status)
+                    DO UPDATE SET karyawan = r.karyawan + EXCLUDED.karyawan
+            $sql$, delta);
+            DELETE FROM dashboard_rollup WHERE karyawan = 0;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        INSERT INTO dashboard_rollup (lokasi_id, tahun, bulan, status, karyawan)
+        SELECT COALESCE(lokasi_id, 0), COALESCE(latest_tahun, 0), COALESCE(latest_bulan, 0),
+               COALESCE(latest_status, 'Well'), COUNT(*)
+        FROM karyawan GROUP BY 1, 2, 3, 4
+        """,
+    ]),
+
+    (10, "status rule from db/health_rules.py, partial unwell index", [
+        # Same rule as migration 5; the trigger now comes from the one rule definition
+        *status_rule_steps(),
+        # Two values, mostly Well: only the Unwell rows are worth indexing
+        "DROP INDEX IF EXISTS checkups_status_idx",
+        # "All unwell checkups, newest first" (load_checkups_page(status="Unwell"))
+        Index("checkups_unwell_idx", "checkups (tanggal_checkup DESC, checkup_id DESC) WHERE status = 'Unwell'"),
+    ]),
+
+    (11, "one checkup per karyawan per day", [
+        # When the values were written (upload start or manual entry), for the keep_newest
+        # policy; rows already stored count as written now
+        "ALTER TABLE checkups ADD COLUMN IF NOT EXISTS written_at TIMESTAMP NOT NULL DEFAULT NOW()",
+        # Keep the newest row of every (uid, tanggal_checkup), as python -m db.checkup_conflicts --apply
+        DEDUPE_CHECKUPS_SQL,
+        # Conflict target of every checkup INSERT (db/checkup_conflicts.py); includes the partition key
+        Index("checkups_uid_tanggal_key", "checkups (uid, tanggal_checkup)", unique=True),
+        # Same columns as the key, which serves its lookups
+        "DROP INDEX IF EXISTS checkups_uid_tanggal_idx",
+    ]),
+
+    (12, "data_version counters for the query cache", [
+        # One counter per table db/cache.py tracks; bumped in the writing transaction,
+        # so a reader sees the new version and the new rows together
+        """
+        CREATE TABLE IF NOT EXISTS data_version (
+            table_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT INTO data_version (table_name)
+        VALUES ('karyawan'), ('checkups'), ('lokasi'), ('dashboard_rollup')
+        ON CONFLICT DO NOTHING
+        """,
+        """
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_version SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        *[
+            step
+            for table in ("karyawan", "checkups", "lokasi", "dashboard_rollup")
+            for step in (
+                f"DROP TRIGGER IF EXISTS {table}_data_version ON {table}",
+                f"""
+                CREATE TRIGGER {table}_data_version
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+                """,
+            )
+        ],
+    ]),
+
+    (13, "notify data_changed listeners on every data_version bump", [
+        # Delivered on commit only, once per table per transaction (identical payloads
+        # are folded), to every process listening (db/notify.py)
+        """
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_version SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+            PERFORM pg_notify('data_changed', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]),
+
+    (14, "result_cards for the QR portal", [
+        # One precomputed card per karyawan (db/result_cards.py); current while the
+        # karyawan row and the lokasi data_version are those it was built from
+        """
+        CREATE TABLE IF NOT EXISTS result_cards (
+            uid UUID PRIMARY KEY REFERENCES karyawan(uid) ON DELETE CASCADE,
+            karyawan_xmin XID NOT NULL,
+            lokasi_version BIGINT NOT NULL,
+            card JSONB NOT NULL,
+            built_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """,
+    ]),
+
+    (15, "karyawan.latest_tanggal_checkup for partition pruning", [
+        # Partition key of the latest checkup: joining on (checkup_id, tanggal_checkup)
+        # lets each lookup go to one yearly partition instead of probing all of them
+        "ALTER TABLE karyawan ADD COLUMN IF NOT EXISTS latest_tanggal_checkup DATE",
+        """
+        CREATE OR REPLACE FUNCTION refresh_latest_checkup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE karyawan k SET (latest_checkup_id, latest_tanggal_checkup, latest_tahun, latest_bulan, latest_status) = (
+                    SELECT c.checkup_id, c.tanggal_checkup, c.tahun, c.bulan, c.status FROM checkups c WHERE c.uid = k.uid
+                    ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+                )
+                WHERE k.uid IN (SELECT DISTINCT uid FROM old_rows);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE karyawan k SET (latest_checkup_id, latest_tanggal_checkup, latest_tahun, latest_bulan, latest_status) = (
+                    SELECT c.checkup_id, c.tanggal_checkup, c.tahun, c.bulan, c.status FROM checkups c WHERE c.uid = k.uid
+                    ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+                )
+                WHERE k.uid IN (SELECT DISTINCT uid FROM new_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # Backfill. No bucket changes, so the rollup / data_version triggers have nothing to do.
+        "ALTER TABLE karyawan DISABLE TRIGGER USER",
+        """
+        UPDATE karyawan k SET latest_tanggal_checkup = c.tanggal_checkup
+        FROM checkups c WHERE c.checkup_id = k.latest_checkup_id
+        """,
+        "ALTER TABLE karyawan ENABLE TRIGGER USER",
+    ]),
+
+    (16, "dashboard_rollup upserts in key order", [
+        # Same delta as migration 9, upserted in primary key order: two concurrent
+        # karyawan writes touching the same buckets lock them in the same order, so
+        # one waits for the other instead of deadlocking
+        """
+        CREATE OR REPLACE FUNCTION apply_rollup_delta() RETURNS trigger AS $$
+        DECLARE
+            bucket CONSTANT TEXT := 'COALESCE(lokasi_id, 0), COALESCE(latest_tahun, 0), '
+                                    'COALESCE(latest_bulan, 0), COALESCE(latest_status, ''Well'')';
+            delta TEXT;
+        BEGIN
+            delta := CASE TG_OP
+                WHEN 'INSERT' THEN format('SELECT %s, 1 FROM new_rows', bucket)
+                WHEN 'DELETE' THEN format('SELECT %s, -1 FROM old_rows', bucket)
+                ELSE format('SELECT %s, -1 FROM old_rows UNION ALL SELECT %s, 1 FROM new_rows', bucket, bucket)
+            END;
+            EXECUTE format($sql$
+                INSERT INTO dashboard_rollup AS r (lokasi_id, tahun, bulan, status, karyawan)
+                SELECT lokasi_id, tahun, bulan, status, SUM(n)
+                FROM (%s) AS d (lokasi_id, tahun, bulan, status, n)
+                GROUP BY lokasi_id, tahun, bulan, status HAVING SUM(n) <> 0
+                ORDER BY lokasi_id, tahun, bulan, status
+                ON CONFLICT (lokasi_id, tahun, bulan, status)
+                    DO UPDATE SET karyawan = r.karyawan + EXCLUDED.karyawan
+            $sql$, delta);
+            DELETE FROM dashboard_rollup WHERE karyawan = 0;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]),
+
+    (17, "result_cards current per lokasi row", [
+        # A card depends on its own lokasi row (the name it shows), not on the lokasi
+        # data_version, which any lokasi statement bumps. Existing cards go stale and are
+        # rebuilt on their next scan.
+        "ALTER TABLE result_cards ADD COLUMN IF NOT EXISTS lokasi_xmin XID",
+        "ALTER TABLE result_cards DROP COLUMN IF EXISTS lokasi_version",
+    ]),
+
+    (18, "job_files: several files per upload job", [
+        # A master import of several files is one job (one parse_master_karyawan call,
+        # later files win); a checkup job still has a single file
+        """
+        CREATE TABLE IF NOT EXISTS job_files (
+            job_id INTEGER NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+            position SMALLINT NOT NULL,
+            file_name TEXT NOT NULL,
+            file_data BYTEA NOT NULL,
+            PRIMARY KEY (job_id, position)
+        )
+        """,
+        """
+        INSERT INTO job_files (job_id, position, file_name, file_data)
+        SELECT job_id, 0, file_name, file_data FROM jobs WHERE file_data IS NOT NULL
+        ON CONFLICT DO NOTHING
+        """,
+        "ALTER TABLE jobs DROP COLUMN IF EXISTS file_data",
+    ]),
+]
+
+# Every table the migrations create (checkups partitions go with checkups), for
+# db/models.recreate_tables(). Add a migration's new tables here with it.
+APP_TABLES = (
+    "upload_batches", "karyawan", "checkups", "upload_checkpoints", "jobs", "users", "lokasi",
+    "karyawan_merges",      # migration 2
+    "dashboard_rollup",     # migrations 7 / 9
+    "lokasi_unmatched",     # migration 9
+    "data_version",         # migration 12
+    "result_cards",         # migration 14
+    "job_files",            # migration 18
+    "schema_version",
+)
+
+# ---------------------------
+# Runner
+# ---------------------------
+def _build_index(conn, index):
+    table, definition = index.on.split(" ", 1)
+    unique = "UNIQUE " if index.unique else ""
+    partitions = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname
+    """), {"table": table}).scalars().all()
+    partitioned = conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"
+    ), {"table": table}).scalar()
+    if partitioned:
+        # CONCURRENTLY does not work on a partitioned table: the parent index is created
+        # on ONLY the parent (invalid until complete), each partition's is built
+        # concurrently and attached. New partitions get the index automatically.
+        conn.execute(text(f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON ONLY {table} {definition}"))
+        for partition in partitions:
+            child = Index(f"{partition}_{index.name}"[:63], f"{partition} {definition}", index.unique)
+            _build_index(conn, child)
+            conn.execute(text(f"ALTER INDEX {index.name} ATTACH PARTITION {child.name}"))
+        return
+
+    # A failed concurrent build leaves an INVALID index behind that IF NOT EXISTS would keep
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": index.name}).scalar()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+    conn.execute(text(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON {index.on}"))
+
+def run_migrations(engine):
+    """Apply pending migrations in version order. Returns the versions applied."""
+    applied = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+        """))
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            done = {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+            for version, description, steps in MIGRATIONS:
+                if version in done:
+                    continue
+                record = text("INSERT INTO schema_version (version, description) VALUES (:v, :d)")
+                if any(isinstance(step, Index) for step in steps):
+                    # Online: each step on its own; safe to re-run if interrupted
+                    for step in steps:
+                        if isinstance(step, Index):
+                            _build_index(conn, step)
+                        else:
+                            conn.execute(text(step))
+                    conn.execute(record, {"v": version, "d": description})
+                else:
+                    with engine.begin() as tx:
+                        for step in steps:
+                            tx.execute(text(step))
+                        tx.execute(record, {"v": version, "d": description})
+                applied.append(version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    return applied
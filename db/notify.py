@@ -0,0 +1,90 @@
+# db/notify.py
+"""
+Change notifications across processes. A write to a table the query cache
+tracks bumps its data_version and runs NOTIFY data_changed '<table>' in the
+same transaction (migrations 12 and 13), so every listening process hears of
+it once the write commits. start_listener() runs one daemon thread per
+process that
+
+- drops the query-cache entries of the changed tables (db/cache.py)
+- keeps the current data_version of each table in memory
+
+so an open dashboard can check current_data_versions() every few seconds
+without a query and rerun only after something was written (ui/live_refresh.py).
+"""
+import select
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from config.settings import POSTGRES_URL
+from db.cache import get_data_versions, invalidate_tables
+
+CHANNEL = "data_changed"
+TRACKED_TABLES = ("karyawan", "checkups", "lokasi", "dashboard_rollup")
+HEARTBEAT_SECONDS = 30   # re-read the versions when idle this long; also notices a dead connection
+RETRY_SECONDS = 5
+
+_versions = {}
+_lock = threading.Lock()
+_connected = threading.Event()
+_thread = None
+
+def _refresh(cursor, tables):
+    """Read the data_version of `tables`; returns those that moved."""
+    cursor.execute(
+        "SELECT table_name, version FROM data_version WHERE table_name = ANY(%s)", (list(tables),)
+    )
+    versions = dict(cursor.fetchall())
+    with _lock:
+        changed = [table for table, version in versions.items() if _versions.get(table) != version]
+        _versions.update(versions)
+    return changed
+
+def _listen():
+    # Own connection outside the app pool: it is held for the life of the process
+    engine = create_engine(POSTGRES_URL, poolclass=NullPool)
+    while True:
+        try:
+            raw = engine.raw_connection()
+            try:
+                conn = raw.driver_connection
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute(f"LISTEN {CHANNEL}")
+                # Catch up on what was written before LISTEN (or while reconnecting)
+                invalidate_tables(_refresh(cursor, TRACKED_TABLES))
+                _connected.set()
+                while True:
+                    if select.select([conn], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                        tables = TRACKED_TABLES
+                    else:
+                        conn.poll()
+                        tables = {n.payload for n in conn.notifies}
+                        conn.notifies.clear()
+                    if tables:
+                        invalidate_tables(_refresh(cursor, tables))
+            finally:
+                _connected.clear()
+                raw.invalidate()   # closed without the pool's rollback, which fails on a dead connection
+        except Exception as e:
+            print(f"⚠️ {CHANNEL} listener disconnected ({e}); retrying in {RETRY_SECONDS}s")
+            time.sleep(RETRY_SECONDS)
+
+def start_listener():
+    """Start this process's listener thread unless it is already running."""
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_listen, name=f"{CHANNEL}-listener", daemon=True)
+            _thread.start()
+
+def current_data_versions(tables) -> tuple:
+    """
+    data_version of each table, in the order given: from memory while the
+    listener is connected, otherwise read from the database.
+    """
+    if _connected.is_set():
+        with _lock:
+            return tuple(_versions.get(table, 0) for table in tables)
+    return get_data_versions(tables)
@@ -0,0 +1,71 @@
+# db/partitions.py
+"""
+checkups is partitioned by year of tanggal_checkup (migration 8): checkups_y2025
+holds 2025-01-01 up to 2026-01-01, and checkups_default catches dates that have
+no partition of their own. A query or delete bounded on tanggal_checkup only
+reads the partitions of those years.
+
+Writers call ensure_checkup_partitions() for the years they are about to insert;
+creating a year's partition also moves that year's rows out of checkups_default.
+
+    python -m db.partitions   # create this and next year's partitions, list them
+"""
+from datetime import date
+import pandas as pd
+from sqlalchemy import text
+from db.database import get_engine
+
+# Partitions are created up to this many years ahead; later (mistyped) dates stay in checkups_default
+YEARS_AHEAD = 1
+
+def ensure_checkup_partitions(conn, years):
+    """
+    Create the missing yearly partitions for years (ints, None / NaN ignored) on
+    conn, inside its transaction. A no-op lookup for years that already exist;
+    creating one locks checkups until the transaction commits.
+    """
+    last = date.today().year + YEARS_AHEAD
+    for year in sorted({int(y) for y in years if pd.notna(y) and int(y) <= last}):
+        conn.execute(text("SELECT create_checkup_partition(:year)"), {"year": year})
+
+def drop_empty_checkup_partitions(conn, before_year):
+    """
+    Drop the yearly partitions before before_year that hold no rows (e.g. after
+    db/archive.py moved them out), so their space is returned at once.
+    Returns the dropped partition names.
+    """
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'checkups'::regclass AND c.relname ~ '^checkups_y[0-9]+$'
+          AND substring(c.relname FROM 11)::int < :before_year
+        ORDER BY c.relname
+    """), {"before_year": before_year}).scalars().all()
+    dropped = []
+    for name in names:
+        conn.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+        if conn.execute(text(f"SELECT NOT EXISTS (SELECT 1 FROM {name})")).scalar():
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+def get_checkup_partitions() -> pd.DataFrame:
+    """Partitions of checkups with their date range, estimated rows and size on disk."""
+    query = """
+        SELECT c.relname AS partition, pg_get_expr(c.relpartbound, c.oid) AS range,
+               GREATEST(c.reltuples, 0)::bigint AS est_rows,
+               pg_size_pretty(pg_total_relation_size(c.oid)) AS size
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'checkups'::regclass
+        ORDER BY c.relname
+    """
+    with get_engine().connect() as conn:
+        return pd.read_sql(text(query), conn)
+
+# ---------------------------------------------------------------------
+# SCRIPT ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    this_year = date.today().year
+    with get_engine().begin() as conn:
+        ensure_checkup_partitions(conn, range(this_year, this_year + YEARS_AHEAD + 1))
+    print(get_checkup_partitions().to_string(index=False))
@@ -5,8 +5,12 @@ import uuid
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from db.database import get_engine
-import os
-from config.settings import UPLOAD_DIR
+from db.partitions import ensure_checkup_partitions
+from db.archive import read_archived_checkups, archived_batch_uids, drop_superseded
+from db.result_cards import refresh_result_cards
+from db.lokasi import ensure_lokasi, get_lokasi_options
+from db.checkup_conflicts import on_conflict_sql
+from db.cache import cached
 
 # --- Expected schema for checkups table ---
 CHECKUP_COLUMNS = [
@@ -32,29 +36,44 @@ def _round_numeric_cols(df: pd.DataFrame, cols=None, decimals=2) -> pd.DataFrame
     return df
 
 # --- Karyawan ---
+# lokasi is stored as lokasi_id (db/lokasi.py); reads return the name as "lokasi"
+_LOKASI_JOIN = "LEFT JOIN lokasi l ON l.id = k.lokasi_id"
+_KARYAWAN_COLS = "k.uid, k.nama, k.jabatan, l.name AS lokasi, k.tanggal_lahir"
+
+@cached("karyawan", "lokasi")
 def get_employees():
-    query = """SELECT uid, nama, jabatan, lokasi, tanggal_lahir FROM karyawan ORDER BY nama"""
+    query = f"""SELECT {_KARYAWAN_COLS} FROM karyawan k {_LOKASI_JOIN} ORDER BY k.nama"""
     return pd.read_sql(query, get_engine())
 
+@cached("karyawan", "lokasi")
 def get_employee_by_uid(uid):
     with get_engine().connect() as conn:
         result = conn.execute(
-            text("SELECT uid, nama, jabatan, lokasi, tanggal_lahir FROM karyawan WHERE uid = :uid"),
+            text(f"SELECT {_KARYAWAN_COLS} FROM karyawan k {_LOKASI_JOIN} WHERE k.uid = :uid"),
             {"uid": uid}
         ).fetchone()
     return dict(result._mapping) if result else None
 
+# Natural key of a karyawan row; backed by the unique index karyawan_natural_key_idx
+KARYAWAN_NATURAL_KEY = "(lower(btrim(nama))), (lower(btrim(coalesce(jabatan, ''))))"
+
 def add_employee_if_missing(nama, jabatan, lokasi, tanggal_lahir=None, batch_id=None):
     with get_engine().begin() as conn:
         existing = conn.execute(
-            text("SELECT uid FROM karyawan WHERE nama = :nama AND jabatan = :jabatan"),
+            text(
+                "SELECT uid FROM karyawan WHERE lower(btrim(nama)) = lower(btrim(:nama)) "
+                "AND lower(btrim(coalesce(jabatan, ''))) = lower(btrim(coalesce(:jabatan, '')))"
+            ),
             {"nama": nama, "jabatan": jabatan}
         ).fetchone()
         if existing:
             return existing._mapping["uid"]
         new_uid = str(uuid.uuid4())
         conn.execute(
-            text("INSERT INTO karyawan (uid, nama, jabatan, lokasi) VALUES (:uid, :nama, :jabatan, :lokasi)"),
+            text(
+                "INSERT INTO karyawan (uid, nama, jabatan, lokasi_id) "
+                "VALUES (:uid, :nama, :jabatan, lokasi_id_of(:lokasi))"
+            ),
             {"uid": new_uid, "nama": nama, "jabatan": jabatan, "lokasi": lokasi}
         )
     return new_uid
@@ -63,8 +82,12 @@ def add_employee_if_missing(nama, jabatan, lokasi, tanggal_lahir=None, batch_id=
 def add_employee_from_sheet(nama, jabatan, sheet_name, tanggal_lahir=None, batch_id=None):
     lokasi = sheet_name
     with get_engine().begin() as conn:
+        ensure_lokasi(conn, [lokasi])
         existing = conn.execute(
-            text("SELECT uid FROM karyawan WHERE nama = :nama AND jabatan = :jabatan"),
+            text(
+                "SELECT uid FROM karyawan WHERE lower(btrim(nama)) = lower(btrim(:nama)) "
+                "AND lower(btrim(coalesce(jabatan, ''))) = lower(btrim(coalesce(:jabatan, '')))"
+            ),
             {"nama": nama, "jabatan": jabatan}
         ).fetchone()
         if existing:
@@ -72,50 +95,142 @@ def add_employee_from_sheet(nama, jabatan, sheet_name, tanggal_lahir=None, batch
         new_uid = str(uuid.uuid4())
         conn.execute(
             text(
-                "INSERT INTO karyawan (uid, nama, jabatan, lokasi, tanggal_lahir) "
-                "VALUES (:uid, :nama, :jabatan, :lokasi, :dob)"
+                "INSERT INTO karyawan (uid, nama, jabatan, lokasi_id, tanggal_lahir) "
+                "VALUES (:uid, :nama, :jabatan, lokasi_id_of(:lokasi), :dob)"
             ),
             {"uid": new_uid, "nama": nama, "jabatan": jabatan, "lokasi": lokasi, "dob": tanggal_lahir}
         )
     return new_uid
 
+# --- Bulk master import (one statement per step) ---
+MASTER_COLS = ["nama", "jabatan", "lokasi", "tanggal_lahir"]
+
+_MASTER_ROWS_SQL = """
+    unnest(
+        CAST(:nama AS text[]), CAST(:jabatan AS text[]),
+        CAST(:lokasi AS text[]), CAST(:tanggal_lahir AS date[])
+    ) AS v(nama, jabatan, lokasi, tanggal_lahir)
+"""
+
+def _master_params(df):
+    return {col: [_key_param(v) for v in df[col].tolist()] for col in MASTER_COLS}
+
+def diff_karyawan_master(df) -> dict:
+    """
+    Classify master rows against karyawan by natural key, in one query.
+    Returns {'new': int, 'changed': int, 'unchanged': int}
+    """
+    if df.empty:
+        return {"new": 0, "changed": 0, "unchanged": 0}
+    query = f"""
+        SELECT
+            count(*) FILTER (WHERE k.uid IS NULL) AS new,
+            count(*) FILTER (
+                WHERE k.uid IS NOT NULL
+                  AND (k.lokasi_id, k.tanggal_lahir) IS DISTINCT FROM (lokasi_id_of(v.lokasi), v.tanggal_lahir)
+            ) AS changed,
+            count(*) FILTER (
+                WHERE k.uid IS NOT NULL
+                  AND (k.lokasi_id, k.tanggal_lahir) IS NOT DISTINCT FROM (lokasi_id_of(v.lokasi), v.tanggal_lahir)
+            ) AS unchanged
+        FROM {_MASTER_ROWS_SQL}
+        LEFT JOIN karyawan k
+          ON lower(btrim(k.nama)) = lower(btrim(v.nama))
+         AND lower(btrim(coalesce(k.jabatan, ''))) = lower(btrim(coalesce(v.jabatan, '')))
+    """
+    with get_engine().connect() as conn:
+        row = conn.execute(text(query), _master_params(df)).fetchone()
+    return dict(row._mapping)
+
+def upsert_karyawan_master(df, batch_id=None) -> dict:
+    """
+    Insert new and update changed master rows in a single INSERT ... ON CONFLICT.
+    Rows must already be unique by natural key. batch_id is stamped on inserted rows only.
+    Lokasi (sheet names) not in the lokasi table yet are added first.
+    Returns {'inserted': int, 'updated': int, 'unchanged': int}
+    """
+    if df.empty:
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+    query = f"""
+        INSERT INTO karyawan (uid, nama, jabatan, lokasi_id, tanggal_lahir, batch_id)
+        SELECT gen_random_uuid(), v.nama, v.jabatan, lokasi_id_of(v.lokasi), v.tanggal_lahir, CAST(:batch_id AS uuid)
+        FROM {_MASTER_ROWS_SQL}
+        ON CONFLICT ({KARYAWAN_NATURAL_KEY}) DO UPDATE
+            SET lokasi_id = EXCLUDED.lokasi_id,
+                tanggal_lahir = EXCLUDED.tanggal_lahir
+            WHERE (karyawan.lokasi_id, karyawan.tanggal_lahir)
+                  IS DISTINCT FROM (EXCLUDED.lokasi_id, EXCLUDED.tanggal_lahir)
+        RETURNING (xmax = 0) AS inserted
+    """
+    with get_engine().begin() as conn:
+        ensure_lokasi(conn, df["lokasi"].tolist())
+        flags = [r[0] for r in conn.execute(text(query), {**_master_params(df), "batch_id": batch_id}).fetchall()]
+    inserted = sum(flags)
+    updated = len(flags) - inserted
+    return {"inserted": inserted, "updated": updated, "unchanged": len(df) - len(flags)}
+
 # --- NEW: Read-only lookup for medical checkup uploads ---
+UID_KEY_COLS = ["nama", "jabatan", "lokasi", "tanggal_lahir"]
+
+def _key_param(val):
+    """Turn blank / NaN / NaT key parts into None so they match as wildcards."""
+    if val is None or val == "":
+        return None
+    if pd.isna(val):
+        return None
+    if isinstance(val, pd.Timestamp):
+        return val.date()
+    return val
+
 def get_karyawan_uid_bulk(df):
     """
-    Optimized bulk version of get_karyawan_uid to avoid repeated DB calls.
+    Resolve every distinct (nama, jabatan, lokasi, tanggal_lahir) key in one round trip.
+    Missing jabatan / lokasi / tanggal_lahir act as wildcards, like the old per-key lookup.
     Returns a dict mapping (nama, jabatan, lokasi, tanggal_lahir) -> uid
     """
-    keys = df[["nama", "jabatan", "lokasi", "tanggal_lahir"]].drop_duplicates().to_dict(orient="records")
-    engine = get_engine()
+    keys = df[UID_KEY_COLS].drop_duplicates().to_dict(orient="records")
+    if not keys:
+        return {}
+
+    # All keys travel as parallel arrays and are unnested server-side.
+    params = {"idx": list(range(len(keys)))}
+    for col in UID_KEY_COLS:
+        params[col] = [_key_param(row.get(col)) for row in keys]
+
+    query = """
+        SELECT DISTINCT ON (v.idx) v.idx, k.uid
+        FROM unnest(
+            CAST(:idx AS integer[]), CAST(:nama AS text[]), CAST(:jabatan AS text[]),
+            CAST(:lokasi AS text[]), CAST(:tanggal_lahir AS date[])
+        ) AS v(idx, nama, jabatan, lokasi, tanggal_lahir)
+        JOIN karyawan k
+          ON k.nama = v.nama
+         AND (v.jabatan IS NULL OR k.jabatan = v.jabatan)
+         AND (v.lokasi IS NULL OR k.lokasi_id = lokasi_id_of(v.lokasi))
+         AND (v.tanggal_lahir IS NULL OR k.tanggal_lahir = v.tanggal_lahir)
+        ORDER BY v.idx
+    """
+    with get_engine().connect() as conn:
+        result = conn.execute(text(query), params).fetchall()
+
     mapping = {}
-    with engine.connect() as conn:
-        for row in keys:
-            query = "SELECT uid FROM karyawan WHERE nama = :nama"
-            params = {"nama": row["nama"]}
-            if row.get("jabatan"):
-                query += " AND jabatan = :jabatan"
-                params["jabatan"] = row["jabatan"]
-            if row.get("lokasi"):
-                query += " AND lokasi = :lokasi"
-                params["lokasi"] = row["lokasi"]
-            if row.get("tanggal_lahir"):
-                query += " AND tanggal_lahir = :tanggal_lahir"
-                params["tanggal_lahir"] = row["tanggal_lahir"]
-            result = conn.execute(text(query), params).fetchone()
-            if result:
-                mapping[(row["nama"], row.get("jabatan"), row.get("lokasi"), row.get("tanggal_lahir"))] = result._mapping["uid"]
+    for idx, uid in result:
+        row = keys[idx]
+        mapping[(row["nama"], row.get("jabatan"), row.get("lokasi"), row.get("tanggal_lahir"))] = uid
     return mapping
 
 # --- Checkups ---
+@cached("checkups", "karyawan", "lokasi")
 def load_checkups():
     columns = [
         "c.checkup_id", "c.uid", "c.tanggal_checkup", "c.tanggal_lahir AS tanggal_lahir",
         "c.umur", "c.tinggi", "c.berat", "c.lingkar_perut", "c.bmi",
         "c.gula_darah_puasa", "c.gula_darah_sewaktu", "c.cholesterol", "c.asam_urat",
-        "k.nama", "k.jabatan", "k.lokasi",
+        "k.nama", "k.jabatan", "l.name AS lokasi",
     ]
     df = pd.read_sql(
-        f"SELECT {', '.join(columns)} FROM checkups c JOIN karyawan k ON c.uid = k.uid ORDER BY c.tanggal_checkup DESC",
+        f"SELECT {', '.join(columns)} FROM checkups c JOIN karyawan k ON c.uid = k.uid {_LOKASI_JOIN} "
+        "ORDER BY c.tanggal_checkup DESC",
         get_engine()
     )
     df = _round_numeric_cols(df)
@@ -124,20 +239,265 @@ def load_checkups():
             df[date_col] = pd.to_datetime(df[date_col], errors="coerce").dt.date
     return df
 
-def save_checkups(df):
-    missing_cols = [col for col in CHECKUP_COLUMNS if col not in df.columns]
+# --- Paginated listings (keyset) ---
+PAGE_SIZE = 50
+
+def _fetch_page(query, params, limit, cursor_cols):
+    """
+    Run a keyset query (which must end in LIMIT :limit) for limit + 1 rows.
+    Returns (df of at most limit rows, cursor of the next page or None).
+    """
+    df = pd.read_sql(text(query), get_engine(), params={**params, "limit": limit + 1})
+    if len(df) <= limit:
+        return df, None
+    df = df.iloc[:limit]
+    # Column-wise tolist() gives plain Python values the driver can bind
+    return df, tuple(df[col].iloc[-1:].tolist()[0] for col in cursor_cols)
+
+def _employee_filters(lokasi=None, search=None):
+    where, params = [], {}
+    if lokasi:
+        where.append("k.lokasi_id = ANY(:lokasi)")
+        params["lokasi"] = list(lokasi)
+    if search:
+        where.append("k.nama ILIKE :search")
+        params["search"] = f"%{search}%"
+    return where, params
+
+@cached("karyawan", "lokasi")
+def get_employees_page(after=None, limit=PAGE_SIZE, lokasi=None, search=None):
+    """
+    One page of karyawan ordered by (nama, uid), optionally filtered by lokasi
+    ids / name substring. after is the cursor returned with the previous page.
+    Returns (df, next_cursor or None).
+    """
+    where, params = _employee_filters(lokasi, search)
+    if after:
+        where.append("(k.nama, k.uid) > (:after_nama, CAST(:after_uid AS uuid))")
+        params.update(after_nama=after[0], after_uid=str(after[1]))
+    query = f"""
+        SELECT {_KARYAWAN_COLS} FROM karyawan k {_LOKASI_JOIN}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY k.nama, k.uid LIMIT :limit
+    """
+    return _fetch_page(query, params, limit, ["nama", "uid"])
+
+@cached("karyawan")
+def count_employees(lokasi=None, search=None) -> int:
+    where, params = _employee_filters(lokasi, search)
+    query = f"SELECT COUNT(*) FROM karyawan k {'WHERE ' + ' AND '.join(where) if where else ''}"
+    with get_engine().connect() as conn:
+        return conn.execute(text(query), params).scalar()
+
+def get_employee_lokasi():
+    """Names of the lokasi karyawan are in, sorted."""
+    return list(get_lokasi_options(in_use=True).values())
+
+@cached("checkups", "karyawan", "lokasi")
+def load_checkups_page(after=None, limit=PAGE_SIZE, uid=None, status=None):
+    """
+    One page of checkups (with karyawan nama / jabatan / lokasi), newest first,
+    ordered by (tanggal_checkup, checkup_id) DESC. status="Unwell" reads
+    checkups_unwell_idx. Returns (df, next_cursor or None).
+    """
+    where, params = [], {}
+    if uid:
+        where.append("c.uid = CAST(:uid AS uuid)")
+        params["uid"] = str(uid)
+    if status:
+        where.append("c.status = :status")
+        params["status"] = status
+    if after:
+        where.append("(c.tanggal_checkup, c.checkup_id) < (:after_tanggal, :after_id)")
+        params.update(after_tanggal=after[0], after_id=after[1])
+    query = f"""
+        SELECT c.checkup_id, c.uid, c.tanggal_checkup, c.tanggal_lahir, c.umur,
+               c.tinggi, c.berat, c.lingkar_perut, c.bmi, c.gula_darah_puasa,
+               c.gula_darah_sewaktu, c.cholesterol, c.asam_urat, c.status,
+               k.nama, k.jabatan, l.name AS lokasi
+        FROM checkups c JOIN karyawan k ON c.uid = k.uid {_LOKASI_JOIN}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT :limit
+    """
+    df, cursor = _fetch_page(query, params, limit, ["tanggal_checkup", "checkup_id"])
+    return _round_numeric_cols(df), cursor
+
+@cached("checkups")
+def count_checkups(uid=None, status=None) -> int:
+    where, params = [], {}
+    if uid:
+        where.append("uid = CAST(:uid AS uuid)")
+        params["uid"] = str(uid)
+    if status:
+        where.append("status = :status")
+        params["status"] = status
+    query = "SELECT COUNT(*) FROM checkups" + (" WHERE " + " AND ".join(where) if where else "")
+    with get_engine().connect() as conn:
+        return conn.execute(text(query), params).scalar()
+
+# --- Dashboard: karyawan + latest checkup, filtered in SQL ---
+# Filter spec key -> (SQL expression, how it matches). Every expression is an indexed column.
+DASHBOARD_FILTERS = {
+    "lokasi": ("k.lokasi_id", "any"),                 # lokasi ids
+    "tahun": ("c.tanggal_checkup", "year"),           # a date range, so only that year's partition is read
+    "bulan": ("c.bulan", "eq"),
+    "status": ("COALESCE(c.status, 'Well')", "any"),   # karyawan without a checkup count as Well
+    "search": ("k.nama", "ilike"),
+}
+
+# The same filters over dashboard_rollup (db/rollups.py); "search" has no rollup column
+ROLLUP_FILTERS = {
+    "lokasi": ("r.lokasi_id", "any"),
+    "tahun": ("r.tahun", "eq"),
+    "bulan": ("r.bulan", "eq"),
+    "status": ("r.status", "any"),
+}
+
+def _filter_set(value):
+    # Empty lists, 0, "" and None mean "all", like the dashboard widgets
+    if isinstance(value, (list, tuple, set)):
+        return bool(value)
+    return value not in (None, 0, "")
+
+def compile_dashboard_filter(spec, columns=DASHBOARD_FILTERS):
+    """
+    Compile a dashboard filter spec, e.g.
+        {"lokasi": [3, 5], "tahun": 2025, "bulan": 3, "status": ["Unwell"]}
+    into a parameterized WHERE clause over karyawan k / checkups c (or over
+    dashboard_rollup r with columns=ROLLUP_FILTERS).
+    Empty lists, 0 and None mean "all", like the dashboard widgets.
+    Returns (where_sql, params); where_sql is "" when nothing is filtered.
+    """
+    where, params = [], {}
+    for key, value in (spec or {}).items():
+        if not _filter_set(value):
+            continue
+        if key not in columns:
+            raise ValueError(f"Unknown dashboard filter: {key}")
+        column, match = columns[key]
+        if match == "any":
+            where.append(f"{column} = ANY(:{key})")
+            params[key] = list(value)
+        elif match == "ilike":
+            where.append(f"{column} ILIKE :{key}")
+            params[key] = f"%{value}%"
+        elif match == "year":
+            where.append(f"{column} >= make_date(:{key}, 1, 1) AND {column} < make_date(:{key} + 1, 1, 1)")
+            params[key] = int(value)
+        else:
+            where.append(f"{column} = :{key}")
+            params[key] = int(value)
+    return ("WHERE " + " AND ".join(where) if where else ""), params
+
+# Both key columns of the latest checkup, so the join probes one partition per karyawan
+_DASHBOARD_FROM = (
+    "FROM karyawan k LEFT JOIN checkups c "
+    f"ON c.checkup_id = k.latest_checkup_id AND c.tanggal_checkup = k.latest_tanggal_checkup {_LOKASI_JOIN}"
+)
+
+@cached("karyawan", "checkups", "lokasi")
+def get_dashboard_page(filters=None, after=None, limit=PAGE_SIZE):
+    """
+    One page of the dashboard table: every karyawan matching the filter spec,
+    with its latest checkup and stored status, ordered by (nama, uid).
+    Returns (df, next_cursor or None).
+    """
+    where, params = compile_dashboard_filter(filters)
+    if after:
+        where = (where + " AND " if where else "WHERE ") + "(k.nama, k.uid) > (:after_nama, CAST(:after_uid AS uuid))"
+        params.update(after_nama=after[0], after_uid=str(after[1]))
+    query = f"""
+        SELECT k.uid, c.checkup_id, c.tanggal_checkup, k.nama, k.jabatan,
+               k.tanggal_lahir, c.umur, l.name AS lokasi, COALESCE(c.status, 'Well') AS status,
+               c.tinggi, c.berat, c.bmi, c.lingkar_perut,
+               c.gula_darah_puasa, c.gula_darah_sewaktu, c.cholesterol, c.asam_urat
+        {_DASHBOARD_FROM}
+        {where}
+        ORDER BY k.nama, k.uid LIMIT :limit
+    """
+    df, cursor = _fetch_page(query, params, limit, ["nama", "uid"])
+    # Like the old employees/latest-checkup merge: rounded floats, NaN only for karyawan without a checkup
+    has_checkup = df["checkup_id"].notna()
+    for col in NUMERIC_COLS:
+        values = pd.to_numeric(df[col], errors="coerce").astype(float).round(2)
+        df[col] = values.where(~has_checkup, values.fillna(0))
+    return df, cursor
+
+@cached("dashboard_rollup", "karyawan", "checkups")
+def count_dashboard(filters=None) -> dict:
+    """
+    Row count of the filtered dashboard, split into Well / Unwell. Read from
+    dashboard_rollup (a few rows per lokasi and month) unless the spec uses a
+    filter the rollup cannot answer, like a name search.
+    """
+    active = {key for key, value in (filters or {}).items() if _filter_set(value)}
+    if active <= ROLLUP_FILTERS.keys():
+        where, params = compile_dashboard_filter(filters, ROLLUP_FILTERS)
+        query = f"""
+            SELECT COALESCE(SUM(r.karyawan), 0) AS total,
+                   COALESCE(SUM(r.karyawan) FILTER (WHERE r.status = 'Well'), 0) AS well,
+                   COALESCE(SUM(r.karyawan) FILTER (WHERE r.status = 'Unwell'), 0) AS unwell
+            FROM dashboard_rollup r
+            {where}
+        """
+    else:
+        where, params = compile_dashboard_filter(filters)
+        query = f"""
+            SELECT COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE COALESCE(c.status, 'Well') = 'Well') AS well,
+                   COUNT(*) FILTER (WHERE c.status = 'Unwell') AS unwell
+            {_DASHBOARD_FROM}
+            {where}
+        """
+    with get_engine().connect() as conn:
+        return {key: int(value) for key, value in conn.execute(text(query), params).mappings().fetchone().items()}
+
+@cached("dashboard_rollup", "lokasi")
+def get_dashboard_rollup(filters=None) -> pd.DataFrame:
+    """
+    Karyawan per lokasi / tahun / bulan / status for the filter spec (no
+    "search"), straight from dashboard_rollup; for per-rig summaries and charts.
+    """
+    where, params = compile_dashboard_filter(filters, ROLLUP_FILTERS)
+    query = f"""
+        SELECT r.lokasi_id, l.name AS lokasi, r.tahun, r.bulan, r.status, r.karyawan
+        FROM dashboard_rollup r LEFT JOIN lokasi l ON l.id = r.lokasi_id
+        {where}
+        ORDER BY l.name, r.tahun, r.bulan, r.status
+    """
+    with get_engine().connect() as conn:
+        return pd.read_sql(text(query), conn, params=params)
+
+@cached("dashboard_rollup")
+def get_checkup_years():
+    """Years of the karyawan's latest checkups (the dashboard Tahun filter options)."""
+    with get_engine().connect() as conn:
+        rows = conn.execute(text(
+            "SELECT DISTINCT tahun FROM dashboard_rollup WHERE tahun > 0 ORDER BY tahun"
+        )).fetchall()
+    return [row[0] for row in rows]
+
+def save_checkups(df, policy=None):
+    """
+    Write checkup rows (uid + CHECKUP_COLUMNS). A checkup already stored for the
+    same uid and tanggal_checkup follows the conflict policy (db/checkup_conflicts.py);
+    within df the last row of each pair wins.
+    """
+    columns = ["uid"] + CHECKUP_COLUMNS
+    missing_cols = [col for col in columns if col not in df.columns]
     if missing_cols:
         raise ValueError(f"Missing required columns: {missing_cols}")
-    df = df[CHECKUP_COLUMNS]
+    df = df[columns].drop_duplicates(["uid", "tanggal_checkup"], keep="last")
     df = _round_numeric_cols(df)
     try:
         with get_engine().begin() as conn:
             records = df.to_dict(orient="records")
             if not records:
                 return
-            cols = ", ".join(CHECKUP_COLUMNS)
-            placeholders = ", ".join([f":{c}" for c in CHECKUP_COLUMNS])
-            conn.execute(text(f"INSERT INTO checkups ({cols}) VALUES ({placeholders})"), records)
+            cols = ", ".join("lokasi_id" if c == "lokasi" else c for c in columns)
+            placeholders = ", ".join("lokasi_id_of(:lokasi)" if c == "lokasi" else f":{c}" for c in columns)
+            ensure_checkup_partitions(conn, pd.to_datetime(df["tanggal_checkup"], errors="coerce").dt.year)
+            conn.execute(text(f"INSERT INTO checkups ({cols}) VALUES ({placeholders}) {on_conflict_sql(policy)}"), records)
     except SQLAlchemyError as e:
         raise e
 
@@ -210,15 +570,83 @@ def count_users_by_role(role: str) -> int:
         result = conn.execute(text("SELECT COUNT(*) FROM users WHERE role = :role"), {"role": role}).scalar()
     return result or 0
 
+# --- Upload batch ledger ---
+def start_batch(kind, file_hash, file_name=None, uploaded_by=None) -> dict:
+    """
+    Open (or find) the ledger row of an upload file in one statement.
+    Returns {'batch_id', 'status', 'rows_inserted'}; status 'done' means the same
+    file was fully processed before and can be skipped.
+    """
+    with get_engine().begin() as conn:
+        row = conn.execute(text("""
+            INSERT INTO upload_batches (batch_id, kind, file_name, file_hash, uploaded_by)
+            VALUES (gen_random_uuid(), :kind, :file_name, :file_hash, :uploaded_by)
+            ON CONFLICT (kind, file_hash) DO UPDATE SET kind = EXCLUDED.kind
+            RETURNING batch_id, status, rows_inserted
+        """), {"kind": kind, "file_name": file_name, "file_hash": file_hash, "uploaded_by": uploaded_by}).fetchone()
+    return {"batch_id": str(row.batch_id), "status": row.status, "rows_inserted": row.rows_inserted}
+
+def finish_batch(batch_id, inserted=0, updated=0, skipped=0):
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            UPDATE upload_batches
+            SET status = 'done', rows_inserted = :inserted, rows_updated = :updated,
+                rows_skipped = :skipped, finished_at = NOW()
+            WHERE batch_id = :batch_id
+        """), {"batch_id": batch_id, "inserted": inserted, "updated": updated, "skipped": skipped})
+
 def get_upload_history() -> pd.DataFrame:
-    records = []
-    for fname in os.listdir(UPLOAD_DIR):
-        path = os.path.join(UPLOAD_DIR, fname)
-        if os.path.isfile(path):
-            size_kb = round(os.path.getsize(path) / 1024, 2)
-            created_at = pd.to_datetime(os.path.getctime(path), unit='s')
-            records.append({"filename": fname, "size_kb": size_kb, "created_at": created_at})
-    return pd.DataFrame(records)
+    """Upload batches, newest first, straight from the ledger."""
+    with get_engine().connect() as conn:
+        return pd.read_sql(text("""
+            SELECT batch_id AS upload_batch_id, kind, file_name, uploaded_by, status,
+                   rows_inserted, rows_updated, rows_skipped, started_at, finished_at
+            FROM upload_batches
+            ORDER BY started_at DESC
+        """), conn)
+
+# Checkups that deleting this batch would take with it although another upload
+# (or a manual entry) wrote them: those of the karyawan a master batch created
+_OTHER_BATCH_CHECKUPS = """
+    SELECT COUNT(*) FROM checkups c JOIN karyawan k ON k.uid = c.uid
+    WHERE k.batch_id = :batch_id AND c.batch_id IS DISTINCT FROM :batch_id
+"""
+
+def count_other_batch_checkups(batch_id) -> int:
+    """Checkups from other uploads or manual entries that delete_batch(batch_id) would also remove."""
+    with get_engine().connect() as conn:
+        return conn.execute(text(_OTHER_BATCH_CHECKUPS), {"batch_id": batch_id}).scalar()
+
+def delete_batch(batch_id, include_other_checkups=False):
+    """
+    Roll back an upload in one statement: removing the ledger row cascades to the
+    karyawan / checkups rows it created (indexed batch_id FKs), and the file's
+    upload checkpoints go with it so the same file can be uploaded again.
+
+    Only rows the batch created are removed. Rows it updated (existing karyawan of a
+    master import, checkups it overwrote under the conflict policy) keep the values
+    it wrote; nothing is reverted.
+
+    Deleting a master batch also deletes every checkup of the karyawan it created,
+    whichever upload wrote them. Unless include_other_checkups is True, a batch whose
+    karyawan have checkups from other uploads or manual entries is refused with a
+    ValueError (see count_other_batch_checkups).
+    """
+    with get_engine().begin() as conn:
+        if not include_other_checkups:
+            others = conn.execute(text(_OTHER_BATCH_CHECKUPS), {"batch_id": batch_id}).scalar()
+            if others:
+                raise ValueError(
+                    f"Batch {batch_id} created karyawan with {others} checkups from other uploads or manual entries"
+                )
+        conn.execute(text("""
+            WITH deleted AS (
+                DELETE FROM upload_batches WHERE batch_id = :batch_id RETURNING file_hash
+            )
+            DELETE FROM upload_checkpoints c USING deleted d WHERE c.file_hash = d.file_hash
+        """), {"batch_id": batch_id})
+    # Cards showing archived rows of the batch (Parquet keeps them; reads now leave them out)
+    refresh_result_cards(archived_batch_uids(batch_id))
 
 # --- Karyawan manual edits ---
 def save_manual_karyawan_edits(df: pd.DataFrame):
@@ -232,10 +660,14 @@ def save_manual_karyawan_edits(df: pd.DataFrame):
                 continue
             updates = {col: row[col] for col in row.index if col != "uid" and pd.notna(row[col])}
             if updates:
-                set_clause = ", ".join([f"{col} = :{col}" for col in updates.keys()])
+                set_clause = ", ".join([
+                    "lokasi_id = lokasi_id_of(:lokasi)" if col == "lokasi" else f"{col} = :{col}"
+                    for col in updates.keys()
+                ])
                 sql = f"UPDATE karyawan SET {set_clause} WHERE uid = :uid"
                 updates["uid"] = uid
-                conn.execute(sql, updates)
+                conn.execute(text(sql), updates)
+    refresh_result_cards(df["uid"].dropna())
     return len(df)
 
 def reset_karyawan_data():
@@ -245,31 +677,45 @@ def reset_karyawan_data():
 get_all_karyawan = get_employees
 
 # --- Medical Checkups ---
+@cached("checkups", "lokasi")
 def get_medical_checkups_by_uid(uid: str) -> pd.DataFrame:
-    query = """
-        SELECT checkup_id, uid, tanggal_checkup, tanggal_lahir, umur,
-               tinggi, berat, lingkar_perut, bmi, gula_darah_puasa,
-               gula_darah_sewaktu, cholesterol, asam_urat, lokasi
-        FROM checkups WHERE uid = :uid ORDER BY tanggal_checkup DESC
+    """Full history of one karyawan, newest first: Postgres plus the Parquet archive (db/archive.py)."""
+    columns = [
+        "checkup_id", "uid", "tanggal_checkup", "tanggal_lahir", "umur",
+        "tinggi", "berat", "lingkar_perut", "bmi", "gula_darah_puasa",
+        "gula_darah_sewaktu", "cholesterol", "asam_urat", "lokasi", "status",
+    ]
+    select = ", ".join("l.name AS lokasi" if col == "lokasi" else f"c.{col}" for col in columns)
+    query = f"""
+        SELECT {select} FROM checkups c LEFT JOIN lokasi l ON l.id = c.lokasi_id
+        WHERE c.uid = :uid ORDER BY c.tanggal_checkup DESC
     """
-    try:
-        with get_engine().connect() as conn:
-            df = pd.read_sql(query, conn, params={"uid": uid})
-            df = _round_numeric_cols(df)
-            for date_col in ["tanggal_checkup", "tanggal_lahir"]:
-                if date_col in df.columns:
-                    df[date_col] = pd.to_datetime(df[date_col], errors="coerce").dt.date
-            return df
-    except Exception as e:
-        print(f"❌ Error fetching checkups for UID {uid}: {e}")
-        return pd.DataFrame()
+    # Errors propagate (to the UI), so a failed read is never cached as an empty history
+    with get_engine().connect() as conn:
+        df = pd.read_sql(text(query), conn, params={"uid": str(uid)})
+    archived = read_archived_checkups(uid)
+    if not archived.empty:
+        archived = drop_superseded(archived, df)
+        df = pd.concat([df, archived[columns]], ignore_index=True)
+        df["uid"] = df["uid"].astype(str)
+        df = df.sort_values(["tanggal_checkup", "checkup_id"], ascending=False, ignore_index=True)
+    df = _round_numeric_cols(df)
+    for date_col in ["tanggal_checkup", "tanggal_lahir"]:
+        if date_col in df.columns:
+            df[date_col] = pd.to_datetime(df[date_col], errors="coerce").dt.date
+    return df
 
 # --- Insert medical checkup ---
 def insert_medical_checkup(
     uid: str, tanggal_checkup, tinggi, berat, lingkar_perut, bmi,
     gula_darah_puasa, gula_darah_sewaktu, cholesterol, asam_urat,
-    tanggal_lahir=None, umur=None, lokasi=None
+    tanggal_lahir=None, umur=None, lokasi=None, policy=None
 ):
+    """
+    Write one checkup. One already stored for the same uid and tanggal_checkup
+    follows the conflict policy (db/checkup_conflicts.py).
+    Returns 'inserted', 'updated' or 'unchanged'.
+    """
     # Round numeric values safely
     try: tinggi = round(float(tinggi or 0), 2)
     except: tinggi = 0.0
@@ -289,19 +735,24 @@ def insert_medical_checkup(
     except: asam_urat = 0.0
 
     with get_engine().begin() as conn:
-        sql = """
+        ensure_checkup_partitions(conn, [pd.to_datetime(tanggal_checkup, errors="coerce").year])
+        sql = f"""
             INSERT INTO checkups (
                 uid, tanggal_checkup, tinggi, berat, lingkar_perut, bmi,
                 gula_darah_puasa, gula_darah_sewaktu, cholesterol, asam_urat,
-                tanggal_lahir, umur, lokasi
+                tanggal_lahir, umur, lokasi_id
             )
             VALUES (
                 :uid, :tanggal_checkup, :tinggi, :berat, :lingkar_perut, :bmi,
                 :gula_darah_puasa, :gula_darah_sewaktu, :cholesterol, :asam_urat,
-                :tanggal_lahir, :umur, :lokasi
+                :tanggal_lahir, :umur, lokasi_id_of(:lokasi)
             )
+            {on_conflict_sql(policy)}
         """
-        conn.execute(text(sql), {
+        existing = conn.execute(text(
+            "SELECT 1 FROM checkups WHERE uid = CAST(:uid AS uuid) AND tanggal_checkup = :tanggal_checkup"
+        ), {"uid": str(uid), "tanggal_checkup": tanggal_checkup}).scalar()
+        written = conn.execute(text(sql), {
             "uid": uid,
             "tanggal_checkup": tanggal_checkup,
             "tinggi": tinggi,
@@ -315,7 +766,12 @@ def insert_medical_checkup(
             "tanggal_lahir": tanggal_lahir,
             "umur": umur,
             "lokasi": lokasi
-        })
+        }).rowcount
+    if written:
+        refresh_result_cards([uid])
+    if not existing:
+        return "inserted"
+    return "updated" if written else "unchanged"
 
 # --- Delete checkup ---
 def delete_checkup(checkup_id: str):
@@ -325,35 +781,33 @@ def delete_checkup(checkup_id: str):
 update_employee_data = save_manual_karyawan_edits
 
 # --- Latest medical checkup ---
+@cached("checkups", "karyawan", "lokasi")
 def get_latest_medical_checkup(uid: str = None) -> pd.DataFrame:
-    try:
-        with get_engine().connect() as conn:
-            if uid:
-                query = """
-                    SELECT checkup_id, uid, tanggal_checkup, tanggal_lahir, umur,
-                           tinggi, berat, lingkar_perut, bmi, gula_darah_puasa,
-                           gula_darah_sewaktu, cholesterol, asam_urat, lokasi
-                    FROM checkups WHERE uid = :uid ORDER BY tanggal_checkup DESC
-                """
-                df = pd.read_sql(query, conn, params={"uid": uid})
-            else:
-                query = """
-                    SELECT mc.* FROM checkups mc
-                    INNER JOIN (
-                        SELECT uid, MAX(tanggal_checkup) AS latest_checkup
-                        FROM checkups GROUP BY uid
-                    ) AS latest
-                    ON mc.uid = latest.uid AND mc.tanggal_checkup = latest.latest_checkup
-                """
-                df = pd.read_sql(query, conn)
-            df = _round_numeric_cols(df)
-            for date_col in ["tanggal_checkup", "tanggal_lahir"]:
-                if date_col in df.columns:
-                    df[date_col] = pd.to_datetime(df[date_col], errors="coerce").dt.date
-            return df
-    except Exception as e:
-        print(f"❌ Error fetching checkups: {e}")
-        return pd.DataFrame()
+    # Errors propagate (to the UI), so a failed read is never cached as an empty frame
+    with get_engine().connect() as conn:
+        if uid:
+            query = """
+                SELECT c.checkup_id, c.uid, c.tanggal_checkup, c.tanggal_lahir, c.umur,
+                       c.tinggi, c.berat, c.lingkar_perut, c.bmi, c.gula_darah_puasa,
+                       c.gula_darah_sewaktu, c.cholesterol, c.asam_urat, l.name AS lokasi
+                FROM checkups c LEFT JOIN lokasi l ON l.id = c.lokasi_id
+                WHERE c.uid = :uid ORDER BY c.tanggal_checkup DESC
+            """
+            df = pd.read_sql(text(query), conn, params={"uid": uid})
+        else:
+            # One row per karyawan via the trigger-maintained pointer; cost does not grow with history
+            query = """
+                SELECT mc.*, l.name AS lokasi FROM karyawan k
+                INNER JOIN checkups mc
+                    ON mc.checkup_id = k.latest_checkup_id AND mc.tanggal_checkup = k.latest_tanggal_checkup
+                LEFT JOIN lokasi l ON l.id = mc.lokasi_id
+            """
+            df = pd.read_sql(text(query), conn)
+        df = _round_numeric_cols(df)
+        for date_col in ["tanggal_checkup", "tanggal_lahir"]:
+            if date_col in df.columns:
+                df[date_col] = pd.to_datetime(df[date_col], errors="coerce").dt.date
+        return df
 
 def delete_all_checkups():
     with get_engine().begin() as conn:
@@ -0,0 +1,165 @@
+# db/result_cards.py
+"""
+Result cards of the QR portal. Each karyawan has one precomputed card in
+result_cards (migration 14) holding everything the portal shows: the profile
+and its last RESULT_CARD_HISTORY checkups (archived years included, status
+filled in), newest first, so its first row is the latest checkup; the full
+history is get_medical_checkups_by_uid's. A scan reads it with one
+indexed lookup, whatever the size of the company, and repeated scans are
+served from the query cache (db/cache.py) until a write bumps one of its tables.
+
+A card is current while
+- its karyawan row is the version it was built from (karyawan_xmin). Every
+  write that changes a card rewrites that row: profile edits directly,
+  checkup inserts / updates / deletes through refresh_latest_checkup;
+- its lokasi row is the version it was built from (lokasi_xmin; the profile
+  shows the lokasi name), so only a rename of that lokasi makes it stale.
+
+Manual checkups and karyawan edits rebuild the cards they changed right after
+committing. Anything else (checkup and master uploads, lokasi renames, the
+archive job) leaves stale cards behind: never served, since a scan rebuilds a
+stale card first. The upload worker builds them in the background once its
+queue is drained, and so does
+
+    python -m db.result_cards   # build every missing or stale card
+"""
+import json
+import uuid
+import pandas as pd
+from sqlalchemy import text
+from config.settings import RESULT_CARD_HISTORY
+from db.database import get_engine
+from db.cache import cached
+from db.archive import read_archived_checkups, drop_superseded
+from db.health_rules import compute_status
+
+HISTORY_COLUMNS = [
+    "tanggal_checkup", "umur", "tinggi", "berat", "lingkar_perut", "bmi",
+    "gula_darah_puasa", "gula_darah_sewaktu", "cholesterol", "asam_urat", "status",
+]
+BUILD_CHUNK = 1_000
+
+# Needs karyawan k and its lokasi l (LEFT JOIN: a karyawan may have no lokasi)
+_CURRENT = "r.karyawan_xmin = k.xmin AND r.lokasi_xmin IS NOT DISTINCT FROM l.xmin"
+
+def _valid_uid(uid):
+    try:
+        return str(uuid.UUID(str(uid)))
+    except ValueError:
+        return None
+
+def get_result_card(uid):
+    """
+    The card of one karyawan: {'profile': {...}, 'history': [...]}, its last
+    RESULT_CARD_HISTORY checkups, newest first. Built first when missing or
+    stale; None for an unknown uid.
+    """
+    uid = _valid_uid(uid)
+    if uid is None:
+        return None
+    return _load_result_card(uid)
+
+# Every write that can change a card bumps one of these versions, so a hit is never stale
+@cached("karyawan", "checkups", "lokasi")
+def _load_result_card(uid):
+    with get_engine().connect() as conn:
+        card = conn.execute(text(f"""
+            SELECT r.card FROM result_cards r JOIN karyawan k ON k.uid = r.uid
+            LEFT JOIN lokasi l ON l.id = k.lokasi_id
+            WHERE r.uid = CAST(:uid AS uuid) AND {_CURRENT}
+        """), {"uid": uid}).scalar()
+    if card is not None:
+        return card
+    return build_result_cards([uid]).get(uid)
+
+def _records(df):
+    for col in df.columns:
+        if col.startswith("tanggal"):
+            df[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime("%Y-%m-%d")
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def build_result_cards(uids) -> dict:
+    """Build and store the cards of these karyawan. Returns {uid: card}; unknown uids are left out."""
+    uids = sorted({uid for uid in map(_valid_uid, uids) if uid})
+    if not uids:
+        return {}
+    params = {"uids": uids}
+    # Profiles, versions and history from one snapshot, so a card matches the versions stored with it
+    with get_engine().connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+        profiles = pd.read_sql(text("""
+            SELECT k.uid::text AS uid, k.xmin::text AS karyawan_xmin, l.xmin::text AS lokasi_xmin,
+                   k.nama, k.jabatan, l.name AS lokasi, k.tanggal_lahir
+            FROM karyawan k LEFT JOIN lokasi l ON l.id = k.lokasi_id
+            WHERE k.uid = ANY(CAST(:uids AS uuid[]))
+        """), conn, params=params)
+        history = pd.read_sql(text(f"""
+            SELECT c.checkup_id, c.uid::text AS uid, {', '.join(f'c.{col}' for col in HISTORY_COLUMNS)}
+            FROM checkups c WHERE c.uid = ANY(CAST(:uids AS uuid[]))
+        """), conn, params=params)
+    # Read after the snapshot: a row the archive job has since moved is already in the archive
+    archived = read_archived_checkups(uids)
+    if not archived.empty:
+        archived = drop_superseded(archived, history)
+        history = pd.concat([history, archived[history.columns]], ignore_index=True)
+    history = history.sort_values(["uid", "tanggal_checkup", "checkup_id"], ascending=[True, False, False])
+    history = history.groupby("uid", sort=False).head(RESULT_CARD_HISTORY)
+    history["status"] = history["status"].fillna(compute_status(history))
+    numeric = [col for col in HISTORY_COLUMNS if col not in ("tanggal_checkup", "umur", "status")]
+    history[numeric] = history[numeric].apply(pd.to_numeric, errors="coerce").round(2)
+    by_uid = dict(tuple(history.groupby("uid", sort=False)))
+
+    cards, rows = {}, []
+    for profile in _records(profiles.drop(columns=["karyawan_xmin", "lokasi_xmin"])):
+        rows_of = by_uid.get(profile["uid"], pd.DataFrame(columns=history.columns))
+        cards[profile["uid"]] = {"profile": profile, "history": _records(rows_of[HISTORY_COLUMNS].copy())}
+    for uid, xmin, lokasi_xmin in zip(profiles["uid"], profiles["karyawan_xmin"], profiles["lokasi_xmin"]):
+        rows.append({
+            "uid": uid, "xmin": xmin, "lokasi_xmin": None if pd.isna(lokasi_xmin) else lokasi_xmin,
+            "card": json.dumps(cards[uid], default=lambda v: v.item() if hasattr(v, "item") else str(v)),
+        })
+    if rows:
+        with get_engine().begin() as conn:
+            # From karyawan: a karyawan deleted since the snapshot gets no card
+            conn.execute(text("""
+                INSERT INTO result_cards (uid, karyawan_xmin, lokasi_xmin, card, built_at)
+                SELECT k.uid, CAST(:xmin AS xid), CAST(:lokasi_xmin AS xid), CAST(:card AS jsonb), NOW()
+                FROM karyawan k WHERE k.uid = CAST(:uid AS uuid)
+                ON CONFLICT (uid) DO UPDATE SET
+                    karyawan_xmin = EXCLUDED.karyawan_xmin, lokasi_xmin = EXCLUDED.lokasi_xmin,
+                    card = EXCLUDED.card, built_at = EXCLUDED.built_at
+            """), rows)
+    return cards
+
+def refresh_result_cards(uids):
+    """
+    Rebuild the cards of a committed write. A failure does not fail the write:
+    the cards stay stale and the next scan rebuilds them.
+    """
+    uids = list(uids)
+    try:
+        for start in range(0, len(uids), BUILD_CHUNK):
+            build_result_cards(uids[start:start + BUILD_CHUNK])
+    except Exception as e:
+        print(f"⚠️ Result cards not refreshed: {e}")
+
+def stale_result_card_uids() -> list:
+    """Karyawan whose card is missing or stale."""
+    with get_engine().connect() as conn:
+        return conn.execute(text(f"""
+            SELECT k.uid::text FROM karyawan k LEFT JOIN result_cards r ON r.uid = k.uid
+            LEFT JOIN lokasi l ON l.id = k.lokasi_id
+            WHERE r.uid IS NULL OR NOT ({_CURRENT})
+        """)).scalars().all()
+
+def build_stale_result_cards() -> int:
+    """Build every missing or stale card, BUILD_CHUNK karyawan at a time. Returns the cards built."""
+    stale = stale_result_card_uids()
+    for start in range(0, len(stale), BUILD_CHUNK):
+        build_result_cards(stale[start:start + BUILD_CHUNK])
+    return len(stale)
+
+# ---------------------------------------------------------------------
+# SCRIPT ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    print(f"✅ {build_stale_result_cards()} result cards built")
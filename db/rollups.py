@@ -0,0 +1,84 @@
+# db/rollups.py
+"""
+dashboard_rollup holds the number of karyawan per (lokasi_id, tahun, bulan, status)
+of their latest checkup. Triggers on karyawan keep it current (migration 7), so
+dashboard counters read a few rows per rig and month instead of every checkup.
+
+Consistency check / rebuild from scratch:
+
+    python -m db.rollups             # print buckets that differ from a fresh recount
+    python -m db.rollups --rebuild   # recompute latest-checkup pointers and the rollup
+"""
+import sys
+import pandas as pd
+from sqlalchemy import text
+from db.database import get_engine
+
+# The rollup recounted from checkups itself, without the trigger-maintained pointers
+ROLLUP_RECOUNT_SQL = """
+    SELECT COALESCE(k.lokasi_id, 0) AS lokasi_id, COALESCE(l.tahun, 0) AS tahun,
+           COALESCE(l.bulan, 0) AS bulan, COALESCE(l.status, 'Well') AS status,
+           COUNT(*) AS karyawan
+    FROM karyawan k
+    LEFT JOIN LATERAL (
+        SELECT c.tahun, c.bulan, c.status FROM checkups c WHERE c.uid = k.uid
+        ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+    ) l ON TRUE
+    GROUP BY 1, 2, 3, 4
+"""
+
+def diff_rollup() -> pd.DataFrame:
+    """Buckets whose stored count differs from a fresh recount (empty when consistent)."""
+    query = f"""
+        SELECT lokasi_id, tahun, bulan, status,
+               COALESCE(s.karyawan, 0) AS stored, COALESCE(f.karyawan, 0) AS recount
+        FROM ({ROLLUP_RECOUNT_SQL}) f
+        FULL JOIN dashboard_rollup s USING (lokasi_id, tahun, bulan, status)
+        WHERE s.karyawan IS DISTINCT FROM f.karyawan
+        ORDER BY lokasi_id, tahun, bulan, status
+    """
+    with get_engine().connect() as conn:
+        return pd.read_sql(text(query), conn)
+
+def rebuild_rollup() -> dict:
+    """
+    Re-point every karyawan at its latest checkup and recount dashboard_rollup,
+    e.g. after a TRUNCATE or a manual fix that bypassed the triggers. Writes to
+    karyawan / checkups wait until it commits.
+    Returns {'repointed': int, 'buckets': int}
+    """
+    with get_engine().begin() as conn:
+        conn.execute(text("LOCK TABLE karyawan, checkups IN SHARE MODE"))
+        repointed = conn.execute(text("""
+            UPDATE karyawan k
+            SET latest_checkup_id = l.checkup_id, latest_tanggal_checkup = l.tanggal_checkup,
+                latest_tahun = l.tahun, latest_bulan = l.bulan, latest_status = l.status
+            FROM karyawan k2
+            LEFT JOIN LATERAL (
+                SELECT c.checkup_id, c.tanggal_checkup, c.tahun, c.bulan, c.status FROM checkups c WHERE c.uid = k2.uid
+                ORDER BY c.tanggal_checkup DESC, c.checkup_id DESC LIMIT 1
+            ) l ON TRUE
+            WHERE k.uid = k2.uid
+              AND (k.latest_checkup_id, k.latest_tanggal_checkup, k.latest_tahun, k.latest_bulan, k.latest_status)
+                  IS DISTINCT FROM (l.checkup_id, l.tanggal_checkup, l.tahun, l.bulan, l.status)
+        """)).rowcount
+        conn.execute(text("DELETE FROM dashboard_rollup"))
+        buckets = conn.execute(text(
+            f"INSERT INTO dashboard_rollup (lokasi_id, tahun, bulan, status, karyawan) {ROLLUP_RECOUNT_SQL}"
+        )).rowcount
+    return {"repointed": repointed, "buckets": buckets}
+
+# ---------------------------------------------------------------------
+# SCRIPT ENTRY POINT
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv[1:]:
+        result = rebuild_rollup()
+        print(f"✅ Rollup rebuilt: {result['buckets']} buckets, {result['repointed']} karyawan re-pointed")
+    else:
+        diff = diff_rollup()
+        if diff.empty:
+            print("✅ dashboard_rollup is consistent")
+        else:
+            print(diff.to_string(index=False))
+            print(f"⚠️ {len(diff)} bucket(s) differ; run with --rebuild to fix")
@@ -0,0 +1,84 @@
+# db/snapshot.py
+"""
+Read-only columnar snapshot of the combined dashboard dataset (every karyawan
+with its latest checkup, db/helpers.get_dashboard_checkup_data) in Arrow IPC
+format, one file per data version:
+
+    snapshots/dashboard-<karyawan>-<checkups>-<lokasi>.arrow
+
+The first reader of a new version writes the file (renamed into place when
+complete); every session and server process on the host then memory-maps that
+same file, so the rows live once in the page cache instead of once per
+session, and a restarted server starts warm. Sessions materialize only the
+slice they show (slice_snapshot).
+"""
+import os
+import uuid
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from config.settings import SNAPSHOT_DIR
+from db.helpers import get_dashboard_checkup_data
+from db.notify import current_data_versions
+
+SNAPSHOT_TABLES = ("karyawan", "checkups", "lokasi")
+UUID_COLUMNS = ("uid", "batch_id")
+
+_lock = threading.Lock()
+_mapped = {}   # the snapshot this process has open: {"path", "table"}
+
+def snapshot_path(versions) -> str:
+    return os.path.join(SNAPSHOT_DIR, "dashboard-" + "-".join(str(v) for v in versions) + ".arrow")
+
+def _write_snapshot(path):
+    # Versions are read before the data, so a file is never older than its name
+    df = get_dashboard_checkup_data()
+    # uuid.UUID values would be read back from the file as raw bytes; keep them as text
+    for col in UUID_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)   # atomic: other processes see no file or a complete one
+
+def _remove_old_snapshots(keep):
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if name.startswith("dashboard-") and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass   # still mapped by a process on Windows, or removed by another process
+
+def get_snapshot() -> pa.Table:
+    """
+    The snapshot of the current data version, memory-mapped and shared by every
+    session of this process. Written first if no process has written it yet.
+    """
+    path = snapshot_path(current_data_versions(SNAPSHOT_TABLES))
+    with _lock:
+        if _mapped.get("path") != path:
+            try:
+                table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            except FileNotFoundError:
+                _write_snapshot(path)
+                _remove_old_snapshots(keep=path)
+                table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            _mapped.update(path=path, table=table)
+        return _mapped["table"]
+
+def slice_snapshot(table, lokasi=None, tanggal_checkup=None) -> pd.DataFrame:
+    """Rows of `table` in the `lokasi` names and / or of one tanggal_checkup, as a new DataFrame."""
+    mask = None
+    if lokasi and "lokasi" in table.column_names:
+        mask = pc.is_in(table["lokasi"], value_set=pa.array(list(lokasi), pa.string()))
+    if tanggal_checkup and "tanggal_checkup" in table.column_names:
+        on_date = pc.equal(table["tanggal_checkup"], pa.scalar(tanggal_checkup, pa.date32()))
+        mask = on_date if mask is None else pc.and_(mask, on_date)
+    if mask is not None:
+        table = table.filter(mask)
+    return table.to_pandas()
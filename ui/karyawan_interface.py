@@ -1,12 +1,14 @@
 # ui/karyawan_interface.py
 import streamlit as st
 import pandas as pd
-from db.queries import load_checkups, get_employee_by_uid
+from db.result_cards import get_result_card, HISTORY_COLUMNS
+from db.health_rules import highlight_unwell
 
-def karyawan_interface(uid=None):
+def karyawan_interface(uid=None, card=None):
     """
     Landing page for karyawan to view their medical checkup.
     Accessed via a URL with ?uid=<unique_id> or via QR code session.
+    card: the karyawan's result card when the caller already has it.
     """
 
     st.header("🏥 Medical Check-Up Result")
@@ -27,57 +29,37 @@ def karyawan_interface(uid=None):
         return
 
     # ---------------------------
-    # 2️⃣ Load employee and checkup data
+    # 2️⃣ Load the result card (profile + history, see db/result_cards.py)
     # ---------------------------
     try:
-        emp_raw = get_employee_by_uid(uid)
-        if emp_raw is None:
+        if card is None:
+            card = get_result_card(uid)
+        if card is None:
             st.warning("❌ Data karyawan tidak ditemukan.")
             return
-        emp = emp_raw.to_dict() if hasattr(emp_raw, "to_dict") else emp_raw
+        emp = card["profile"]
     except Exception as e:
         st.error(f"❌ Gagal mengambil data karyawan: {e}")
         return
 
-    try:
-        df_checkups = load_checkups()
-        if df_checkups.empty:
-            st.warning("Belum ada data medical check-up di sistem.")
-            return
-        df_user = df_checkups[df_checkups["uid"].astype(str) == str(uid)]
-        if df_user.empty:
-            st.warning("❌ Data medical check-up tidak ditemukan untuk UID ini.")
-            return
-        df_user["tanggal_checkup"] = pd.to_datetime(df_user["tanggal_checkup"], errors="coerce").dt.date
-
-        # ---------------------------
-        # Patch: Round numeric columns
-        # ---------------------------
-        numeric_cols = ["tinggi", "berat", "lingkar_perut", "bmi",
-                        "gula_darah_puasa", "gula_darah_sewaktu",
-                        "cholesterol", "asam_urat"]
-        df_user[numeric_cols] = df_user[numeric_cols].round(2)
-
-    except Exception as e:
-        st.error(f"❌ Gagal mengambil data checkup: {e}")
+    # This karyawan's last RESULT_CARD_HISTORY checkups, archived years included, newest first;
+    # status (Unwell/Well) is filled in when the card is built
+    df_user = pd.DataFrame(card["history"], columns=HISTORY_COLUMNS)
+    if df_user.empty:
+        st.warning("❌ Data medical check-up tidak ditemukan untuk UID ini.")
         return
+    # Shown with the karyawan's current jabatan / lokasi, as before
+    df_user["jabatan"] = emp.get("jabatan")
+    df_user["lokasi"] = emp.get("lokasi")
+    df_user["tanggal_checkup"] = pd.to_datetime(df_user["tanggal_checkup"], errors="coerce").dt.date
 
-    # ---------------------------
-    # 3️⃣ Compute status (Unwell/Well)
-    # ---------------------------
-    def compute_status(row):
-        if ((row.get("gula_darah_puasa", 0) > 120) or
-            (row.get("gula_darah_sewaktu", 0) > 200) or
-            (row.get("cholesterol", 0) > 240) or
-            (row.get("asam_urat", 0) > 7) or
-            (row.get("bmi", 0) >= 30)):
-            return "Unwell"
-        return "Well"
-
-    df_user["status"] = df_user.apply(compute_status, axis=1)
+    numeric_cols = ["tinggi", "berat", "lingkar_perut", "bmi",
+                    "gula_darah_puasa", "gula_darah_sewaktu",
+                    "cholesterol", "asam_urat"]
+    df_user[numeric_cols] = df_user[numeric_cols].apply(pd.to_numeric, errors="coerce")
 
     # ---------------------------
-    # 4️⃣ Display profile info
+    # 3️⃣ Display profile info
     # ---------------------------
     st.subheader("👤 Profil Karyawan")
     st.markdown(f"**Nama:** {emp.get('nama','')}")
@@ -87,9 +69,9 @@ def karyawan_interface(uid=None):
     st.markdown(f"**Kontak Darurat:** {emp.get('kontak_darurat','-') or '-'}")
 
     # ---------------------------
-    # 5️⃣ Display latest checkup
+    # 4️⃣ Display latest checkup
     # ---------------------------
-    latest = df_user.sort_values("tanggal_checkup", ascending=False).iloc[0]
+    latest = df_user.iloc[0]
     st.subheader("📊 Hasil Terbaru")
     col1, col2, col3 = st.columns(3)
 
@@ -107,22 +89,10 @@ def karyawan_interface(uid=None):
         st.metric("Asam Urat", f"{latest['asam_urat']:.2f} mg/dL")
 
     # ---------------------------
-    # 6️⃣ Display full history
+    # 5️⃣ Display recent history
     # ---------------------------
     st.subheader("📜 Riwayat Pemeriksaan")
-    df_history = df_user.sort_values("tanggal_checkup", ascending=False)
-
-    def highlight_unwell(row):
-        styles = []
-        for col, v in row.items():
-            if col == "gula_darah_puasa": styles.append("color: red" if v>120 else "")
-            elif col == "gula_darah_sewaktu": styles.append("color: red" if v>200 else "")
-            elif col == "cholesterol": styles.append("color: red" if v>240 else "")
-            elif col == "asam_urat": styles.append("color: red" if v>7 else "")
-            elif col == "bmi": styles.append("color: red" if v>=30 else "")
-            elif col == "lingkar_perut": styles.append("color: red" if v>90 else "")
-            else: styles.append("")
-        return styles
+    df_history = df_user
 
     # ---------------------------
     # Round numeric columns for display like manager
@@ -142,12 +112,12 @@ def karyawan_interface(uid=None):
              "cholesterol": "{:.2f}",
              "asam_urat": "{:.2f}",
          })
-         .apply(highlight_unwell, axis=1),
+         .apply(highlight_unwell, axis=None),
         use_container_width=True
     )
 
     # ---------------------------
-    # 7️⃣ Footer
+    # 6️⃣ Footer
     # ---------------------------
     st.markdown("---")
     st.info("ℹ️ Hubungi tenaga kesehatan jika ada pertanyaan mengenai hasil medical check-up Anda.")
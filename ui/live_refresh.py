@@ -0,0 +1,28 @@
+# ui/live_refresh.py
+import streamlit as st
+from config.settings import LIVE_REFRESH_SECONDS
+from db.notify import start_listener, current_data_versions
+
+DASHBOARD_TABLES = ("karyawan", "checkups", "lokasi")
+
+def _check_versions(key, tables):
+    if current_data_versions(tables) != st.session_state.get(key):
+        st.rerun()
+
+# Re-runs on its own every LIVE_REFRESH_SECONDS where st.fragment exists
+_poll_versions = (
+    st.fragment(run_every=LIVE_REFRESH_SECONDS)(_check_versions) if hasattr(st, "fragment") else None
+)
+
+def live_refresh(key, tables=DASHBOARD_TABLES):
+    """
+    Rerun the page once data in `tables` is written by any process. Only a
+    version compare runs every LIVE_REFRESH_SECONDS (in memory while the
+    db/notify.py listener is connected); the page's queries run again only
+    after a write. Call before the page reads the data it shows.
+    """
+    start_listener()
+    # This run already shows the data as of these versions
+    st.session_state[key] = current_data_versions(tables)
+    if _poll_versions is not None:
+        _poll_versions(key, tables)
@@ -4,8 +4,12 @@ import pandas as pd
 from io import BytesIO
 from datetime import datetime
 from db.queries import (
-    load_checkups, save_uploaded_checkups, get_users, add_user, get_employees, reset_karyawan_data,
+    save_uploaded_checkups, get_users, add_user, reset_karyawan_data,
+    get_employees_page, count_employees, get_employee_lokasi,
+    get_dashboard_page, count_dashboard, get_checkup_years, PAGE_SIZE,
 )
+from db.lokasi import get_lokasi_options, count_lokasi_usage, rename_lokasi, delete_lokasi
+from db.health_rules import highlight_unwell
 from config.settings import CSV_FILENAME, EXCEL_FILENAME
 from ui.qr_manager import display_qr_code, generate_qr_bytes
 from db.excel_parser import parse_master_karyawan, parse_medical_checkup
@@ -17,8 +21,11 @@ from db.queries import (
     insert_medical_checkup,
 )
 from db.queries import save_manual_karyawan_edits
-from db.queries import get_latest_medical_checkup
 from db.helpers import get_all_lokasi, validate_lokasi, sanitize_df_for_display
+from ui.pagination import keyset_pager
+from ui.rerun_data import start_rerun, rerun_dataset
+from db.snapshot import slice_snapshot
+from ui.live_refresh import live_refresh
 
 import io, zipfile, uuid
 import altair as alt
@@ -28,9 +35,8 @@ import altair as alt
 # -------------------------
 def manager_interface(current_employee_uid=None):
     st.header("📊 Mini MCU - Manager Interface")
-    df = load_checkups()
+    start_rerun()
     users_df = get_users()
-    employees_df = get_employees()
 
     tab1, tab2, tab3, tab4, tab5, tab6, = st.tabs([
         "Dashboard", "User Management", "QR Codes",
@@ -41,63 +47,8 @@ def manager_interface(current_employee_uid=None):
     # ---------------- Tab 1: Dashboard ----------------
     with tab1:
         st.subheader("📊 Dashboard – Mini MCU")
-
-        # Merge latest checkup with employees
-        latest_checkup_df = get_latest_medical_checkup()
-        if latest_checkup_df is None:
-            latest_checkup_df = pd.DataFrame()
-
-        df_combined = employees_df.copy()
-        if not latest_checkup_df.empty:
-            df_combined = df_combined.merge(
-                latest_checkup_df, on='uid', how='left', suffixes=('', '_checkup')
-            )
-
-        # After loading df in manager_interface.py
-
-        # Replace 'tanggal' with 'tanggal_checkup'
-        if "tanggal_checkup" in df.columns:
-            df["tanggal_checkup"] = pd.to_datetime(df["tanggal_checkup"], errors="coerce").dt.date
-
-            if "tahun" not in df.columns:
-                df["tahun"] = pd.to_datetime(df["tanggal_checkup"], errors="coerce").dt.year
-            if "bulan" not in df.columns:
-                df["bulan"] = pd.to_datetime(df["tanggal_checkup"], errors="coerce").dt.month
-        else:
-            st.error("❌ Kolom 'tanggal_checkup' tidak ada di DataFrame!")
-            st.stop()
-
-        df_combined = employees_df.copy()
-        df_combined = df_combined.merge(
-            latest_checkup_df, on='uid', how='left', suffixes=('', '_checkup')
-        )
-
-        # Fill missing medical columns with NaN
-        medical_cols = ['tanggal_checkup','tinggi','berat','bmi','lingkar_perut',
-                'gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat']
-        for col in medical_cols:
-            if col not in df_combined.columns:
-                df_combined[col] = None
-
-        # Convert tanggal_checkup to datetime and remove time
-        if 'tanggal_checkup' in df_combined.columns:
-            df_combined['tanggal_checkup'] = pd.to_datetime(df_combined['tanggal_checkup'], errors='coerce').dt.date
-
-
-        # Convert tanggal to datetime and remove time
-        if 'tanggal' in df_combined.columns:
-            df_combined['tanggal'] = pd.to_datetime(df_combined['tanggal'], errors='coerce').dt.date
-
-        # Calculate status: Unwell if any threshold exceeded or obese
-        df_combined['status'] = 'Well'
-        df_combined.loc[
-            (df_combined['gula_darah_puasa'] > 120) |
-            (df_combined['gula_darah_sewaktu'] > 200) |
-            (df_combined['cholesterol'] > 240) |
-            (df_combined['asam_urat'] > 7) |
-            (df_combined['bmi'] >= 30),
-            'status'
-        ] = 'Unwell'
+        # Reruns the page when karyawan / checkups / lokasi change, from any process
+        live_refresh("manager_dashboard_versions")
 
         # ---------------- Subtabs ----------------
         subtab1, subtab2 = st.tabs(["Riwayat Checkup Karyawan", "Graph Placeholder"])
@@ -106,22 +57,15 @@ def manager_interface(current_employee_uid=None):
         with subtab1:
             st.markdown("### Filters")
 
-            from db.helpers import get_dashboard_checkup_data, get_all_lokasi
-
-            # --- Fetch combined employee + latest checkup data ---
-            df_combined = get_dashboard_checkup_data()
-            employees_df = df_combined  # For lokasi options
-
             # --- Prepare month/year for filters ---
             month_names = ["All","Jan","Feb","Mar","Apr","May","Jun","Jul","Aug",
                         "Sep","Oct","Nov","Dec"]
 
-            try:
-                lokasi_options = sorted(set(get_all_lokasi()) | set(employees_df['lokasi'].dropna().tolist()))
-            except Exception:
-                lokasi_options = sorted(set(employees_df['lokasi'].dropna().tolist()))
+            # {id: name}; the filter passes lokasi ids
+            lokasi_names = get_lokasi_options()
 
             status_options = ["Well","Unwell"]
+            years = get_checkup_years()
 
             # --- Filter widgets ---
             col1, col2, col3, col4 = st.columns([1,1,2,1])
@@ -134,7 +78,6 @@ def manager_interface(current_employee_uid=None):
                     key="subtab1_filter_bulan"
                 )
             with col2:
-                years = sorted([int(y) for y in df_combined['tahun'].dropna().unique()])
                 filter_tahun = st.selectbox(
                     "Filter Tahun",
                     options=[0] + years,
@@ -145,8 +88,9 @@ def manager_interface(current_employee_uid=None):
             with col3:
                 filter_lokasi = st.multiselect(
                     "Filter Lokasi",
-                    options=lokasi_options,
-                    default=lokasi_options,
+                    options=list(lokasi_names),
+                    default=list(lokasi_names),
+                    format_func=lokasi_names.get,
                     key="subtab1_filter_lokasi"
                 )
             with col4:
@@ -157,22 +101,16 @@ def manager_interface(current_employee_uid=None):
                     key="subtab1_filter_status"
                 )
 
-            # --- Apply filters ---
-            df_filtered = df_combined.copy()
-            if filter_tahun != 0:
-                df_filtered = df_filtered[(df_filtered['tahun'] == filter_tahun) | (df_filtered['tahun'].isna())]
-            if filter_bulan != 0:
-                df_filtered = df_filtered[(df_filtered['bulan'] == filter_bulan) | (df_filtered['bulan'].isna())]
-            if filter_lokasi:
-                df_filtered = df_filtered[df_filtered['lokasi'].isin(filter_lokasi)]
-            if filter_status:
-                df_filtered = df_filtered[df_filtered['status'].isin(filter_status) | df_filtered['status'].isna()]
-
-            # --- Add Well / Unwell counter ---
-            if not df_filtered.empty and "status" in df_filtered.columns:
-                total_well = df_filtered[df_filtered['status'] == "Well"].shape[0]
-                total_unwell = df_filtered[df_filtered['status'] == "Unwell"].shape[0]
-                st.markdown(f"**Total Well:** {total_well}  |  **Total Unwell:** {total_unwell}")
+            # --- Filters run in SQL; only the page being shown is fetched ---
+            filters = {"lokasi": filter_lokasi, "tahun": filter_tahun, "bulan": filter_bulan, "status": filter_status}
+            counts = count_dashboard(filters)
+            st.markdown(f"**Total Well:** {counts['well']}  |  **Total Unwell:** {counts['unwell']}")
+
+            df_filtered = keyset_pager(
+                "dashboard_page",
+                lambda after: get_dashboard_page(filters, after),
+                total=counts["total"], page_size=PAGE_SIZE, filters=filters
+            )
 
             # --- Normalize tanggal_lahir for display ---
             if "tanggal_lahir" in df_filtered.columns:
@@ -194,26 +132,6 @@ def manager_interface(current_employee_uid=None):
             else:
                 df_display = df_filtered[display_cols].copy()
 
-                # --- Unwell highlighting ---
-                def highlight_unwell(row):
-                    styles = []
-                    for col, v in row.items():
-                        if col == "gula_darah_puasa":
-                            styles.append("color: red" if v > 125 else "")
-                        elif col == "gula_darah_sewaktu":
-                            styles.append("color: red" if v > 199 else "")
-                        elif col == "cholesterol":
-                            styles.append("color: red" if v > 240 else "")
-                        elif col == "asam_urat":
-                            styles.append("color: red" if v > 7 else "")
-                        elif col == "bmi":
-                            styles.append("color: red" if (v < 18.5 or v > 25) else "")
-                        elif col == "lingkar_perut":
-                            styles.append("color: red" if v > 90 else "")
-                        else:
-                            styles.append("")
-                    return styles
-
                 st.dataframe(
                     df_display.style
                         .format({
@@ -226,7 +144,7 @@ def manager_interface(current_employee_uid=None):
                             "cholesterol": "{:.2f}",
                             "asam_urat": "{:.2f}",
                         })
-                        .apply(highlight_unwell, axis=1),
+                        .apply(highlight_unwell, axis=None),
                     use_container_width=True
                 )
 
@@ -236,7 +154,7 @@ def manager_interface(current_employee_uid=None):
             if not df_filtered.empty and "checkup_id" in df_filtered.columns:
                 selected_checkup = st.selectbox(
                     "Pilih Checkup ID untuk dihapus",
-                    options=df_filtered["checkup_id"].unique(),
+                    options=df_filtered["checkup_id"].dropna().astype(int).unique(),
                     key="subtab1_delete_checkup"
                 )
 
@@ -278,7 +196,7 @@ def manager_interface(current_employee_uid=None):
             with col2:
                 filter_tahun2 = st.selectbox(
                     "Filter Tahun",
-                    options=[0] + sorted(df["tahun"].unique()),
+                    options=[0] + years,
                     index=0,
                     format_func=lambda x: "All" if x == 0 else str(x),
                     key="subtab2_filter_tahun"
@@ -350,12 +268,10 @@ def manager_interface(current_employee_uid=None):
         with subtab1:
             st.markdown("### 📥 Download Template / Data Check-Up")
             from utils.export_utils import generate_karyawan_template_excel, export_checkup_data_excel
-            from db.helpers import get_dashboard_checkup_data
 
             # --- Lokasi filter for template ---
             try:
-                employees_df = get_employees()
-                lokasi_options = sorted(set(employees_df['lokasi'].dropna().tolist()))
+                lokasi_options = get_employee_lokasi()
             except Exception:
                 lokasi_options = []
 
@@ -367,7 +283,9 @@ def manager_interface(current_employee_uid=None):
             )
 
             # --- Download Template Excel ---
-            template_file = generate_karyawan_template_excel(lokasi_filter=filter_lokasi_template)
+            template_file = generate_karyawan_template_excel(
+                lokasi_filter=filter_lokasi_template, employees=rerun_dataset("employees")
+            )
             st.download_button(
                 "Download Karyawan Template Excel",
                 data=template_file,
@@ -392,24 +310,21 @@ def manager_interface(current_employee_uid=None):
                 key="export_checkup_date_picker_subtab"
             )
 
-            # --- Fetch combined checkup data ---
+            # --- Fetch combined checkup data (shared snapshot, see db/snapshot.py) ---
             try:
-                df_checkup = get_dashboard_checkup_data()
+                snapshot = rerun_dataset("dashboard")
             except Exception as e:
                 st.error(f"❌ Gagal ambil data checkup: {e}")
-                df_checkup = pd.DataFrame()
-
-            if not df_checkup.empty:
-                df_export = df_checkup.copy()
+                snapshot = None
 
-                # Apply lokasi filter
-                if filter_lokasi_export:
-                    df_export = df_export[df_export['lokasi'].isin(filter_lokasi_export)]
+            if snapshot is not None and snapshot.num_rows:
+                # Only the lokasi slice is materialized as a DataFrame
+                df_export = slice_snapshot(snapshot, lokasi=filter_lokasi_export)
 
                 # --- Export by selected date ---
-                df_by_date = df_export.copy()
+                df_by_date = df_export
                 if selected_date:
-                    df_by_date = df_by_date[df_by_date['tanggal_checkup'] == pd.to_datetime(selected_date).date()]
+                    df_by_date = slice_snapshot(snapshot, lokasi=filter_lokasi_export, tanggal_checkup=selected_date)
 
                 if not df_by_date.empty:
                     file_bytes_date = export_checkup_data_excel(df_by_date)
@@ -442,57 +357,79 @@ def manager_interface(current_employee_uid=None):
         with subtab2:
             st.markdown("### 📁 Upload Master Data Karyawan")
             import os
+            import shutil
             from config.settings import UPLOAD_DIR
             if not os.path.exists(UPLOAD_DIR):
                 os.makedirs(UPLOAD_DIR)
 
-            uploaded_karyawan_file = st.file_uploader(
+            uploaded_karyawan_files = st.file_uploader(
                 "Upload file data Karyawan (Master Data)", 
-                type=["xls", "xlsx", "csv"], key="karyawan_upload_subtab"
+                type=["xls", "xlsx", "csv"], key="karyawan_upload_subtab",
+                accept_multiple_files=True
             )
 
-            if uploaded_karyawan_file:
-                save_path = os.path.join(UPLOAD_DIR, uploaded_karyawan_file.name)
-                with open(save_path, "wb") as f:
-                    f.write(uploaded_karyawan_file.getbuffer())
+            if uploaded_karyawan_files:
+                file_names = ", ".join(f"'{f.name}'" for f in uploaded_karyawan_files)
 
-                try:
-                    from db.excel_parser import parse_master_karyawan
-                    with st.spinner("Mengupload data karyawan..."):
-                        result = parse_master_karyawan(save_path)
-                    st.success(
-                        f"✅ File '{uploaded_karyawan_file.name}' berhasil diproses. "
-                        f"Inserted: {result['inserted']}, Skipped: {result['skipped']}"
-                    )
-                except Exception as e:
-                    st.error(f"❌ Error saat meng-upload file karyawan: {e}")
+                # --- Preview diff once per set of uploaded files (streamed from the upload buffers) ---
+                preview_key = "|".join(f"{f.name}:{f.size}" for f in uploaded_karyawan_files)
+                if st.session_state.get("master_preview_key") != preview_key:
+                    try:
+                        from db.excel_parser import preview_master_karyawan
+                        with st.spinner("Membandingkan file dengan data karyawan..."):
+                            st.session_state["master_preview"] = preview_master_karyawan(uploaded_karyawan_files)
+                        st.session_state["master_preview_key"] = preview_key
+                    except Exception as e:
+                        st.error(f"❌ Error saat membaca file karyawan: {e}")
+                        st.session_state["master_preview"] = None
+
+                preview = st.session_state.get("master_preview")
+                if preview:
+                    col_new, col_changed, col_same, col_skip = st.columns(4)
+                    col_new.metric("Karyawan Baru", preview["new"])
+                    col_changed.metric("Berubah", preview["changed"])
+                    col_same.metric("Tidak Berubah", preview["unchanged"])
+                    col_skip.metric("Di-skip", preview["skipped"])
+
+                    if st.button("✅ Konfirmasi Import", key="confirm_master_import"):
+                        try:
+                            from ui.upload_jobs import enqueue_uploads
+                            enqueue_uploads("master", uploaded_karyawan_files)
+                            st.session_state["master_preview_key"] = None
+
+                            # Keep a copy for "Hapus dan Tambah Data"; written in blocks, not re-read
+                            for uploaded in uploaded_karyawan_files:
+                                uploaded.seek(0)
+                                with open(os.path.join(UPLOAD_DIR, uploaded.name), "wb") as f:
+                                    shutil.copyfileobj(uploaded, f)
+                            st.success(f"✅ File {file_names} masuk antrian import. Status diperbarui otomatis di bawah.")
+                        except Exception as e:
+                            st.error(f"❌ Error saat meng-upload file karyawan: {e}")
+
+            from ui.upload_jobs import render_upload_jobs
+            render_upload_jobs("master", key="master_jobs")
 
         # ---------------- Subtab 3: Upload Medical Checkup ----------------
         with subtab3:
             st.markdown("### 📁 Upload Data Medical Check-Up")
 
-            uploaded_medical_file = st.file_uploader(
+            uploaded_medical_files = st.file_uploader(
                 "Upload file Data Medical Checkup", 
-                type=["xls", "xlsx"], key="medical_upload_subtab"
+                type=["xls", "xlsx"], key="medical_upload_subtab",
+                accept_multiple_files=True
             )
 
-            if uploaded_medical_file:
+            if uploaded_medical_files and st.button("📤 Upload", key="medical_upload_submit"):
                 try:
-                    from db.checkup_uploader import parse_checkup_xls
-                    with st.spinner("Mengupload data medical checkup..."):
-                        result = parse_checkup_xls(uploaded_medical_file)
-
-                        st.success(
-                            f"✅ File '{uploaded_medical_file.name}' berhasil diproses. "
-                            f"Inserted: {result['inserted']}"
-                        )
-                        if result['skipped']:
-                            st.warning(f"⚠️ Beberapa baris di-skip ({len(result['skipped'])}):")
-                            st.dataframe(pd.DataFrame(result['skipped']), use_container_width=True)
-
+                    from ui.upload_jobs import enqueue_uploads
+                    enqueue_uploads("checkup", uploaded_medical_files)
+                    st.success("✅ File masuk antrian upload. Status diperbarui otomatis di bawah.")
                 except Exception as e:
                     st.error(f"❌ Error saat meng-upload file medical checkup: {e}")
 
+            from ui.upload_jobs import render_upload_jobs
+            render_upload_jobs("checkup", key="medical_jobs")
+
 
     # ---------------- Tab 5: Data Management ----------------
     with tab5:
@@ -556,29 +493,29 @@ def manager_interface(current_employee_uid=None):
                     st.success("✅ Semua data karyawan berhasil dihapus.")
                     st.rerun()
 
-            # --- Load data ---
-            employees_df = get_employees()
-
-            if employees_df.empty:
+            # --- Load data: lokasi list + count first, then only the visible page ---
+            if count_employees() == 0:
                 st.info("Belum ada data Karyawan. Silakan upload XLS terlebih dahulu.")
             else:
                 # --- Lokasi filter with "All" option ---
-                lokasi_options = sorted(set(employees_df['lokasi'].dropna().tolist()))
-                lokasi_options = ["All"] + lokasi_options
+                lokasi_names = {"All": "All", **get_lokasi_options(in_use=True)}
                 filter_lokasi = st.multiselect(
                     "Filter berdasarkan Lokasi",
-                    options=lokasi_options,
-                    default=["All"]
+                    options=list(lokasi_names),
+                    default=["All"],
+                    format_func=lokasi_names.get
                 )
-
-                df_display = employees_df.copy()
-                if filter_lokasi and "All" not in filter_lokasi:
-                    df_display = df_display[df_display['lokasi'].isin(filter_lokasi)]
+                lokasi_filter = None if (not filter_lokasi or "All" in filter_lokasi) else filter_lokasi
 
                 # --- Name search ---
                 search_name = st.text_input("Cari Karyawan berdasarkan Nama")
-                if search_name:
-                    df_display = df_display[df_display["nama"].str.contains(search_name, case=False, na=False)]
+
+                df_display = keyset_pager(
+                    "data_uid_page",
+                    lambda after: get_employees_page(after, PAGE_SIZE, lokasi=lokasi_filter, search=search_name),
+                    total=count_employees(lokasi=lokasi_filter, search=search_name),
+                    page_size=PAGE_SIZE, filters=(lokasi_filter, search_name)
+                )
 
                 # --- Columns to display ---
                 display_cols = [c for c in ["uid", "nama", "jabatan", "lokasi"] if c in df_display.columns]
@@ -619,11 +556,9 @@ def manager_interface(current_employee_uid=None):
                             if st.button("📄 Lihat file"):
                                 file_path = os.path.join(UPLOAD_DIR, selected_file)
                                 try:
-                                    if selected_file.endswith(('.xls', '.xlsx')):
-                                        df_file = pd.read_excel(file_path)
-                                    else:
-                                        df_file = pd.read_csv(file_path)
-                                    st.dataframe(df_file.head(50))
+                                    from utils.excel_reader import read_preview
+                                    df_file = read_preview(file_path, rows=50)
+                                    st.dataframe(df_file)
                                 except Exception as e:
                                     st.error(f"❌ Gagal membaca file: {e}")
 
@@ -652,32 +587,26 @@ def manager_interface(current_employee_uid=None):
         with tab_lokasi_mgmt:
             st.subheader("📍 Manage Lokasi")
 
-            from db.helpers import get_all_lokasi
             from db.database import get_engine
             from sqlalchemy import text
 
             engine = get_engine()
 
-            # --- Load daftar lokasi ---
-            if "lokasi_list" not in st.session_state:
+            # --- Load daftar lokasi ({id: name}) ---
+            if "lokasi_names" not in st.session_state:
                 try:
-                    result = get_all_lokasi() or []
-                    # normalize output (handles tuple, dict, or str)
-                    st.session_state["lokasi_list"] = [
-                        row[0] if isinstance(row, (tuple, list)) else row.get("name") if isinstance(row, dict) else row
-                        for row in result
-                    ]
+                    st.session_state["lokasi_names"] = get_lokasi_options()
                 except Exception as e:
                     st.error(f"⚠️ Gagal load lokasi: {e}")
-                    st.session_state["lokasi_list"] = []
+                    st.session_state["lokasi_names"] = {}
 
 
             # --- Daftar Lokasi Saat Ini (top) ---
             daftar_placeholder = st.container()
             def refresh_daftar():
                 daftar_placeholder.empty()  # Clear previous table before rendering
-                if st.session_state["lokasi_list"]:
-                    daftar_placeholder.table(pd.DataFrame(st.session_state["lokasi_list"], columns=["Lokasi"]))
+                if st.session_state["lokasi_names"]:
+                    daftar_placeholder.table(pd.DataFrame(sorted(st.session_state["lokasi_names"].values()), columns=["Lokasi"]))
                 else:
                     daftar_placeholder.info("Belum ada lokasi yang tersedia.")
         
@@ -694,61 +623,84 @@ def manager_interface(current_employee_uid=None):
                 if add_lokasi_btn:
                     if new_lokasi.strip():
                         try:
-                            with engine.connect() as conn:
-                                exists = conn.execute(
-                                    text("SELECT 1 FROM lokasi WHERE name = :name"),
+                            with engine.begin() as conn:
+                                new_id = conn.execute(
+                                    text("""
+                                        INSERT INTO lokasi (name) VALUES (:name)
+                                        ON CONFLICT (lokasi_key(name)) DO NOTHING
+                                        RETURNING id
+                                    """),
                                     {"name": new_lokasi.strip()}
                                 ).scalar()
 
-                            if exists:
+                            if new_id is None:
                                 st.warning(f"⚠️ Lokasi '{new_lokasi}' sudah ada di database!")
                             else:
-                                with engine.begin() as conn:
-                                    conn.execute(
-                                        text("INSERT INTO lokasi (name) VALUES (:name)"),
-                                        {"name": new_lokasi.strip()}
-                                    )
                                 st.success(f"✅ Lokasi '{new_lokasi}' berhasil ditambahkan!")
 
                                 # Update list instantly
-                                st.session_state["lokasi_list"].append(new_lokasi.strip())
+                                st.session_state["lokasi_names"][new_id] = new_lokasi.strip()
                                 refresh_daftar()
                         except Exception as e:
                             st.error(f"❌ Gagal menambahkan lokasi: {e}")
                     else:
                         st.error("❌ Nama Lokasi tidak boleh kosong!")
 
-            st.markdown("---")
-            st.write("Hapus Lokasi:")
+            if st.session_state["lokasi_names"]:
+                st.markdown("---")
+                st.write("Ubah Nama Lokasi:")
+
+                # --- Rename lokasi: karyawan and checkups follow the id ---
+                with st.form("rename_lokasi_form"):
+                    selected_lokasi_rename = st.selectbox(
+                        "Pilih Lokasi",
+                        options=list(st.session_state["lokasi_names"]),
+                        format_func=st.session_state["lokasi_names"].get,
+                        key="selected_lokasi_rename"
+                    )
+                    renamed_lokasi = st.text_input("Nama Baru")
+                    rename_lokasi_btn = st.form_submit_button("Ubah Nama")
+
+                    if rename_lokasi_btn:
+                        if renamed_lokasi.strip():
+                            old_name = st.session_state["lokasi_names"][selected_lokasi_rename]
+                            try:
+                                rename_lokasi(selected_lokasi_rename, renamed_lokasi)
+                                st.success(f"✅ Lokasi '{old_name}' diubah menjadi '{renamed_lokasi.strip()}'!")
+                                st.session_state["lokasi_names"][selected_lokasi_rename] = renamed_lokasi.strip()
+                                refresh_daftar()
+                            except Exception as e:
+                                st.error(f"❌ Gagal mengubah nama lokasi (nama sudah dipakai?): {e}")
+                        else:
+                            st.error("❌ Nama Lokasi tidak boleh kosong!")
+
+                st.markdown("---")
+                st.write("Hapus Lokasi:")
 
-            if st.session_state["lokasi_list"]:
                 # --- Delete Lokasi ---
                 selected_lokasi_delete = st.selectbox(
                     "Pilih Lokasi untuk dihapus",
-                    options=st.session_state["lokasi_list"],
+                    options=list(st.session_state["lokasi_names"]),
+                    format_func=st.session_state["lokasi_names"].get,
                     key="selected_lokasi_delete"
                 )
 
                 if st.button("🗑️ Hapus Lokasi"):
+                    name = st.session_state["lokasi_names"][selected_lokasi_delete]
                     try:
-                        with engine.begin() as conn:
-                            linked = conn.execute(
-                                text("SELECT COUNT(*) FROM karyawan WHERE lokasi = :lokasi"),
-                                {"lokasi": selected_lokasi_delete}
-                            ).scalar()
-
-                            if linked > 0:
-                                st.error(f"⚠️ Tidak bisa menghapus '{selected_lokasi_delete}', masih digunakan oleh {linked} karyawan!")
-                            else:
-                                conn.execute(
-                                    text("DELETE FROM lokasi WHERE name = :name"),
-                                    {"name": selected_lokasi_delete}
-                                )
-                                st.success(f"✅ Lokasi '{selected_lokasi_delete}' berhasil dihapus!")
+                        usage = count_lokasi_usage(selected_lokasi_delete)
+                        if usage["karyawan"] or usage["checkups"]:
+                            st.error(
+                                f"⚠️ Tidak bisa menghapus '{name}', masih digunakan oleh "
+                                f"{usage['karyawan']} karyawan dan {usage['checkups']} checkup!"
+                            )
+                        else:
+                            delete_lokasi(selected_lokasi_delete)
+                            st.success(f"✅ Lokasi '{name}' berhasil dihapus!")
 
-                                # Update list instantly
-                                st.session_state["lokasi_list"].remove(selected_lokasi_delete)
-                                refresh_daftar()
+                            # Update list instantly
+                            del st.session_state["lokasi_names"][selected_lokasi_delete]
+                            refresh_daftar()
                     except Exception as e:
                         st.error(f"❌ Gagal menghapus lokasi: {e}")
 
@@ -760,7 +712,7 @@ def manager_interface(current_employee_uid=None):
 
         # --- Load employees ---
         try:
-            employees = get_employees()
+            employees = rerun_dataset("employees")
         except Exception as e:
             st.error(f"❌ Gagal memuat daftar karyawan: {e}")
             employees = pd.DataFrame()
@@ -850,9 +802,11 @@ def manager_interface(current_employee_uid=None):
                     st.success("Emergency contact updated!")
 
                 # --- Fetch all checkups for this employee ---
-                from db.helpers import get_medical_checkups_by_uid
-
-                all_checkups = get_medical_checkups_by_uid(emp["uid"])
+                try:
+                    all_checkups = get_medical_checkups_by_uid(emp["uid"])
+                except Exception as e:
+                    st.error(f"❌ Gagal memuat riwayat pemeriksaan: {e}")
+                    all_checkups = pd.DataFrame()
 
                 if not all_checkups.empty:
                     # Ensure tanggal_checkup is datetime
@@ -866,25 +820,6 @@ def manager_interface(current_employee_uid=None):
                     latest_df = df_filtered.sort_values("tanggal_checkup", ascending=False).head(1)
                     st.markdown("### 📌 Pemeriksaan Terakhir")
 
-                    def highlight_unwell(row):
-                        styles = []
-                        for col, v in row.items():
-                            if col == "gula_darah_puasa":
-                                styles.append("color: red" if v > 125 else "")
-                            elif col == "gula_darah_sewaktu":
-                                styles.append("color: red" if v > 199 else "")
-                            elif col == "cholesterol":
-                                styles.append("color: red" if v > 240 else "")
-                            elif col == "asam_urat":
-                                styles.append("color: red" if v > 7 else "")
-                            elif col == "bmi":
-                                styles.append("color: red" if (v < 18.5 or v > 25) else "")
-                            elif col == "lingkar_perut":
-                                styles.append("color: red" if v > 90 else "")
-                            else:
-                                styles.append("")
-                        return styles
-
                     st.dataframe(
                         latest_df.style
                             .format({
@@ -892,7 +827,7 @@ def manager_interface(current_employee_uid=None):
                                 "gula_darah_puasa": "{:.2f}", "gula_darah_sewaktu": "{:.2f}",
                                 "cholesterol": "{:.2f}", "asam_urat": "{:.2f}",
                             })
-                            .apply(highlight_unwell, axis=1),
+                            .apply(highlight_unwell, axis=None),
                         use_container_width=True
                     )
 
@@ -906,7 +841,7 @@ def manager_interface(current_employee_uid=None):
                                 "gula_darah_puasa": "{:.2f}", "gula_darah_sewaktu": "{:.2f}",
                                 "cholesterol": "{:.2f}", "asam_urat": "{:.2f}",
                             })
-                            .apply(highlight_unwell, axis=1),
+                            .apply(highlight_unwell, axis=None),
                         use_container_width=True
                     )
                 else:
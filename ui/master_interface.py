@@ -27,39 +27,58 @@ def master_interface():
 
     # ---------------- Tab 1: Data Management ----------------
     with tab1:
-        st.subheader("📂 Riwayat Upload Master Karyawan")
+        st.subheader("📂 Riwayat Upload (Master Karyawan & Medical Checkup)")
 
         # Load batch history from DB
         history_df = queries.get_upload_history()
 
         if history_df.empty:
-            st.info("Belum ada riwayat upload master karyawan.")
+            st.info("Belum ada riwayat upload.")
         else:
             st.dataframe(history_df, use_container_width=True)
 
-            # Select batch to delete
+            # Select batch to delete (removes the rows that upload created)
+            batch_labels = {
+                row.upload_batch_id: f"{row.file_name} ({row.kind}, {row.started_at:%Y-%m-%d %H:%M})"
+                for row in history_df.itertuples()
+            }
             selected_batch = st.selectbox(
                 "Pilih Batch untuk dihapus",
-                options=history_df["upload_batch_id"]
+                options=history_df["upload_batch_id"],
+                format_func=lambda bid: batch_labels.get(bid, str(bid))
             )
-            if st.button("🗑️ Hapus Batch Terpilih"):
+            # A master batch takes every checkup of its karyawan with it; ask before removing others' rows
+            other_checkups = queries.count_other_batch_checkups(selected_batch)
+            include_others = False
+            if other_checkups:
+                st.warning(
+                    f"⚠️ Karyawan dari batch ini memiliki {other_checkups} checkup dari upload lain / input manual. "
+                    "Checkup tersebut ikut terhapus."
+                )
+                include_others = st.checkbox(
+                    f"Saya yakin ingin menghapus juga {other_checkups} checkup tersebut",
+                    key=f"confirm_other_checkups_{selected_batch}"
+                )
+            st.caption("ℹ️ Hanya baris yang dibuat batch ini yang dihapus; data yang diperbarui batch ini tidak dikembalikan.")
+            if st.button("🗑️ Hapus Batch Terpilih", disabled=bool(other_checkups) and not include_others):
                 try:
-                    queries.delete_batch(selected_batch)
-                    st.success(f"✅ Batch {selected_batch} berhasil dihapus.")
-                    st.experimental_rerun()
+                    queries.delete_batch(selected_batch, include_other_checkups=include_others)
+                    st.success(f"✅ Batch {batch_labels.get(selected_batch, selected_batch)} berhasil dihapus.")
+                    st.rerun()
                 except Exception as e:
                     st.error(f"❌ Gagal menghapus batch: {e}")
 
-            # Delete ALL batches
-            if st.button("🗑️ Hapus Semua Batch"):
-                if st.confirm("Apakah Anda yakin ingin menghapus semua batch?"):
-                    try:
-                        for bid in history_df["upload_batch_id"]:
-                            queries.delete_batch(bid)
-                        st.success("✅ Semua batch berhasil dihapus.")
-                        st.experimental_rerun()
-                    except Exception as e:
-                        st.error(f"❌ Gagal menghapus semua batch: {e}")
+            # Delete ALL batches (checkup batches first, so a master batch only takes manual entries with it)
+            confirm_all = st.checkbox("Saya yakin ingin menghapus semua batch", key="confirm_delete_all_batches")
+            if st.button("🗑️ Hapus Semua Batch", disabled=not confirm_all):
+                try:
+                    ordered = history_df.sort_values("kind", key=lambda kind: kind != "checkup", kind="stable")
+                    for bid in ordered["upload_batch_id"]:
+                        queries.delete_batch(bid)
+                    st.success("✅ Semua batch berhasil dihapus.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"❌ Gagal menghapus semua batch: {e}")
 
     # ---------------- Tab 2: User Management ----------------
     with tab2:
@@ -7,18 +7,31 @@ import uuid
 
 from db.excel_parser import parse_medical_checkup
 from db.queries import (
-    get_employees,
+    get_employee_lokasi,
+    count_employees,
+    get_dashboard_page,
+    count_dashboard,
+    get_checkup_years,
+    PAGE_SIZE,
     get_employee_by_uid,
     insert_medical_checkup,
     save_uploaded_checkups,
     CHECKUP_COLUMNS,
-    save_manual_karyawan_edits
+    save_manual_karyawan_edits,
+    get_medical_checkups_by_uid
 )
-from db.helpers import get_all_lokasi, get_medical_checkups_by_uid
+from db.helpers import get_all_lokasi
+from db.lokasi import get_lokasi_options
+from db.health_rules import highlight_unwell
+from ui.pagination import keyset_pager
+from ui.rerun_data import start_rerun, rerun_dataset
+from db.snapshot import slice_snapshot
+from ui.live_refresh import live_refresh
 from utils.export_utils import export_checkup_data_excel
 
 def nurse_interface():
     st.header("📝 Mini MCU - Nurse Interface")
+    start_rerun()
 
     # --- Session state ---
     if "nurse_tab_form_counter" not in st.session_state:
@@ -41,67 +54,24 @@ def nurse_interface():
     # ---------------- Tab 1: Dashboard (Read-only) ----------------
     with tab1:
         st.subheader("📊 Dashboard – Mini MCU (Nurse View)")
-
-        from db.helpers import get_dashboard_checkup_data, get_all_lokasi
-
-        # --- Fetch combined employee + latest checkup data ---
-        df_combined = get_dashboard_checkup_data()
-        if df_combined is None or df_combined.empty:
-            df_combined = pd.DataFrame()
-            st.info("Belum ada data karyawan atau checkup yang tersedia.")
-
-        # --- Fill missing medical columns ---
-        medical_cols = ['tanggal_checkup','tinggi','berat','bmi','lingkar_perut',
-                        'gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat']
-        for col in medical_cols:
-            if col not in df_combined.columns:
-                df_combined[col] = None
-
-        # --- Ensure tanggal_checkup is date ---
-        if 'tanggal_checkup' in df_combined.columns:
-            df_combined['tanggal_checkup'] = pd.to_datetime(df_combined['tanggal_checkup'], errors='coerce').dt.date
-            if "tahun" not in df_combined.columns:
-                df_combined["tahun"] = pd.to_datetime(df_combined["tanggal_checkup"], errors='coerce').dt.year
-            if "bulan" not in df_combined.columns:
-                df_combined["bulan"] = pd.to_datetime(df_combined["tanggal_checkup"], errors='coerce').dt.month
-
-        # --- Calculate status ---
-        df_combined['status'] = 'Well'
-        df_combined.loc[
-            (df_combined['gula_darah_puasa'] > 120) |
-            (df_combined['gula_darah_sewaktu'] > 200) |
-            (df_combined['cholesterol'] > 240) |
-            (df_combined['asam_urat'] > 7) |
-            (df_combined['bmi'] >= 30),
-            'status'
-        ] = 'Unwell'
+        # Reruns the page when karyawan / checkups / lokasi change, from any process
+        live_refresh("nurse_dashboard_versions")
 
         # ---------------- Subtabs ----------------
         subtab1, subtab2 = st.tabs(["Riwayat Checkup Karyawan", "Graph Placeholder"])
 
         #subtab 1 : Riwayat Checkup Karyawan
-        with tab1:
+        with subtab1:
             st.subheader("📊 Dashboard – Mini MCU (Read-Only)")
 
-            from db.helpers import get_dashboard_checkup_data, get_all_lokasi
-
-            # --- Fetch combined employee + latest checkup data ---
-            try:
-                df_combined = get_dashboard_checkup_data()
-            except Exception as e:
-                st.error(f"❌ Gagal ambil data checkup: {e}")
-                df_combined = pd.DataFrame()
-
-            if df_combined.empty:
+            if count_employees() == 0:
                 st.info("Belum ada data karyawan atau checkup yang tersedia.")
             else:
                 # --- Prepare month/year for filters ---
                 month_names = ["All","Jan","Feb","Mar","Apr","May","Jun","Jul","Aug",
                             "Sep","Oct","Nov","Dec"]
-                try:
-                    lokasi_options = sorted(set(get_all_lokasi()) | set(df_combined['lokasi'].dropna().tolist()))
-                except Exception:
-                    lokasi_options = sorted(set(df_combined['lokasi'].dropna().tolist()))
+                # {id: name}; the filter passes lokasi ids
+                lokasi_names = get_lokasi_options()
                 status_options = ["Well","Unwell"]
 
                 col1, col2, col3, col4 = st.columns([1,1,2,1])
@@ -114,10 +84,9 @@ def nurse_interface():
                         key="nurse_dashboard_filter_bulan"
                     )
                 with col2:
-                    years = sorted([int(y) for y in df_combined['tahun'].dropna().unique()])
                     filter_tahun = st.selectbox(
                         "Filter Tahun",
-                        options=[0] + years,
+                        options=[0] + get_checkup_years(),
                         index=0,
                         format_func=lambda x: "All" if x==0 else str(x),
                         key="nurse_dashboard_filter_tahun"
@@ -125,8 +94,9 @@ def nurse_interface():
                 with col3:
                     filter_lokasi = st.multiselect(
                         "Filter Lokasi",
-                        options=lokasi_options,
-                        default=lokasi_options,
+                        options=list(lokasi_names),
+                        default=list(lokasi_names),
+                        format_func=lokasi_names.get,
                         key="nurse_dashboard_filter_lokasi"
                     )
                 with col4:
@@ -137,29 +107,13 @@ def nurse_interface():
                         key="nurse_dashboard_filter_status"
                     )
 
-                # --- Apply filters ---
-                df_filtered = df_combined.copy()
-                if filter_tahun != 0:
-                    df_filtered = df_filtered[(df_filtered['tahun']==filter_tahun) | (df_filtered['tahun'].isna())]
-                if filter_bulan != 0:
-                    df_filtered = df_filtered[(df_filtered['bulan']==filter_bulan) | (df_filtered['bulan'].isna())]
-                if filter_lokasi:
-                    df_filtered = df_filtered[df_filtered['lokasi'].isin(filter_lokasi)]
-                if filter_status:
-                    df_filtered = df_filtered[df_filtered['status'].isin(filter_status) | df_filtered['status'].isna()]
-
-                # --- Highlight unwell function ---
-                def highlight_unwell(row):
-                    styles = []
-                    for col, v in row.items():
-                        if col == "gula_darah_puasa": styles.append("color: red" if v>125 else "")
-                        elif col == "gula_darah_sewaktu": styles.append("color: red" if v>199 else "")
-                        elif col == "cholesterol": styles.append("color: red" if v>240 else "")
-                        elif col == "asam_urat": styles.append("color: red" if v>7 else "")
-                        elif col == "bmi": styles.append("color: red" if (v<18.5 or v>25) else "")
-                        elif col == "lingkar_perut": styles.append("color: red" if v>90 else "")
-                        else: styles.append("")
-                    return styles
+                # --- Filters run in SQL; only the page being shown is fetched ---
+                filters = {"lokasi": filter_lokasi, "tahun": filter_tahun, "bulan": filter_bulan, "status": filter_status}
+                df_filtered = keyset_pager(
+                    "nurse_dashboard_page",
+                    lambda after: get_dashboard_page(filters, after),
+                    total=count_dashboard(filters)["total"], page_size=PAGE_SIZE, filters=filters
+                )
 
                 # --- Columns to display ---
                 display_cols = [
@@ -169,21 +123,17 @@ def nurse_interface():
                     'gula_darah_puasa','gula_darah_sewaktu','cholesterol','asam_urat'
                 ]
 
-                missing_cols = [col for col in display_cols if col not in df_filtered.columns]
-                if missing_cols:
-                    st.error(f"❌ Kolom tidak ditemukan di DataFrame: {missing_cols}")
-                else:
-                    df_display = df_filtered[display_cols].copy()
-                    st.dataframe(
-                        df_display.style
-                            .format({
-                                "tinggi":"{:.2f}","berat":"{:.2f}","bmi":"{:.2f}","lingkar_perut":"{:.2f}",
-                                "gula_darah_puasa":"{:.2f}","gula_darah_sewaktu":"{:.2f}",
-                                "cholesterol":"{:.2f}","asam_urat":"{:.2f}"
-                            })
-                            .apply(highlight_unwell, axis=1),
-                        use_container_width=True
-                    )
+                df_display = df_filtered[display_cols].copy()
+                st.dataframe(
+                    df_display.style
+                        .format({
+                            "tinggi":"{:.2f}","berat":"{:.2f}","bmi":"{:.2f}","lingkar_perut":"{:.2f}",
+                            "gula_darah_puasa":"{:.2f}","gula_darah_sewaktu":"{:.2f}",
+                            "cholesterol":"{:.2f}","asam_urat":"{:.2f}"
+                        })
+                        .apply(highlight_unwell, axis=None),
+                    use_container_width=True
+                )
 
 
         #subtab 2 : Graph Placeholder
@@ -195,7 +145,7 @@ def nurse_interface():
         st.subheader("👥 Pilih Data Karyawan")
 
         try:
-            employees = get_employees()
+            employees = rerun_dataset("employees")
         except Exception as e:
             st.error(f"❌ Gagal memuat daftar karyawan: {e}")
             employees = pd.DataFrame()
@@ -270,7 +220,11 @@ def nurse_interface():
                     st.success("✅ Emergency contact updated!")
 
                 # Fetch all checkups
-                all_checkups = get_medical_checkups_by_uid(emp["uid"])
+                try:
+                    all_checkups = get_medical_checkups_by_uid(emp["uid"])
+                except Exception as e:
+                    st.error(f"❌ Gagal memuat riwayat pemeriksaan: {e}")
+                    all_checkups = pd.DataFrame()
                 if not all_checkups.empty:
                     all_checkups["tanggal_checkup"] = pd.to_datetime(all_checkups["tanggal_checkup"], errors="coerce")
 
@@ -278,18 +232,6 @@ def nurse_interface():
                     latest_df = all_checkups.sort_values("tanggal_checkup", ascending=False).head(1)
                     st.markdown("### 📌 Pemeriksaan Terakhir")
 
-                    def highlight_unwell(row):
-                        styles = []
-                        for col, v in row.items():
-                            if col == "gula_darah_puasa": styles.append("color: red" if v>125 else "")
-                            elif col == "gula_darah_sewaktu": styles.append("color: red" if v>199 else "")
-                            elif col == "cholesterol": styles.append("color: red" if v>240 else "")
-                            elif col == "asam_urat": styles.append("color: red" if v>7 else "")
-                            elif col == "bmi": styles.append("color: red" if (v<18.5 or v>25) else "")
-                            elif col == "lingkar_perut": styles.append("color: red" if v>90 else "")
-                            else: styles.append("")
-                        return styles
-
                     st.dataframe(
                         latest_df.style
                         .format({
@@ -297,7 +239,7 @@ def nurse_interface():
                             "gula_darah_puasa":"{:.2f}","gula_darah_sewaktu":"{:.2f}",
                             "cholesterol":"{:.2f}","asam_urat":"{:.2f}"
                         })
-                        .apply(highlight_unwell, axis=1),
+                        .apply(highlight_unwell, axis=None),
                         use_container_width=True
                     )
 
@@ -311,7 +253,7 @@ def nurse_interface():
                             "gula_darah_puasa":"{:.2f}","gula_darah_sewaktu":"{:.2f}",
                             "cholesterol":"{:.2f}","asam_urat":"{:.2f}"
                         })
-                        .apply(highlight_unwell, axis=1),
+                        .apply(highlight_unwell, axis=None),
                         use_container_width=True
                     )
                 else:
@@ -362,12 +304,10 @@ def nurse_interface():
         with subtab1:
             st.markdown("### 📥 Download Data Check-Up & Template")
             from utils.export_utils import generate_karyawan_template_excel, export_checkup_data_excel
-            from db.helpers import get_dashboard_checkup_data
 
             # --- Lokasi filter for template ---
             try:
-                employees_df = get_employees()
-                lokasi_options = sorted(set(employees_df['lokasi'].dropna().tolist()))
+                lokasi_options = get_employee_lokasi()
             except Exception:
                 lokasi_options = []
 
@@ -379,7 +319,9 @@ def nurse_interface():
             )
 
             # --- Download Template Excel ---
-            template_file = generate_karyawan_template_excel(lokasi_filter=filter_lokasi_template)
+            template_file = generate_karyawan_template_excel(
+                lokasi_filter=filter_lokasi_template, employees=rerun_dataset("employees")
+            )
             st.download_button(
                 "Download Karyawan Template Excel",
                 data=template_file,
@@ -404,24 +346,21 @@ def nurse_interface():
                 key="export_checkup_date_picker_nurse"
             )
 
-            # --- Fetch combined checkup data ---
+            # --- Fetch combined checkup data (shared snapshot, see db/snapshot.py) ---
             try:
-                df_checkup = get_dashboard_checkup_data()
+                snapshot = rerun_dataset("dashboard")
             except Exception as e:
                 st.error(f"❌ Gagal ambil data checkup: {e}")
-                df_checkup = pd.DataFrame()
+                snapshot = None
 
-            if not df_checkup.empty:
-                df_export = df_checkup.copy()
-
-                # Apply lokasi filter
-                if filter_lokasi_export:
-                    df_export = df_export[df_export['lokasi'].isin(filter_lokasi_export)]
+            if snapshot is not None and snapshot.num_rows:
+                # Only the lokasi slice is materialized as a DataFrame
+                df_export = slice_snapshot(snapshot, lokasi=filter_lokasi_export)
 
                 # --- Export by selected date ---
-                df_by_date = df_export.copy()
+                df_by_date = df_export
                 if selected_date:
-                    df_by_date = df_by_date[df_by_date['tanggal_checkup'] == pd.to_datetime(selected_date).date()]
+                    df_by_date = slice_snapshot(snapshot, lokasi=filter_lokasi_export, tanggal_checkup=selected_date)
 
                 if not df_by_date.empty:
                     file_bytes_date = export_checkup_data_excel(df_by_date)
@@ -453,24 +392,19 @@ def nurse_interface():
         with subtab2:
             st.markdown("### 📁 Upload Data Medical Check-Up")
 
-            uploaded_medical_file = st.file_uploader(
+            uploaded_medical_files = st.file_uploader(
                 "Upload file Data Medical Checkup", 
-                type=["xls", "xlsx"], key="medical_upload_nurse_subtab"
+                type=["xls", "xlsx"], key="medical_upload_nurse_subtab",
+                accept_multiple_files=True
             )
 
-            if uploaded_medical_file:
+            if uploaded_medical_files and st.button("📤 Upload", key="medical_upload_nurse_submit"):
                 try:
-                    from db.checkup_uploader import parse_checkup_xls
-                    with st.spinner("Mengupload data medical checkup..."):
-                        result = parse_checkup_xls(uploaded_medical_file)
-
-                        st.success(
-                            f"✅ File '{uploaded_medical_file.name}' berhasil diproses. "
-                            f"Inserted: {result['inserted']}"
-                        )
-                        if result['skipped']:
-                            st.warning(f"⚠️ Beberapa baris di-skip ({len(result['skipped'])}):")
-                            st.dataframe(pd.DataFrame(result['skipped']), use_container_width=True)
-
+                    from ui.upload_jobs import enqueue_uploads
+                    enqueue_uploads("checkup", uploaded_medical_files)
+                    st.success("✅ File masuk antrian upload. Status diperbarui otomatis di bawah.")
                 except Exception as e:
                     st.error(f"❌ Error saat meng-upload file medical checkup: {e}")
+
+            from ui.upload_jobs import render_upload_jobs
+            render_upload_jobs("checkup", key="medical_jobs_nurse")
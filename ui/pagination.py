@@ -0,0 +1,33 @@
+# ui/pagination.py
+import streamlit as st
+
+def _prev_page(key):
+    st.session_state[key]["cursors"].pop()
+
+def _next_page(key):
+    state = st.session_state[key]
+    state["cursors"].append(state["next"])
+
+def keyset_pager(key, fetch_page, total, page_size, filters=None):
+    """
+    Show one page of a keyset-paginated query with Sebelumnya / Berikutnya buttons.
+    fetch_page(after) -> (df, next_cursor) is one of the *_page queries in
+    db/queries.py. The cursor of every visited page is kept in session_state,
+    so going back needs no OFFSET either. A change in filters (any comparable
+    value) starts again from page 1. Returns the df of the current page.
+    """
+    state = st.session_state.setdefault(key, {"filters": filters, "cursors": [None], "next": None})
+    if state["filters"] != filters:
+        state.update(filters=filters, cursors=[None], next=None)
+
+    df, state["next"] = fetch_page(state["cursors"][-1])
+
+    page = len(state["cursors"])
+    pages = max(1, -(-total // page_size))
+    col_prev, col_info, col_next = st.columns([1, 3, 1])
+    col_prev.button("⬅️ Sebelumnya", key=f"{key}_prev", disabled=page == 1,
+                    on_click=_prev_page, args=(key,))
+    col_info.caption(f"Halaman {page} dari {pages} · {total} baris")
+    col_next.button("Berikutnya ➡️", key=f"{key}_next", disabled=state["next"] is None,
+                    on_click=_next_page, args=(key,))
+    return df
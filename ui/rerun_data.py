@@ -0,0 +1,40 @@
+# ui/rerun_data.py
+import streamlit as st
+from db.queries import get_employees
+from db.snapshot import get_snapshot
+
+# Datasets several tabs of one rerun need; each is built once, on first use
+DATASETS = {
+    "employees": lambda: get_employees(),
+    # Memory-mapped Arrow table shared by all sessions; take slices with slice_snapshot()
+    "dashboard": lambda: get_snapshot(),
+}
+
+_STATE_KEY = "rerun_data"
+
+def start_rerun():
+    """Forget the previous rerun's datasets; call once at the top of an interface."""
+    st.session_state[_STATE_KEY] = {"frames": {}, "errors": {}, "fetches": {}}
+
+def rerun_dataset(name):
+    """
+    The named dataset of this rerun. Every caller gets the same object, so
+    treat it as read-only (copy before changing it). A failed fetch is not
+    retried within the rerun; every caller gets its exception.
+    """
+    data = st.session_state[_STATE_KEY]
+    if name in data["errors"]:
+        raise data["errors"][name]
+    if name not in data["frames"]:
+        data["fetches"][name] = data["fetches"].get(name, 0) + 1
+        assert data["fetches"][name] == 1, f"{name} fetched {data['fetches'][name]} times in one rerun"
+        try:
+            data["frames"][name] = DATASETS[name]()
+        except Exception as e:
+            data["errors"][name] = e
+            raise
+    return data["frames"][name]
+
+def rerun_fetch_counts() -> dict:
+    """{dataset: fetches} of the current rerun (at most 1 each)."""
+    return dict(st.session_state[_STATE_KEY]["fetches"])
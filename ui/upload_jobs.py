@@ -0,0 +1,76 @@
+# ui/upload_jobs.py
+import streamlit as st
+import pandas as pd
+from db.jobs import enqueue_job, get_recent_jobs, get_job_result
+
+STATUS_LABELS = {
+    "queued": "⏳ Antri",
+    "running": "⚙️ Diproses",
+    "done": "✅ Selesai",
+    "failed": "❌ Gagal",
+}
+
+POLL_SECONDS = 2
+
+def enqueue_uploads(kind, uploaded_files):
+    """
+    Queue uploaded files for the background worker; returns the new job ids.
+    Checkup files get one job each. Master files are one job, imported together as
+    the preview showed them (later files win on the natural key).
+    """
+    created_by = st.session_state.get("username")
+    files = [(f.name, f.getvalue()) for f in uploaded_files]
+    if kind == "master":
+        return [enqueue_job(kind, files, created_by=created_by)]
+    return [enqueue_job(kind, [file], created_by=created_by) for file in files]
+
+def _render_jobs(kind):
+    jobs = get_recent_jobs(kind, created_by=st.session_state.get("username"))
+    if jobs.empty:
+        st.caption("Belum ada upload.")
+        return
+
+    display = pd.DataFrame({
+        "File": jobs["file_name"],
+        "Status": jobs["status"].map(STATUS_LABELS).fillna(jobs["status"]),
+        "Baris Diproses": jobs["rows_done"],
+        "Baris/detik": jobs["rows_per_sec"],
+        "Di-skip": jobs["skipped"],
+        "Error": jobs["error"].fillna(""),
+    })
+    if kind == "checkup":
+        # Rows an earlier upload of the same file already stored (not inserted again)
+        display.insert(4, "Sudah Ada", jobs["previously_inserted"])
+        # Checkups already stored for the same uid / tanggal that this file replaced
+        display.insert(5, "Diperbarui", jobs["updated"])
+    st.dataframe(display, use_container_width=True, hide_index=True)
+
+    # Skipped rows of the latest finished checkup job; the result is loaded once, on request,
+    # not on every poll
+    if kind == "checkup":
+        done = jobs[(jobs["status"] == "done") & (jobs["skipped"] > 0)]
+        if not done.empty:
+            latest = done.iloc[0]
+            job_id = int(latest["job_id"])
+            state_key = f"job_skipped_{job_id}"
+            with st.expander(f"⚠️ Baris di-skip: {latest['file_name']} ({latest['skipped']})"):
+                if state_key not in st.session_state:
+                    if st.button("📄 Tampilkan baris di-skip", key=f"{state_key}_load"):
+                        st.session_state[state_key] = (get_job_result(job_id) or {}).get("skipped", [])
+                if state_key in st.session_state:
+                    st.dataframe(pd.DataFrame(st.session_state[state_key]), use_container_width=True)
+
+# Re-runs on its own every POLL_SECONDS where st.fragment exists
+_poll_jobs = st.fragment(run_every=POLL_SECONDS)(_render_jobs) if hasattr(st, "fragment") else None
+
+def render_upload_jobs(kind, key):
+    """
+    Progress of the current user's recent upload jobs. Only this block reruns
+    every POLL_SECONDS (one compact query); the rest of the page is untouched.
+    """
+    st.markdown("#### 📋 Status Upload")
+    if _poll_jobs is None:
+        st.button("🔄 Refresh status", key=f"{key}_refresh")  # any click reruns the page
+        _render_jobs(kind)
+        return
+    _poll_jobs(kind)
@@ -0,0 +1,102 @@
+# upload_worker.py
+"""
+Background upload worker. Claims queued jobs from the `jobs` table and runs the
+regular parsers on them, then builds the result cards its uploads left stale
+(db/result_cards.py) once the queue is drained. Start as many as needed, on any
+host that can reach the database:
+
+    python upload_worker.py          # run forever
+    python upload_worker.py --once   # drain the queue, then exit
+"""
+import os
+import sys
+import time
+import socket
+import shutil
+import tempfile
+import threading
+from db.jobs import (
+    claim_job, report_progress, heartbeat_job, finish_job, fail_job, requeue_stale_jobs,
+    HEARTBEAT_SECONDS,
+)
+from db.checkup_uploader import parse_checkup_xls
+from db.excel_parser import parse_master_karyawan
+from db.result_cards import build_stale_result_cards
+
+POLL_SECONDS = 2
+
+def _keep_alive(job_id, stop):
+    """Heartbeat every HEARTBEAT_SECONDS until stop is set, so long parses are not requeued as stale."""
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            heartbeat_job(job_id)
+        except Exception as e:
+            print(f"⚠️ Heartbeat of job {job_id} failed: {e}")
+
+def run_job(job):
+    """
+    Write the job's files to a temp dir (each under its own name) and run its parser:
+    a checkup job has one file, a master job's files are imported together.
+    """
+    stop = threading.Event()
+    threading.Thread(target=_keep_alive, args=(job["job_id"], stop), daemon=True).start()
+    tmp_dir = tempfile.mkdtemp(prefix="job_")
+    try:
+        paths = []
+        for i, (file_name, file_data) in enumerate(job["files"]):
+            # One subdir per file: two uploads may share a name
+            os.makedirs(os.path.join(tmp_dir, str(i)))
+            path = os.path.join(tmp_dir, str(i), os.path.basename(file_name))
+            with open(path, "wb") as f:
+                f.write(file_data)
+            paths.append(path)
+
+        if job["kind"] == "checkup":
+            return parse_checkup_xls(
+                paths[0],
+                on_progress=lambda rows_done, skipped: report_progress(job["job_id"], rows_done, skipped),
+                uploaded_by=job["created_by"]
+            )
+        result = parse_master_karyawan(paths, uploaded_by=job["created_by"])
+        report_progress(job["job_id"], result["inserted"] + result["updated"] + result["unchanged"], result["skipped"])
+        return result
+    finally:
+        stop.set()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _build_stale_cards():
+    """Build the result cards left stale by the jobs just run; a failure leaves them to the next scan."""
+    try:
+        print(f"🪪 {build_stale_result_cards()} result cards built")
+    except Exception as e:
+        print(f"⚠️ Result cards not built: {e}")
+
+def main(once=False):
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"🛠️ Upload worker {worker} started")
+    cards_stale = False
+    while True:
+        requeue_stale_jobs()
+        job = claim_job(worker)
+        if job is None:
+            # Once per drained queue rather than per job: a backlog of uploads is built in one pass
+            if cards_stale:
+                _build_stale_cards()
+                cards_stale = False
+            if once:
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+
+        print(f"▶️ Job {job['job_id']} ({job['kind']}): {job['file_name']}")
+        cards_stale = True   # a failed job may still have committed some chunks
+        try:
+            result = run_job(job)
+            finish_job(job["job_id"], result)
+            print(f"✅ Job {job['job_id']} done")
+        except Exception as e:
+            fail_job(job["job_id"], e)
+            print(f"❌ Job {job['job_id']} failed: {e}")
+
+if __name__ == "__main__":
+    main(once="--once" in sys.argv[1:])
@@ -2,6 +2,7 @@
 import os
 import shutil
 import streamlit as st
+from db.cache import clear_cache
 
 def clear_pycache():
     """Remove all __pycache__ folders recursively."""
@@ -21,6 +22,7 @@ def clear_streamlit_cache():
     print("✅ Streamlit cache cleared.")
 
 def clear_all():
-    """Clear both __pycache__ folders and Streamlit cache."""
+    """Clear __pycache__ folders, the Streamlit cache and the query cache (db/cache.py)."""
     clear_pycache()
     clear_streamlit_cache()
+    clear_cache()
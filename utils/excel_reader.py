@@ -0,0 +1,253 @@
+# utils/excel_reader.py
+import os
+import shutil
+import hashlib
+import datetime
+import tempfile
+from contextlib import contextmanager
+import pandas as pd
+from pandas.io.parsers import TextParser
+from openpyxl import load_workbook
+
+try:
+    # Optional Rust-backed reader; much faster than openpyxl when installed
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+DEFAULT_CHUNK_ROWS = 5000
+
+# Engine used when none is given: "calamine" if installed, else "openpyxl"
+EXCEL_ENGINE = "calamine" if CalamineWorkbook is not None else "openpyxl"
+
+# Missing cell, as pandas.read_excel reports it
+NA = float("nan")
+
+# ---------------------------
+# Cell conversion (mirrors pandas' openpyxl reader)
+# ---------------------------
+def _convert_cell(val):
+    """Integral floats become ints and empty cells NaN, like pandas.read_excel does."""
+    if val is None:
+        return NA
+    if isinstance(val, float) and val.is_integer():
+        return int(val)
+    return val
+
+def _cell_to_str(val):
+    """dtype=str conversion: same strings pandas.read_excel(dtype=str) produces."""
+    val = _convert_cell(val)
+    return val if val is NA else str(val)
+
+def _calamine_cell(val):
+    """Bring a calamine value to what openpyxl returns for the same cell."""
+    if isinstance(val, str):
+        return val or None  # calamine reports empty cells as ''
+    if type(val) is datetime.date:
+        return datetime.datetime(val.year, val.month, val.day)
+    return val
+
+def _header_names(row):
+    names, seen = [], {}
+    for i, val in enumerate(row):
+        name = f"Unnamed: {i}" if val is None else str(_convert_cell(val))
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _source_name(source):
+    name = source if isinstance(source, str) else getattr(source, "name", "") or ""
+    return os.path.basename(name)
+
+# ---------------------------
+# Row sources: yield (sheet_name, iterator of raw openpyxl-style row tuples)
+# ---------------------------
+def _openpyxl_sheets(source, sheets):
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            if sheets is None or ws.title in sheets:
+                yield ws.title, ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def _calamine_sheets(source, sheets):
+    # calamine holds one sheet's cells at a time in compact native memory;
+    # Python objects are still only built chunk by chunk below.
+    if isinstance(source, (str, os.PathLike)):
+        wb = CalamineWorkbook.from_path(os.fspath(source))
+    else:
+        wb = CalamineWorkbook.from_filelike(source)
+    with wb:
+        for name in wb.sheet_names:
+            if sheets is None or name in sheets:
+                sheet = wb.get_sheet_by_name(name)
+                yield name, _calamine_rows(sheet)
+
+def _calamine_rows(sheet):
+    # iter_rows() starts at the first used column; pad back to column A
+    lead = (None,) * sheet.start[1] if sheet.start else ()
+    for row in sheet.iter_rows():
+        yield lead + tuple(_calamine_cell(v) for v in row)
+
+def _sheet_rows(source, sheets, engine):
+    if engine == "calamine":
+        if CalamineWorkbook is None:
+            raise ImportError("python-calamine is not installed")
+        return _calamine_sheets(source, sheets)
+    return _openpyxl_sheets(source, sheets)
+
+# ---------------------------
+# Streaming readers
+# ---------------------------
+def _chunk_frame(buffer, columns, index, dtype):
+    if dtype is str:
+        return pd.DataFrame(buffer, columns=columns, index=index, dtype=object)
+    # Same type inference pandas.read_excel applies to the cell values
+    frame = TextParser(buffer, header=None, names=columns, dtype=dtype).read()
+    frame.index = index
+    return frame
+
+def _iter_excel_chunks(source, chunk_rows, dtype, sheets, engine):
+    convert = _cell_to_str if dtype is str else _convert_cell
+    for title, rows in _sheet_rows(source, sheets, engine):
+        header = next(rows, None)
+        if header is None:
+            continue
+        columns = _header_names(header)
+        width = len(columns)
+
+        # Blank rows inside the data keep their position (row numbers stay
+        # Excel-accurate); trailing blank rows are dropped, as pandas does.
+        buffer, index, pending_blank, position = [], [], [], 0
+        for row in rows:
+            values = [convert(v) for v in row[:width]]
+            values += [NA] * (width - len(values))
+            if all(v is NA for v in values):
+                pending_blank.append(position)
+            else:
+                for blank_pos in pending_blank:
+                    buffer.append([NA] * width)
+                    index.append(blank_pos)
+                pending_blank = []
+                buffer.append(values)
+                index.append(position)
+            position += 1
+
+            if len(buffer) >= chunk_rows:
+                yield title, _chunk_frame(buffer, columns, index, dtype)
+                buffer, index = [], []
+
+        if buffer:
+            yield title, _chunk_frame(buffer, columns, index, dtype)
+
+def _iter_xls_chunks(source, chunk_rows, dtype, sheets):
+    # Legacy .xls without calamine: no streaming reader, one sheet at a time.
+    with pd.ExcelFile(source) as xls:
+        for sheet_name in xls.sheet_names:
+            if sheets is not None and sheet_name not in sheets:
+                continue
+            df = xls.parse(sheet_name, dtype=dtype)
+            for start in range(0, len(df), chunk_rows):
+                yield sheet_name, df.iloc[start:start + chunk_rows]
+
+def _csv_sheet_name(source):
+    # A CSV has a single "sheet", named after the file.
+    return os.path.splitext(_source_name(source))[0]
+
+def _iter_csv_chunks(source, chunk_rows, dtype, sheets):
+    sheet_name = _csv_sheet_name(source)
+    if sheets is not None and sheet_name not in sheets:
+        return
+    for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=dtype, skip_blank_lines=False):
+        yield sheet_name, chunk
+
+def iter_sheet_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS, dtype=None, sheets=None, engine=None):
+    """
+    Yield (sheet_name, chunk_df) for every sheet of an uploaded workbook, at most
+    chunk_rows rows at a time, without loading the whole file into memory.
+
+    source may be a path or a file-like object (e.g. a Streamlit UploadedFile).
+    chunk_df.index is the 0-based data row of the sheet, so index + 2 is the Excel row.
+    With dtype=str every cell comes back as the string pandas.read_excel(dtype=str) gives,
+    whichever engine ("calamine" / "openpyxl", default EXCEL_ENGINE) reads the file.
+    sheets optionally limits reading to the given sheet names.
+    """
+    engine = engine or EXCEL_ENGINE
+    if hasattr(source, "seek"):
+        source.seek(0)
+    name = _source_name(source).lower()
+    if name.endswith(".csv"):
+        yield from _iter_csv_chunks(source, chunk_rows, dtype, sheets)
+    elif name.endswith(".xls") and engine != "calamine":
+        yield from _iter_xls_chunks(source, chunk_rows, dtype, sheets)
+    else:
+        yield from _iter_excel_chunks(source, chunk_rows, dtype, sheets, engine)
+
+def read_preview(source, rows=50, engine=None):
+    """First rows of the first sheet, for a quick look at an uploaded file."""
+    for _, chunk in iter_sheet_chunks(source, chunk_rows=rows, engine=engine):
+        return chunk
+    return pd.DataFrame()
+
+def sheet_names(source, engine=None):
+    """Sheet names of a workbook (a CSV counts as one sheet named after the file)."""
+    engine = engine or EXCEL_ENGINE
+    if hasattr(source, "seek"):
+        source.seek(0)
+    name = _source_name(source).lower()
+    if name.endswith(".csv"):
+        return [_csv_sheet_name(source)]
+    if engine == "calamine" and CalamineWorkbook is not None:
+        if isinstance(source, (str, os.PathLike)):
+            wb = CalamineWorkbook.from_path(os.fspath(source))
+        else:
+            wb = CalamineWorkbook.from_filelike(source)
+        with wb:
+            return list(wb.sheet_names)
+    if name.endswith(".xls"):
+        with pd.ExcelFile(source) as xls:
+            return list(xls.sheet_names)
+    wb = load_workbook(source, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, read block-wise; identifies re-uploads of the same file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def combined_digest(digests):
+    """One digest for an ordered set of files (a single file keeps its own digest)."""
+    if len(digests) == 1:
+        return digests[0]
+    return hashlib.sha256("".join(digests).encode()).hexdigest()
+
+@contextmanager
+def local_copy(source):
+    """
+    Yield a filesystem path for source so worker processes can open it themselves.
+    Paths pass through; buffers are copied block-wise to a temp dir under their own
+    file name (kept, since a CSV's sheet name is its file stem) and removed afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+    tmp_dir = tempfile.mkdtemp(prefix="upload_")
+    try:
+        path = os.path.join(tmp_dir, _source_name(source) or "upload.xlsx")
+        source.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(source, f)
+        yield path
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
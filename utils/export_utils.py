@@ -3,16 +3,17 @@ import pandas as pd
 from io import BytesIO
 from db.queries import get_employees
 
-def generate_karyawan_template_excel(lokasi_filter=None):
+def generate_karyawan_template_excel(lokasi_filter=None, employees=None):
     """
     Generate Excel template for nurses/managers:
     - Auto-calculation: umur, bmi, BMI_category
     - Empty medical columns for manual entry
     - Optional filter by lokasi
+    - Optional employees DataFrame already loaded (not modified)
     Returns: BytesIO object
     """
     # Fetch master data
-    df = get_employees().copy()
+    df = (get_employees() if employees is None else employees).copy()
 
     # Optional filter by lokasi
     if lokasi_filter:
@@ -0,0 +1,115 @@
+# utils/worker_pool.py
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from config.settings import UPLOAD_WORKERS
+from utils.excel_reader import sheet_names
+
+# ---------------------------
+# Process pool (one per server process)
+# ---------------------------
+_pool = None
+_manager = None
+
+# Items a sheet's worker may produce ahead of the consumer (stream_sheets)
+STREAM_AHEAD = 2
+
+def get_process_pool():
+    """
+    Return the singleton process pool used for upload parsing, or None when
+    UPLOAD_WORKERS <= 1 (everything then runs inline).
+    Workers are spawned, not forked, so they never inherit the Streamlit
+    server's threads or open DB connections.
+    """
+    global _pool
+    if _pool is None and UPLOAD_WORKERS > 1:
+        _pool = ProcessPoolExecutor(
+            max_workers=UPLOAD_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+def _get_manager():
+    """Singleton manager serving the bounded queues of stream_sheets."""
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+def map_sheets(fn, paths, *args, pool=None):
+    """
+    Run fn(path, sheet_name, *args) for every sheet of every file in the pool.
+    Returns one list per path of (sheet_name, result) in sheet order, whatever
+    order the workers finish in. fn must be a module-level (picklable) function.
+    """
+    pool = pool or get_process_pool()
+    tasks = [(i, path, name) for i, path in enumerate(paths) for name in sheet_names(path)]
+    if not tasks:
+        return [[] for _ in paths]
+
+    task_paths = [path for _, path, _ in tasks]
+    task_sheets = [name for _, _, name in tasks]
+    task_args = [[arg] * len(tasks) for arg in args]
+    if pool is None:
+        results = map(fn, task_paths, task_sheets, *task_args)
+    else:
+        results = pool.map(fn, task_paths, task_sheets, *task_args)
+
+    grouped = [[] for _ in paths]
+    for (i, _, name), result in zip(tasks, results):
+        grouped[i].append((name, result))
+    return grouped
+
+def _put(q, stop, item):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _feed(q, stop, fn, path, sheet_name, *args):
+    """Worker side of stream_sheets: put every item of fn(...) on q, then None."""
+    for item in fn(path, sheet_name, *args):
+        if not _put(q, stop, item):
+            return
+    _put(q, stop, None)
+
+def stream_sheets(fn, paths, *args, pool=None, ahead=STREAM_AHEAD):
+    """
+    Run the generator fn(path, sheet_name, *args) for every sheet of every file in
+    the pool and yield (path index, sheet_name, item) as soon as each item is ready,
+    in file / sheet / item order. A sheet's worker blocks once it is `ahead` items
+    ahead of the consumer, so memory stays bounded whatever the file size.
+    Close the generator (contextlib.closing) to stop the workers early.
+    fn must be a module-level (picklable) generator function that never yields None.
+    """
+    pool = pool or get_process_pool()
+    tasks = [(i, path, name) for i, path in enumerate(paths) for name in sheet_names(path)]
+    if pool is None:
+        for i, path, name in tasks:
+            for item in fn(path, name, *args):
+                yield i, name, item
+        return
+
+    manager = _get_manager()
+    stop = manager.Event()
+    queues = [manager.Queue(maxsize=ahead) for _ in tasks]
+    futures = [pool.submit(_feed, q, stop, fn, path, name, *args) for q, (_, path, name) in zip(queues, tasks)]
+    try:
+        for (i, _, name), q, future in zip(tasks, queues, futures):
+            while True:
+                try:
+                    item = q.get(timeout=1)
+                except queue.Empty:
+                    if future.done():
+                        future.result()   # re-raises the worker's error
+                    continue
+                if item is None:
+                    break
+                yield i, name, item
+    finally:
+        stop.set()
+        for future in futures:
+            future.cancel()